@@ -24,6 +24,22 @@ class DiagramBuilder {
     this.initialPinchZoom = 1;
     this.zoomAnimationFrame = null;
 
+    // Render session: lets the renderer cancel our stale in-flight renders
+    this.renderSession = `editor-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+    // Bumped per preview render; a response for anything but the latest is dropped
+    this.renderSeq = 0;
+
+    // Diagrams bigger than this are shown as a tile pyramid instead of one huge image
+    this.tileThresholdBytes = 1.5 * 1024 * 1024;
+    this.tilePyramid = null;
+    this.tileFrame = null;
+
+    // The preview on screen and the ETag it was rendered under; a 304 puts it back
+    this.shownRender = null;
+
+    // Shared diagram session: everyone opening the same #diagram=<id> URL sees each update
+    this.diagramId = this.getDiagramId();
+
     this.init();
   }
 
@@ -41,13 +57,20 @@ class DiagramBuilder {
 
     try {
       this.ws = new WebSocket(wsUrl);
+      // Rendered diagrams are pushed as binary frames
+      this.ws.binaryType = 'blob';
 
       this.ws.onopen = () => {
         this.addTerminalMessage('system', '✓ Connected to Claude Code terminal');
         console.log('WebSocket connected');
+        this.ws.send(JSON.stringify({ type: 'subscribe', diagramId: this.diagramId, pushImage: true }));
       };
 
       this.ws.onmessage = (event) => {
+        if (event.data instanceof Blob) {
+          this.handlePushedImage(event.data);
+          return;
+        }
         const data = JSON.parse(event.data);
         this.handleWebSocketMessage(data);
       };
@@ -68,6 +91,17 @@ class DiagramBuilder {
     }
   }
 
+  getDiagramId() {
+    const params = new URLSearchParams(window.location.hash.slice(1));
+    let diagramId = params.get('diagram');
+    if (!diagramId) {
+      diagramId = Math.random().toString(36).slice(2, 12);
+      params.set('diagram', diagramId);
+      history.replaceState(null, '', `#${params}`);
+    }
+    return diagramId;
+  }
+
   setupEventListeners() {
     // Diagram type selection
     document.querySelectorAll('.nav-item').forEach(item => {
@@ -409,7 +443,10 @@ classDiagram
         context: {
           diagramType: this.diagramType,
           format: this.format,
-          currentCode: document.getElementById('codeEditor').value
+          currentCode: document.getElementById('codeEditor').value,
+          diagramId: this.diagramId,
+          // Ask the server to render on delivery and push the image
+          pushImage: true
         }
       }));
       this.addTerminalMessage('system', '⏳ Processing with Claude Code...');
@@ -431,16 +468,186 @@ classDiagram
     switch (data.type) {
       case 'diagram_code':
         document.getElementById('codeEditor').value = data.code;
-        this.renderDiagram();
+        if (data.image) {
+          // The rendered image arrives as the next (binary) frame
+          this.pendingImage = data.image;
+        } else {
+          this.renderDiagram();
+        }
         this.addTerminalMessage('assistant', '✓ Diagram generated successfully!');
         break;
       case 'message':
         this.addTerminalMessage('assistant', data.content);
         break;
+      case 'subscribed':
+        if (data.subscribers > 1) {
+          this.addTerminalMessage('system', `👥 ${data.subscribers} viewers on this diagram`);
+        }
+        break;
       case 'error':
         this.addTerminalMessage('system', `✗ Error: ${data.message}`);
         break;
+      case 'profile':
+        // Sent back for messages with "profile": true when the server has PROFILE_REQUESTS=1
+        console.log(`${data.timing}\n${data.content}`);
+        break;
+    }
+  }
+
+  async handlePushedImage(blob) {
+    const image = this.pendingImage;
+    this.pendingImage = null;
+    if (!image) {
+      return;
+    }
+
+    if (image.bytes > this.tileThresholdBytes &&
+        await this.showTiledDiagram(document.getElementById('codeEditor').value)) {
+      return;
+    }
+
+    this.showImageBlob(new Blob([blob], { type: image.mimetype }), image.engine);
+  }
+
+  showImageBlob(blob, engine) {
+    if (this.imageObjectUrl) {
+      URL.revokeObjectURL(this.imageObjectUrl);
+    }
+    this.imageObjectUrl = URL.createObjectURL(blob);
+    this.showDiagramImage(this.imageObjectUrl, engine);
+  }
+
+  showDiagramImage(src, engine) {
+    const wrapper = document.getElementById('previewWrapper');
+    wrapper.innerHTML = `<img src="${src}" alt="Diagram" class="fade-in">`;
+    this.tilePyramid = null;
+    this.shownRender = null;
+
+    // Large graphs are laid out with a faster engine than dot
+    if (engine && engine !== 'dot' && engine !== this.lastLayoutEngine) {
+      this.addTerminalMessage('system', `ℹ Large graph: laid out with ${engine} instead of dot`);
+    }
+    this.lastLayoutEngine = engine;
+    wrapper.classList.add('pannable');
+
+    // Wait for image to load, then fit to screen
+    const img = wrapper.querySelector('img');
+    img.onload = () => {
+      setTimeout(() => this.fitToScreen(), 100);
+    };
+
+    this.updatePreviewZoom();
+  }
+
+  async showTiledDiagram(code, isCurrent = () => true) {
+    // Ask the renderer for a tile pyramid; false means show the single image instead
+    let pyramid;
+    try {
+      const response = await fetch('http://localhost:8000/tiles', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ code: code, format: this.format, theme: 'dark' })
+      });
+      if (!response.ok) {
+        return false;
+      }
+      pyramid = await response.json();
+    } catch (error) {
+      console.error('Tile pyramid error:', error);
+      return false;
+    }
+    if (!isCurrent()) {
+      return true;  // a newer render owns the preview now
+    }
+
+    const wrapper = document.getElementById('previewWrapper');
+    wrapper.innerHTML = '<div class="tiled-diagram fade-in"></div>';
+    this.shownRender = null;
+    const layer = wrapper.querySelector('.tiled-diagram');
+    layer.style.width = `${pyramid.width}px`;
+    layer.style.height = `${pyramid.height}px`;
+    wrapper.classList.add('pannable');
+
+    this.tilePyramid = pyramid;
+    this.fitToScreen();
+    return true;
+  }
+
+  scheduleTileUpdate() {
+    if (!this.tilePyramid || this.tileFrame) return;
+    this.tileFrame = requestAnimationFrame(() => {
+      this.tileFrame = null;
+      this.updateVisibleTiles();
+    });
+  }
+
+  updateVisibleTiles() {
+    const pyramid = this.tilePyramid;
+    const wrapper = document.getElementById('previewWrapper');
+    const layer = wrapper.querySelector('.tiled-diagram');
+    if (!pyramid || !layer) return;
+
+    // The level whose pixels best match the screen at the current zoom
+    const wanted = pyramid.maxLevel + Math.ceil(Math.log2(this.zoom * (window.devicePixelRatio || 1)));
+    const level = Math.max(0, Math.min(pyramid.maxLevel, wanted));
+    const span = pyramid.tileSize * 2 ** (pyramid.maxLevel - level);
+
+    // Visible rectangle in full-resolution diagram pixels
+    const view = wrapper.getBoundingClientRect();
+    const box = layer.getBoundingClientRect();
+    const left = Math.max(0, (view.left - box.left) / this.zoom);
+    const top = Math.max(0, (view.top - box.top) / this.zoom);
+    const right = Math.min(pyramid.width, (view.right - box.left) / this.zoom);
+    const bottom = Math.min(pyramid.height, (view.bottom - box.top) / this.zoom);
+
+    const visible = new Set();
+    for (let y = Math.floor(top / span); y * span < bottom; y++) {
+      for (let x = Math.floor(left / span); x * span < right; x++) {
+        visible.add(`${level}/${x}/${y}`);
+      }
+    }
+
+    let pending = 0;
+    visible.forEach((key) => {
+      let tile = layer.querySelector(`img[data-tile="${key}"]`);
+      if (!tile) {
+        const [, x, y] = key.split('/').map(Number);
+        tile = document.createElement('img');
+        tile.dataset.tile = key;
+        tile.alt = '';
+        tile.style.left = `${x * span}px`;
+        tile.style.top = `${y * span}px`;
+        tile.style.width = `${span}px`;
+        tile.style.height = `${span}px`;
+        tile.style.zIndex = level;
+        tile.onload = () => this.scheduleTileUpdate();
+        tile.src = 'http://localhost:8000' + pyramid.url
+          .replace('{z}', level).replace('{x}', x).replace('{y}', y);
+        layer.appendChild(tile);
+      }
+      if (!tile.complete) pending++;
+    });
+
+    // Drop off-screen tiles, and other levels once this level has loaded
+    layer.querySelectorAll('img[data-tile]').forEach((tile) => {
+      const onLevel = tile.dataset.tile.startsWith(`${level}/`);
+      if (!visible.has(tile.dataset.tile) && (onLevel || pending === 0)) {
+        tile.remove();
+      }
+    });
+  }
+
+  previewElement() {
+    return document.querySelector('#previewWrapper .tiled-diagram') ||
+      document.querySelector('#previewWrapper > img');
+  }
+
+  previewSize() {
+    if (this.tilePyramid) {
+      return { width: this.tilePyramid.width, height: this.tilePyramid.height };
     }
+    const img = document.querySelector('#previewWrapper > img');
+    return { width: img.naturalWidth, height: img.naturalHeight };
   }
 
   addTerminalMessage(type, content) {
@@ -454,12 +661,15 @@ classDiagram
 
   async renderDiagram() {
     const code = document.getElementById('codeEditor').value;
+    const seq = ++this.renderSeq;
+    const isCurrent = () => seq === this.renderSeq;
     if (!code.trim()) {
       this.clearPreview();
       return;
     }
 
     const wrapper = document.getElementById('previewWrapper');
+    const shown = this.shownRender;
     wrapper.innerHTML = `
       <div class="preview-placeholder">
         <div class="loading-spinner"></div>
@@ -468,32 +678,66 @@ classDiagram
     `;
 
     try {
+      const headers = { 'Content-Type': 'application/json' };
+      if (shown) {
+        headers['If-None-Match'] = shown.etag;
+      }
+      // Raw mode: the SVG bytes themselves, not base64 inside JSON
       const response = await fetch('http://localhost:8000/render', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: headers,
         body: JSON.stringify({
           code: code,
           format: this.format,
-          theme: 'dark'
+          theme: 'dark',
+          session: this.renderSession,
+          raw: true
         })
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        wrapper.innerHTML = `<img src="${data.image}" alt="Diagram" class="fade-in">`;
-        wrapper.classList.add('pannable');
+      // A newer render from this editor superseded this one
+      if (response.status === 409 || !isCurrent()) {
+        return;
+      }
 
-        // Wait for image to load, then fit to screen
-        const img = wrapper.querySelector('img');
-        img.onload = () => {
-          setTimeout(() => this.fitToScreen(), 100);
-        };
+      // Unchanged diagram: put the preview we already have back
+      if (response.status === 304 && shown) {
+        wrapper.replaceChildren(...shown.nodes);
+        this.shownRender = shown;
+        return;
+      }
 
-        this.updatePreviewZoom();
+      if (response.ok) {
+        const blob = await response.blob();
+        const etag = response.headers.get('ETag');
+        if (!isCurrent()) {
+          return;
+        }
+        if (blob.size > this.tileThresholdBytes && await this.showTiledDiagram(code, isCurrent)) {
+          if (isCurrent()) {
+            this.shownRender = etag ? { etag: etag, nodes: [...wrapper.childNodes] } : null;
+          }
+          return;
+        }
+        this.showImageBlob(blob, response.headers.get('X-Layout-Engine'));
+        this.shownRender = etag ? { etag: etag, nodes: [...wrapper.childNodes] } : null;
+      } else if (response.status === 400) {
+        // Rejected by the renderer's syntax check before any tool ran
+        const result = await response.json();
+        if (!isCurrent()) {
+          return;
+        }
+        if (!result.errors) {
+          throw new Error(result.error);
+        }
+        this.showSyntaxErrors(result.errors);
       } else {
         throw new Error('Failed to render diagram');
       }
     } catch (error) {
+      if (!isCurrent()) {
+        return;
+      }
       console.error('Render error:', error);
       wrapper.innerHTML = `
         <div class="preview-placeholder">
@@ -509,8 +753,27 @@ classDiagram
     }
   }
 
+  showSyntaxErrors(errors) {
+    const wrapper = document.getElementById('previewWrapper');
+    this.shownRender = null;
+    wrapper.innerHTML = `
+      <div class="preview-placeholder">
+        <p>⚠ Diagram has syntax errors</p>
+        <ul style="margin-top: 12px; text-align: left; font-size: 12px; font-family: monospace; color: var(--text-tertiary);"></ul>
+      </div>
+    `;
+    const list = wrapper.querySelector('ul');
+    for (const error of errors) {
+      const item = document.createElement('li');
+      item.textContent = `Line ${error.line}, column ${error.column}: ${error.message}`;
+      list.appendChild(item);
+    }
+    wrapper.classList.remove('pannable');
+  }
+
   clearPreview() {
     const wrapper = document.getElementById('previewWrapper');
+    this.shownRender = null;
     wrapper.innerHTML = `
       <div class="preview-placeholder">
         <svg width="64" height="64" viewBox="0 0 64 64" fill="none" stroke="currentColor">
@@ -585,12 +848,13 @@ classDiagram
     const zoomPercent = document.getElementById('zoomPercent');
     zoomPercent.textContent = `${Math.round(this.zoom * 100)}%`;
 
-    const img = document.querySelector('#previewWrapper img');
+    const img = this.previewElement();
     if (img) {
       // CRITICAL FIX: Apply translate BEFORE scale (standard pan/zoom pattern)
       // This prevents the jumping behavior
       img.style.transform = `translate(${this.panX}px, ${this.panY}px) scale(${this.zoom})`;
       img.style.transformOrigin = '0 0'; // Always transform from top-left
+      this.scheduleTileUpdate();
     }
   }
 
@@ -602,13 +866,12 @@ classDiagram
 
   fitToScreen() {
     const wrapper = document.getElementById('previewWrapper');
-    const img = document.querySelector('#previewWrapper img');
+    const img = this.previewElement();
     if (!img) return;
 
     const wrapperWidth = wrapper.clientWidth;
     const wrapperHeight = wrapper.clientHeight;
-    const imgWidth = img.naturalWidth;
-    const imgHeight = img.naturalHeight;
+    const { width: imgWidth, height: imgHeight } = this.previewSize();
 
     const scaleX = wrapperWidth / imgWidth;
     const scaleY = wrapperHeight / imgHeight;
@@ -631,7 +894,7 @@ classDiagram
   // Pan functionality with momentum and bounds
   startPan(e) {
     if (e.button !== 0 && !this.spacePressed) return; // Left mouse button or space bar
-    const img = document.querySelector('#previewWrapper img');
+    const img = this.previewElement();
     if (!img) return;
 
     // Cancel any ongoing momentum
@@ -703,14 +966,15 @@ classDiagram
 
   getBounds() {
     const wrapper = document.getElementById('previewWrapper');
-    const img = document.querySelector('#previewWrapper img');
+    const img = this.previewElement();
 
     if (!img) return { minX: 0, maxX: 0, minY: 0, maxY: 0 };
 
     const wrapperWidth = wrapper.clientWidth;
     const wrapperHeight = wrapper.clientHeight;
-    const scaledWidth = img.naturalWidth * this.zoom;
-    const scaledHeight = img.naturalHeight * this.zoom;
+    const { width, height } = this.previewSize();
+    const scaledWidth = width * this.zoom;
+    const scaledHeight = height * this.zoom;
 
     // Allow some panning even when zoomed out
     const maxX = Math.max(0, (scaledWidth - wrapperWidth) / 2 + 50);
@@ -810,7 +1074,7 @@ classDiagram
 
   // Touch and pinch zoom handlers
   handleTouchStart(e) {
-    const img = document.querySelector('#previewWrapper img');
+    const img = this.previewElement();
     if (!img) return;
 
     this.touches = Array.from(e.touches);
@@ -1005,7 +1269,7 @@ classDiagram
   }
 
   async copyImageToClipboard() {
-    const img = document.querySelector('#previewWrapper img');
+    const img = document.querySelector('#previewWrapper > img');
     if (!img) return;
 
     try {
@@ -0,0 +1,672 @@
+#!/usr/bin/env python3
+"""
+Kre8 Diagram Builder - Asyncio rendering service
+
+Drop-in alternative to renderer.py serving the same API on aiohttp. dot,
+mmdc, d2 and plantuml run as asyncio subprocesses, so a slow render never
+holds a thread: a semaphore bounds how many run at once, every job has a hard timeout that kills its whole process
+group, and shutdown lets in-flight renders finish before killing the rest.
+The backends themselves are shared with renderer.py through render_core.py.
+"""
+
+import asyncio
+import base64
+import os
+import signal
+from collections import deque
+from contextlib import asynccontextmanager
+from io import BytesIO
+
+from aiohttp import web
+
+from timing import StageTimer, stage, carry, activate, deactivate, profile_requested
+from http_encoding import (
+    COMPRESSIBLE_TYPES, accepted_encoding, compressible, compress, render_etag, etag_matches
+)
+from validators import DiagramSyntaxError
+from tiles import TilesUnavailable, TileNotFound, PyramidTooLarge
+from backends import discover_tools, INSTALL_HINTS
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from render_core import (RendererCore, RendererBusy, RenderCancelled, RenderTimeout, EXPORT_MIMETYPES,
+                         drive_async, parse_batch, batch_rejection, batch_item)
+
+class RenderJob:
+    """One in-flight render task, shared by every caller asking for the same key"""
+
+    def __init__(self, key, task):
+        self.key = key
+        self.task = task
+        self.waiters = 0
+        self.sessions = set()
+
+class AsyncDiagramRenderer(RendererCore):
+    """Drives the shared backends on the event loop with asyncio subprocesses"""
+
+    def __init__(self, concurrency=None, max_queue=None, timeout=None):
+        # N subprocesses run at once, a few more renders may wait for a slot
+        self.concurrency = concurrency or int(os.environ.get('RENDER_WORKERS', 0)) or os.cpu_count() or 1
+        if max_queue is None:
+            max_queue = int(os.environ.get('RENDER_QUEUE', self.concurrency * 2))
+        self.max_queue = max_queue
+        self.timeout = timeout or float(os.environ.get('RENDER_TIMEOUT', 60))
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._waiting = 0
+        self._running = 0
+
+        # Single-flight bookkeeping: cache key -> RenderJob, session -> RenderJob;
+        # live processes for shutdown
+        self._in_flight = {}
+        self._sessions = {}
+        self._processes = set()
+
+        # Warm pools are booted in start(), off the event loop, while requests are served
+        super().__init__('kre8-async-render-')
+
+    def setup_metrics(self):
+        """Register the renderer's Prometheus metrics"""
+        super().setup_metrics()
+        self.metrics.gauge('kre8_renders_in_progress', 'Renders currently holding a slot',
+                           fn=lambda: self._running)
+        self.metrics.gauge('kre8_render_queue_depth', 'Renders waiting for a free slot',
+                           fn=lambda: self._waiting)
+
+    async def start(self):
+        """Discover installed tools, boot the warm pools and pre-warm each backend"""
+        loop = asyncio.get_running_loop()
+        starting = []
+        for name, tool in (await loop.run_in_executor(None, discover_tools)).items():
+            if tool is None:
+                self.status.set(name, 'missing', error=INSTALL_HINTS[name])
+                continue
+            self.status.set(name, 'starting', tool=tool)
+            starting.append(self.run(self.start_steps(name, tool)))
+
+        # Backends boot side by side; a slow JVM or Chromium doesn't hold up dot
+        await asyncio.gather(*starting)
+        self.settled()
+
+    async def close(self, grace=10):
+        """Let in-flight renders finish for up to `grace` seconds, then kill the rest"""
+        tasks = [job.task for job in self._in_flight.values()]
+        if tasks:
+            print(f"⏳ Waiting up to {grace:g}s for {len(tasks)} render(s) to finish...")
+            await asyncio.wait(tasks, timeout=grace)
+
+        for process in list(self._processes):
+            self.kill(process)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.cleanup()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the concurrency slots, refusing work when too many are waiting"""
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            raise RendererBusy(
+                f"Renderer busy: {self.concurrency} renders running and {self.max_queue} queued"
+            )
+
+        self._waiting += 1
+        try:
+            with stage('queue'):
+                await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._running += 1
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    def kill(self, process):
+        # The CLI runs in its own session, so this also takes out children
+        # such as mmdc's headless Chromium
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    async def run(self, steps):
+        """Drive shared render steps on the event loop"""
+        return await drive_async(steps, self)
+
+    async def run_tool(self, args, input_data=None, timeout=None):
+        """Run an external CLI as an asyncio subprocess, killing it on timeout or cancel"""
+        if isinstance(input_data, str):
+            input_data = input_data.encode('utf-8')
+        timeout = timeout or self.timeout
+
+        with stage('tool'):
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True
+            )
+            self._processes.add(process)
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(input_data), timeout)
+            except asyncio.TimeoutError:
+                self.kill(process)
+                await process.wait()
+                self.render_timeouts.inc()
+                raise RenderTimeout(f"{args[0]} timed out after {timeout:g}s and was killed")
+            except BaseException:
+                # Cancelled (e.g. shutdown): never leave the process behind
+                self.kill(process)
+                await process.wait()
+                raise
+            finally:
+                self._processes.discard(process)
+
+        return process.returncode, stdout, stderr
+
+    async def call(self, fn, *args):
+        """Run blocking work (warm pools, optimizer, disk cache) on the default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, carry(fn), *args)
+
+    async def pooled(self, steps):
+        """Run nested steps under a concurrency slot of their own"""
+        async with self.slot():
+            return await self.run(steps)
+
+    async def render(self, format_type, code, output_format='svg', theme='dark', session=None):
+        """
+        Render a diagram, serving repeated requests from the render cache.
+
+        Identical in-flight renders share one task. When a session key is
+        given, a newer render for that session cancels the session's older one
+        unless some other caller is still waiting on it.
+        """
+        # Before the cache: a cache hit is still newer than the session's slow render
+        if session is not None:
+            self.supersede(session)
+
+        # Validation and the disk tier are blocking; keep them off the loop
+        key, cached = await self.call(self.lookup, format_type, code, output_format, theme)
+        if cached is not None:
+            return cached
+
+        job = self._in_flight.get(key)
+        if job is None:
+            job = RenderJob(key, asyncio.ensure_future(
+                self._render_and_store(key, format_type, code, output_format, theme)))
+            self._in_flight[key] = job
+            job.task.add_done_callback(lambda _: self._forget(job))
+        job.waiters += 1
+
+        if session is not None:
+            # supersede() above ran before the await; a newer request may have registered since
+            previous = self._sessions.get(session)
+            self._sessions[session] = job
+            job.sessions.add(session)
+            if previous is not None and previous is not job:
+                previous.sessions.discard(session)
+                self._release(previous)
+
+        try:
+            # A client hanging up must not cancel a render other callers share
+            return await asyncio.shield(job.task)
+        except asyncio.CancelledError:
+            if job.task.cancelled():
+                raise RenderCancelled("Render superseded by a newer request")
+            raise
+
+    def supersede(self, session):
+        """A newer request from this session arrived: let go of its in-flight render"""
+        previous = self._sessions.pop(session, None)
+        if previous is not None:
+            previous.sessions.discard(session)
+            self._release(previous)
+
+    def _release(self, job):
+        """Drop one waiter from a superseded job, cancelling it when nobody is left"""
+        job.waiters -= 1
+        if job.waiters <= 0 and not job.task.done():
+            # Cancelling the task kills its process group in run_tool
+            job.task.cancel()
+            self._forget(job)
+
+    def _forget(self, job):
+        if self._in_flight.get(job.key) is job:
+            del self._in_flight[job.key]
+        for session in job.sessions:
+            if self._sessions.get(session) is job:
+                del self._sessions[session]
+        job.sessions.clear()
+
+    async def _render_and_store(self, key, format_type, code, output_format, theme):
+        async with self.slot():
+            try:
+                steps = self.render_steps(key, format_type, code, output_format, theme)
+                return await asyncio.wait_for(self.run(steps), self.timeout)
+            except asyncio.TimeoutError:
+                self.render_failures.inc(format=format_type)
+                raise RenderTimeout(f"Render timed out after {self.timeout:g}s")
+
+    async def render_batch(self, jobs, concurrency=None):
+        """
+        Render many jobs concurrently, yielding (index, data, error) as each finishes.
+
+        At most `concurrency` jobs from this batch are in flight at once; a job
+        that fails never stops the rest of the batch.
+        """
+        concurrency = max(1, int(concurrency or self.concurrency))
+        queued = deque(enumerate(jobs))
+        in_flight = {}
+        try:
+            while queued or in_flight:
+                while queued and len(in_flight) < concurrency:
+                    index, job = queued.popleft()
+                    task = asyncio.ensure_future(
+                        self.render(job['format'], job['code'], job['output'], job['theme']))
+                    in_flight[task] = (index, job)
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, job = in_flight.pop(task)
+                    try:
+                        yield index, task.result(), None
+                    except RendererBusy as e:
+                        if in_flight:
+                            queued.appendleft((index, job))  # wait for our own jobs to free a slot
+                        else:
+                            yield index, None, e
+                    except Exception as e:
+                        yield index, None, e
+        finally:
+            # The client went away; shared renders carry on for the cache
+            for task in in_flight:
+                task.cancel()
+
+    async def tile_pyramid(self, format_type, code, theme='dark'):
+        """Render a diagram as PNG and open it as a tile pyramid; returns (id, pyramid)"""
+        return await self.run(self.tile_pyramid_steps(format_type, code, theme))
+
+    async def tile(self, pyramid_id, z, x, y):
+        """Cut one tile under a concurrency slot"""
+        return await self.run(self.tile_steps(pyramid_id, z, x, y))
+
+    async def export(self, format_type, code, formats, theme='dark'):
+        """Render several output formats of one diagram, laying Graphviz out once"""
+        return await self.run(self.export_steps(format_type, code, formats, theme))
+
+    async def convert_to_drawio(self, code, format_type):
+        """Convert diagram to Draw.io XML format"""
+        return await self.run(self.drawio_steps(code, format_type))
+
+def busy_response(e):
+    """Backpressure response when every render slot is taken"""
+    return web.json_response({'error': str(e)}, status=503, headers={'Retry-After': '1'})
+
+def syntax_error_response(e):
+    """Rejected before rendering: the diagram has syntax errors"""
+    return web.json_response({'error': str(e), 'errors': e.errors}, status=400)
+
+@web.middleware
+async def time_requests(request, handler):
+    """Server-Timing header, stage histogram and slow-request log; ?profile=1 returns a cProfile report"""
+    profile = profile_requested(request.query.get('profile') or request.headers.get('X-Profile'))
+    # Covers whatever else the loop runs meanwhile; profile an otherwise idle server
+    timer = StageTimer(f'{request.method} {request.path}', profile=profile)
+    token = activate(timer)
+    try:
+        response = await handler(request)
+    finally:
+        deactivate(token)
+
+    # A streamed response has already sent its headers; only record its timings
+    if not response.prepared:
+        if timer.profiler is not None:
+            profiled = web.Response(text=timer.profile_report())
+            profiled.headers['X-Profiled-Status'] = str(response.status)
+            response = profiled
+        response.headers['Server-Timing'] = timer.server_timing()
+        response.headers['Timing-Allow-Origin'] = '*'
+    timer.observe(request.app['renderer'].stage_seconds, endpoint=request.match_info.route.name or 'unknown')
+    timer.log_if_slow()
+    return response
+
+@web.middleware
+async def cors_and_metrics(request, handler):
+    """Answer CORS preflights and count requests"""
+    if request.method == 'OPTIONS':
+        response = web.Response()
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, DELETE, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get(
+            'Access-Control-Request-Headers', 'Content-Type')
+    else:
+        try:
+            response = await handler(request)
+        except web.HTTPException as e:
+            response = e
+
+    endpoint = request.match_info.route.name or 'unknown'
+    request.app['renderer'].http_requests.inc(endpoint=endpoint, status=response.status)
+    return response
+
+async def allow_any_origin(request, response):
+    """Allow any origin (as flask-cors does for renderer.py); set as headers go out, so streams get them too"""
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Expose-Headers'] = (
+        'Content-Disposition, ETag, Server-Timing, X-Layout-Engine, X-Profiled-Status')
+
+@web.middleware
+async def compress_responses(request, handler):
+    """Brotli/gzip-encode JSON, SVG and XML bodies for clients that accept it"""
+    response = await handler(request)
+    if response.status != 200 or not isinstance(response, web.Response) or response.body is None:
+        return response
+    if 'Content-Encoding' in response.headers or response.content_type not in COMPRESSIBLE_TYPES:
+        return response
+
+    response.headers.add('Vary', 'Accept-Encoding')
+    encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+    body = response.body
+    if encoding and compressible(response.content_type, len(body)):
+        loop = asyncio.get_running_loop()
+        with stage('compress'):
+            response.body = await loop.run_in_executor(None, compress, body, encoding)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+async def render_diagram(request):
+    """Render diagram endpoint"""
+    renderer = request.app['renderer']
+    try:
+        with stage('parse'):
+            data = await request.json()
+        code = data.get('code', '')
+        format_type = data.get('format', 'graphviz')
+        theme = data.get('theme', 'dark')
+        # Editor session: a newer render for the same session cancels the older one
+        session = data.get('session') or request.headers.get('X-Render-Session')
+
+        if not code:
+            return web.json_response({'error': 'No code provided'}, status=400)
+
+        if format_type not in renderer.backends:
+            return web.json_response({'error': f'Unsupported format: {format_type}'}, status=400)
+
+        # Raw mode returns the SVG itself instead of base64 inside JSON
+        raw = bool(data.get('raw')) or request.headers.get('Accept', '').startswith('image/svg+xml')
+        key = renderer.cache.make_key(format_type, code, theme, 'svg')
+
+        # Chosen once per request; the same engine names the ETag and the response
+        engine = await renderer.call(renderer.layout_engine, code) if format_type == 'graphviz' else None
+        etag = render_etag(key, engine, 'raw' if raw else 'json')
+
+        # Even a 304 answers this session's latest request; its older render is moot
+        if session:
+            renderer.supersede(session)
+
+        # The render key names the output, so an unchanged diagram is known before rendering
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            # Caches must key the 304 the same way as the compressed 200 it revalidates
+            return web.Response(status=304, headers={'ETag': etag, 'Vary': 'Accept-Encoding'})
+
+        diagram_data = await renderer.render(format_type, code, 'svg', theme, session)
+
+        if raw:
+            response = web.Response(body=diagram_data, content_type='image/svg+xml')
+            if engine:
+                response.headers['X-Layout-Engine'] = engine
+        else:
+            with stage('encode'):
+                # Return as base64 data URL
+                b64_data = base64.b64encode(diagram_data).decode()
+                result = {
+                    'success': True,
+                    'image': f'data:image/svg+xml;base64,{b64_data}'
+                }
+                if engine:
+                    result['engine'] = engine
+                response = web.json_response(result)
+        response.headers['ETag'] = etag
+        return response
+
+    except RenderCancelled as e:
+        return web.json_response({'error': str(e), 'superseded': True}, status=409)
+    except DiagramSyntaxError as e:
+        return syntax_error_response(e)
+    except RendererBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return web.json_response({'error': str(e)}, status=500)
+
+async def render_batch(request):
+    """Render many diagrams concurrently, streaming NDJSON results as they finish"""
+    renderer = request.app['renderer']
+    try:
+        normalized, concurrency = parse_batch(await request.json(), renderer.concurrency)
+    except ValueError as e:
+        return web.json_response({'error': str(e)}, status=400)
+
+    response = web.StreamResponse()
+    response.content_type = 'application/x-ndjson'
+    await response.prepare(request)
+
+    runnable = []
+    for index, job in enumerate(normalized):
+        error = batch_rejection(job, renderer.backends)
+        if error is None:
+            runnable.append((index, job))
+        else:
+            await response.write(batch_item(index, job, error=error).encode())
+
+    results = renderer.render_batch([job for _, job in runnable], concurrency)
+    try:
+        async for position, diagram_data, error in results:
+            index, job = runnable[position]
+            engine = None
+            if error is None and job['format'] == 'graphviz':
+                engine = await renderer.call(renderer.layout_engine, job['code'])
+            await response.write(batch_item(index, job, diagram_data, error, engine).encode())
+    finally:
+        # Cancels what is still queued if the client went away
+        await results.aclose()
+    await response.write_eof()
+    return response
+
+async def export_diagram(request):
+    """Export diagram endpoint"""
+    renderer = request.app['renderer']
+    try:
+        with stage('parse'):
+            data = await request.json()
+        code = data.get('code', '')
+        export_format = data.get('format', 'png')
+        diagram_format = data.get('diagramFormat', 'graphviz')
+
+        if not code:
+            return web.json_response({'error': 'No code provided'}, status=400)
+
+        formats = data.get('formats') or [export_format]
+        if isinstance(formats, str):
+            formats = [formats]
+        unknown = [fmt for fmt in formats if fmt not in EXPORT_MIMETYPES]
+        if unknown:
+            return web.json_response({'error': f'Unsupported export format: {", ".join(unknown)}'}, status=400)
+        if diagram_format not in renderer.backends:
+            return web.json_response({'error': f'Unsupported format: {diagram_format}'}, status=400)
+
+        outputs = await renderer.export(diagram_format, code, formats)
+
+        if len(formats) == 1:
+            body = outputs[formats[0]]
+            content_type = EXPORT_MIMETYPES[formats[0]]
+            filename = f'diagram.{formats[0]}'
+        else:
+            import zipfile
+
+            archive = BytesIO()
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as bundle:
+                for fmt in formats:
+                    bundle.writestr(f'diagram.{fmt}', outputs[fmt])
+            body = archive.getvalue()
+            content_type = 'application/zip'
+            filename = 'diagram.zip'
+
+        response = web.Response(body=body, content_type=content_type)
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        if diagram_format == 'graphviz':
+            response.headers['X-Layout-Engine'] = await renderer.call(renderer.layout_engine, code)
+        return response
+
+    except DiagramSyntaxError as e:
+        return syntax_error_response(e)
+    except RendererBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return web.json_response({'error': str(e)}, status=500)
+
+async def create_tiles(request):
+    """Render a diagram for tiled zooming and describe its pyramid"""
+    renderer = request.app['renderer']
+    try:
+        data = await request.json()
+        code = data.get('code', '')
+        format_type = data.get('format', 'graphviz')
+        theme = data.get('theme', 'dark')
+
+        if not code:
+            return web.json_response({'error': 'No code provided'}, status=400)
+        if format_type not in renderer.backends:
+            return web.json_response({'error': f'Unsupported format: {format_type}'}, status=400)
+
+        pyramid_id, pyramid = await renderer.tile_pyramid(format_type, code, theme)
+        result = pyramid.describe()
+        result['id'] = pyramid_id
+        result['url'] = f'/tiles/{pyramid_id}/{{z}}/{{x}}/{{y}}.png'
+        return web.json_response(result)
+
+    except TilesUnavailable as e:
+        return web.json_response({'error': str(e)}, status=501)
+    except PyramidTooLarge as e:
+        return web.json_response({'error': str(e)}, status=413)
+    except DiagramSyntaxError as e:
+        return syntax_error_response(e)
+    except RendererBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return web.json_response({'error': str(e)}, status=500)
+
+async def get_tile(request):
+    """One 256px PNG tile of a pyramid"""
+    renderer = request.app['renderer']
+    match = request.match_info
+    try:
+        tile = await renderer.tile(match['pyramid_id'], int(match['z']), int(match['x']), int(match['y']))
+    except TileNotFound as e:
+        return web.json_response({'error': str(e)}, status=404)
+    except TilesUnavailable as e:
+        return web.json_response({'error': str(e)}, status=501)
+    except PyramidTooLarge as e:
+        return web.json_response({'error': str(e)}, status=413)
+    except RendererBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return web.json_response({'error': str(e)}, status=500)
+
+    response = web.Response(body=tile, content_type='image/png')
+    # Tiles are named by content hash, so they never change
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+async def cache_stats(request):
+    """Render cache statistics endpoint"""
+    renderer = request.app['renderer']
+    return web.json_response(await renderer.call(renderer.cache.stats))
+
+async def cache_invalidate(request):
+    """Invalidate the render cache"""
+    renderer = request.app['renderer']
+    await renderer.call(renderer.cache.invalidate)
+    return web.json_response({'success': True, 'cache': await renderer.call(renderer.cache.stats)})
+
+async def prometheus_metrics(request):
+    """Prometheus metrics endpoint"""
+    return web.Response(text=request.app['renderer'].metrics.expose(),
+                        headers={'Content-Type': METRICS_CONTENT_TYPE})
+
+async def health_check(request):
+    """Health check endpoint"""
+    renderer = request.app['renderer']
+    return web.json_response({
+        'status': 'ok',
+        'message': 'Kre8 Diagram Renderer is running',
+        'plantuml': renderer.plantuml.health(),
+        'mermaid': renderer.mermaid.health(),
+        'backends': renderer.status.report()['backends']
+    })
+
+async def readiness_check(request):
+    """Readiness probe: 200 once start-up has settled and required backends are warm"""
+    report = request.app['renderer'].status.report()
+    return web.json_response(report, status=200 if report['ready'] else 503)
+
+def create_app(renderer=None):
+    """Build the aiohttp application around an AsyncDiagramRenderer"""
+    app = web.Application(middlewares=[time_requests, cors_and_metrics, compress_responses], client_max_size=32 * 1024 * 1024)
+    app['renderer'] = renderer or AsyncDiagramRenderer()
+    grace = float(os.environ.get('RENDER_SHUTDOWN_GRACE', 10))
+
+    async def on_startup(app):
+        # Not awaited: the port opens at once and /ready reports warm-up progress
+        app['startup'] = asyncio.create_task(app['renderer'].start())
+
+    async def on_shutdown(app):
+        app['startup'].cancel()
+        # The listener is already closed; drain what is running
+        await app['renderer'].close(grace)
+
+    app.on_response_prepare.append(allow_any_origin)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+
+    app.router.add_post('/render', render_diagram, name='render_diagram')
+    app.router.add_post('/render/batch', render_batch, name='render_batch')
+    app.router.add_post('/export', export_diagram, name='export_diagram')
+    app.router.add_post('/tiles', create_tiles, name='create_tiles')
+    app.router.add_get(r'/tiles/{pyramid_id}/{z:\d+}/{x:\d+}/{y:\d+}.png', get_tile, name='get_tile')
+    app.router.add_get('/cache', cache_stats, name='cache_stats')
+    app.router.add_delete('/cache', cache_invalidate, name='cache_invalidate')
+    app.router.add_get('/metrics', prometheus_metrics, name='prometheus_metrics')
+    app.router.add_get('/health', health_check, name='health_check')
+    app.router.add_get('/ready', readiness_check, name='readiness_check')
+    return app
+
+def main():
+    """Main entry point"""
+    port = int(os.environ.get('RENDERER_PORT', 8000))
+    app = create_app()
+    renderer = app['renderer']
+
+    print("🚀 Starting Kre8 Diagram Renderer Server (asyncio)...")
+    print(f"📡 Listening on http://localhost:{port}")
+    print("\nEndpoints:")
+    print("  POST /render  - Render diagram")
+    print("  POST /render/batch - Render many diagrams (NDJSON stream)")
+    print("  POST /export  - Export diagram")
+    print("  POST /tiles   - Tile pyramid for zooming large diagrams")
+    print("  GET  /tiles/<id>/<z>/<x>/<y>.png - One tile")
+    print("  GET  /cache   - Render cache stats")
+    print("  DELETE /cache - Invalidate render cache")
+    print("  GET  /metrics - Prometheus metrics")
+    print("  GET  /health  - Health check")
+    print("  GET  /ready   - Readiness probe")
+    print(f"\n⚙️  {renderer.concurrency} concurrent renders, queue of {renderer.max_queue}, "
+          f"{renderer.timeout:g}s timeout")
+    print("\nWaiting for requests...\n")
+
+    # run_app handles SIGINT/SIGTERM: stop accepting, run on_shutdown, exit
+    web.run_app(app, host='0.0.0.0', port=port, print=None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Render backend discovery and readiness
+
+Shared by the threaded and the asyncio renderers: finds out at start-up which
+diagram tools are installed, instead of on the first request through a
+FileNotFoundError, and tracks each backend from discovery through warm-up so
+/ready can tell orchestration the moment the service can take traffic.
+"""
+
+import os
+import shlex
+import shutil
+import threading
+import time
+
+from mermaid_engine import find_mermaid_cli
+
+# Executables each backend needs on PATH
+TOOLS = {
+    'graphviz': ['dot', 'neato'],
+    'mermaid': ['mmdc'],
+    'd2': ['d2'],
+    'plantuml': shlex.split(os.environ.get('PLANTUML_CMD', 'plantuml'))[:1],
+}
+
+INSTALL_HINTS = {
+    'graphviz': "Graphviz not installed. Install with: brew install graphviz / apt-get install graphviz",
+    'mermaid': "Mermaid CLI (mmdc) not installed. Install with: npm install -g @mermaid-js/mermaid-cli",
+    'd2': "D2 CLI not installed. Install from: https://d2lang.com/",
+    'plantuml': "PlantUML not installed. Install from: https://plantuml.com/",
+}
+
+# Smallest useful diagram per backend, rendered once at start-up
+WARMUP_SOURCES = {
+    'graphviz': 'digraph { a -> b; }',
+    'mermaid': 'graph TD\n  A --> B',
+    'd2': 'a -> b',
+    'plantuml': '@startuml\nA -> B\n@enduml',
+}
+
+PREWARM = os.environ.get('RENDER_PREWARM', '1') != '0'
+REQUIRED_BACKENDS = [name.strip() for name in
+                     os.environ.get('RENDER_REQUIRED_BACKENDS', 'graphviz').split(',') if name.strip()]
+
+
+def discover_tools():
+    """Map each backend to the path of its executable, or None when missing"""
+    found = {}
+    for backend, tools in TOOLS.items():
+        paths = [shutil.which(tool) for tool in tools]
+        found[backend] = paths[0] if paths and all(paths) else None
+
+    # The warm Mermaid pool drives the mermaid-cli package directly, no mmdc needed
+    if found['mermaid'] is None:
+        found['mermaid'] = find_mermaid_cli()
+    return found
+
+
+class BackendStatus:
+    """Per-backend state: pending -> starting -> warming -> ready | failed | missing"""
+
+    def __init__(self, backends, required=None):
+        self.required = list(REQUIRED_BACKENDS if required is None else required)
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self._states = {backend: {'state': 'pending'} for backend in backends}
+        self._lock = threading.Lock()
+
+    def set(self, backend, state, **details):
+        with self._lock:
+            self._states[backend] = dict(details, state=state)
+
+    def state(self, backend):
+        with self._lock:
+            return self._states.get(backend, {}).get('state')
+
+    def missing(self, backend):
+        return self.state(backend) == 'missing'
+
+    def finish(self):
+        self.finished_at = time.monotonic()
+
+    def ready(self):
+        """Start-up is done and every required backend can render"""
+        if self.finished_at is None:
+            return False
+        with self._lock:
+            return all(self._states.get(backend, {}).get('state') == 'ready' for backend in self.required)
+
+    def report(self):
+        with self._lock:
+            backends = {backend: dict(state) for backend, state in self._states.items()}
+        startup = self.finished_at if self.finished_at is not None else time.monotonic()
+        return {
+            'ready': self.ready(),
+            'required': self.required,
+            'startup_ms': round((startup - self.started_at) * 1000, 1),
+            'backends': backends,
+        }
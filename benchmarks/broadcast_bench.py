@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Room fan-out benchmark: one response broadcast to every subscriber of a diagram
+
+Starts ClaudeCodeServer in-process against a scratch database, subscribes N
+viewers to one diagram (plus optional viewers that never read), and times
+DiagramDatabase.add_response() -> diagram_code frame received by every
+reading viewer. Slow viewers must not hold up the rest.
+
+Usage:
+    python benchmarks/broadcast_bench.py --viewers 10 100 300 --updates 20 --slow 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import websockets
+
+from database import DiagramDatabase
+from relay_bench import free_port, summarize
+from server import ClaudeCodeServer
+
+ROOM = 'bench'
+
+
+def sample_code(update, nodes):
+    edges = ' '.join(f'n{i} -> n{i + 1};' for i in range(nodes))
+    return f'digraph G {{ {edges} // update {update}\n}}'
+
+
+async def subscribe(url, **connect_args):
+    ws = await websockets.connect(url, **connect_args)
+    await ws.recv()  # greeting
+    await ws.send(json.dumps({'type': 'subscribe', 'diagramId': ROOM}))
+    await ws.recv()  # subscribed
+    return ws
+
+
+async def next_diagram(ws):
+    while True:
+        message = json.loads(await ws.recv())
+        if message.get('type') == 'diagram_code':
+            return message['requestId']
+
+
+async def fan_out(viewers, updates, slow, nodes, db_path):
+    ws_port = free_port()
+    notify_port = free_port(socket.SOCK_DGRAM)
+
+    server = ClaudeCodeServer(db_path=db_path, notify_port=notify_port)
+    server.render_on_delivery = False
+    server_task = asyncio.create_task(server.start_server('127.0.0.1', ws_port))
+    await asyncio.sleep(0.3)
+
+    url = f'ws://127.0.0.1:{ws_port}'
+    responder = DiagramDatabase(db_path, notify_port=notify_port)
+    loop = asyncio.get_running_loop()
+    delivery_ms = []
+
+    try:
+        readers = [await subscribe(url) for _ in range(viewers)]
+        # Viewers that stop reading after subscribing
+        stalled = [await subscribe(url, max_queue=1, read_limit=1024) for _ in range(slow)]
+
+        requester = readers[0]
+        for update in range(updates):
+            await requester.send(json.dumps({
+                'type': 'chat', 'message': f'bench {update}', 'context': {'diagramId': ROOM}
+            }))
+            while True:
+                ack = json.loads(await requester.recv())
+                if 'saved' in ack.get('content', ''):
+                    break
+            request_id = int(ack['content'].split('#')[1].split()[0])
+
+            start = time.perf_counter()
+            await loop.run_in_executor(None, responder.add_response, request_id,
+                                       sample_code(update, nodes))
+            received = await asyncio.gather(*(next_diagram(ws) for ws in readers))
+            delivery_ms.append((time.perf_counter() - start) * 1000)
+            assert set(received) == {request_id}
+
+        for ws in readers + stalled:
+            await ws.close()
+    finally:
+        server_task.cancel()
+        responder.close()
+
+    return {
+        'viewers': viewers,
+        'slow_viewers': slow,
+        'updates': updates,
+        'delivery_to_all': summarize(delivery_ms),
+        'coalesced': sum(value for *_, value in server.updates_coalesced.samples()),
+        'dropped': sum(value for *_, value in server.updates_dropped.samples()),
+    }
+
+
+def run_broadcast_bench(viewer_counts=(10, 100, 300), updates=20, slow=5, nodes=50):
+    results = {}
+    for viewers in viewer_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            result = asyncio.run(fan_out(viewers, updates, slow, nodes, os.path.join(tmp, 'fanout.db')))
+        results[str(viewers)] = result
+        stats = result['delivery_to_all']
+        print(f"👥 {viewers:>4} viewers: p50 {stats['p50_ms']:>8} ms   p95 {stats['p95_ms']:>8} ms   "
+              f"coalesced {result['coalesced']}   dropped {result['dropped']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Diagram room broadcast benchmark')
+    parser.add_argument('--viewers', type=int, nargs='+', default=[10, 100, 300])
+    parser.add_argument('--updates', type=int, default=20)
+    parser.add_argument('--slow', type=int, default=5, help='subscribers that never read')
+    parser.add_argument('--nodes', type=int, default=50, help='edges in each broadcast diagram')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run_broadcast_bench(args.viewers, args.updates, args.slow, args.nodes)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Responder scaling benchmark for claim_next_request / complete_request
+
+Seeds a scratch database with pending requests and drains it with 1, 2, 4...
+worker processes, each claiming under a lease, "handling" the request for a
+fixed time and completing it. Reports jobs/s per worker count and checks that
+no request was answered twice.
+
+Usage:
+    python benchmarks/claim_bench.py --workers 1 2 4 8 --jobs 400 --work-ms 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DiagramDatabase
+
+SAMPLE_CODE = 'digraph G { A -> B; }'
+
+
+def drain(args):
+    """One responder: claim, simulate the handler, complete, until the queue is empty"""
+    db_path, worker_id, work_ms = args
+    db = DiagramDatabase(db_path, notify_port=0)
+    handled = 0
+    while True:
+        request = db.claim_next_request(worker_id, lease_seconds=60)
+        if request is None:
+            break
+        time.sleep(work_ms / 1000)
+        if db.complete_request(request['id'], worker_id, SAMPLE_CODE):
+            handled += 1
+    db.close()
+    return handled
+
+
+def run_claim_bench(worker_counts=(1, 2, 4, 8), jobs=400, work_ms=20):
+    results = {}
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'bench.db')
+            db = DiagramDatabase(db_path, notify_port=0)
+            db.add_requests([{'message': f'request {i}'} for i in range(jobs)])
+
+            start = time.perf_counter()
+            with Pool(workers) as pool:
+                handled = pool.map(drain, [(db_path, f'worker-{i}', work_ms) for i in range(workers)])
+            elapsed = time.perf_counter() - start
+
+            answered = db.connection().execute(
+                'SELECT COUNT(*), COUNT(DISTINCT request_id) FROM responses').fetchone()
+            db.close()
+
+        results[str(workers)] = {
+            'jobs_per_s': round(jobs / elapsed, 2),
+            'elapsed_ms': round(elapsed * 1000, 3),
+            'per_worker': handled,
+            'duplicates': answered[0] - answered[1],
+        }
+        print(f"✓  {workers:>3} worker(s): {results[str(workers)]['jobs_per_s']:>8} jobs/s   "
+              f"duplicates {results[str(workers)]['duplicates']}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Leased responder scaling benchmark')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--jobs', type=int, default=400)
+    parser.add_argument('--work-ms', type=float, default=20, help='simulated handler time per request')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run_claim_bench(args.workers, args.jobs, args.work_ms)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for DiagramDatabase per-call latency
+
+Seeds a scratch database with N requests/responses and times the hot calls.
+Run with --without-indexes to see the cost of the pre-migration schema.
+
+Usage:
+    python benchmarks/db_bench.py                    # 10k, 100k, 1M rows
+    python benchmarks/db_bench.py --rows 10000 --json results.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DiagramDatabase
+
+SAMPLE_CODE = 'digraph G {\n  A -> B;\n  B -> C;\n}\n'
+
+
+def seed(db, rows, pending=50):
+    """Insert rows completed requests with responses plus a few pending ones"""
+    conn = db.connection()
+    with conn:
+        conn.executemany(
+            '''INSERT INTO requests (message, diagram_type, format_type, current_code, status,
+                                     created_at, processed_at)
+               VALUES (?, 'architecture', 'graphviz', ?, 'completed',
+                       datetime('now', '-' || ? || ' minutes'), CURRENT_TIMESTAMP)''',
+            ((f'request {i}', SAMPLE_CODE, rows - i) for i in range(rows))
+        )
+        conn.executemany(
+            'INSERT INTO responses (request_id, diagram_code) VALUES (?, ?)',
+            ((i + 1, SAMPLE_CODE) for i in range(rows))
+        )
+    for i in range(pending):
+        db.add_request(f'pending {i}', current_code=SAMPLE_CODE)
+
+
+def time_call(fn, iterations):
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'mean_ms': round(statistics.mean(samples), 4),
+        'p50_ms': round(samples[len(samples) // 2], 4),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 4),
+    }
+
+
+def bench(rows, iterations, without_indexes):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DiagramDatabase(os.path.join(tmp, 'bench.db'), notify_port=None)
+        if without_indexes:
+            with db.connection() as conn:
+                for (name,) in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall():
+                    conn.execute(f'DROP INDEX {name}')
+
+        seed(db, rows)
+
+        results = {
+            'get_pending_requests': time_call(lambda i: db.get_pending_requests(), iterations),
+            'get_latest_pending_request': time_call(lambda i: db.get_latest_pending_request(), iterations),
+            'get_response': time_call(lambda i: db.get_response((i * 7919) % rows + 1), iterations),
+            'add_request': time_call(lambda i: db.add_request(f'bench {i}', current_code=SAMPLE_CODE), iterations),
+            'add_response': time_call(lambda i: db.add_response(rows + i + 1, SAMPLE_CODE), iterations),
+            'clear_old_requests': time_call(lambda i: db.clear_old_requests(days=3650), min(iterations, 20)),
+        }
+        db.close()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DiagramDatabase per-call latency benchmark')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--without-indexes', action='store_true', help='drop the migration indexes first')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    report = {'without_indexes': args.without_indexes, 'results': {}}
+
+    for rows in args.rows:
+        print(f"\n📊 {rows:,} rows")
+        results = bench(rows, args.iterations, args.without_indexes)
+        report['results'][rows] = results
+        for name, stats in results.items():
+            print(f"   {name:<28} mean {stats['mean_ms']:>9.3f} ms   "
+                  f"p50 {stats['p50_ms']:>9.3f} ms   p95 {stats['p95_ms']:>9.3f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Synthetic diagram generators for benchmarks
+
+Each generator returns source for a connected graph with `nodes` nodes and
+roughly `nodes * edge_factor` edges. A fixed seed keeps runs reproducible.
+"""
+
+import random
+
+
+def _edges(nodes, edge_factor=1.5, seed=42):
+    rng = random.Random(seed)
+    # Spanning tree first so the graph is connected, then extra random edges
+    edges = [(rng.randrange(i), i) for i in range(1, nodes)]
+    extra = max(0, int(nodes * edge_factor) - len(edges))
+    edges.extend((rng.randrange(nodes), rng.randrange(nodes)) for _ in range(extra))
+    return edges
+
+
+def graphviz_diagram(nodes, edge_factor=1.5, seed=42):
+    lines = ['digraph G {', '  node [shape=box];']
+    lines.extend(f'  n{a} -> n{b};' for a, b in _edges(nodes, edge_factor, seed))
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def mermaid_diagram(nodes, edge_factor=1.5, seed=42):
+    lines = ['graph TD']
+    lines.extend(f'  n{a} --> n{b}' for a, b in _edges(nodes, edge_factor, seed))
+    return '\n'.join(lines)
+
+
+def d2_diagram(nodes, edge_factor=1.5, seed=42):
+    return '\n'.join(f'n{a} -> n{b}' for a, b in _edges(nodes, edge_factor, seed))
+
+
+def plantuml_diagram(nodes, edge_factor=1.5, seed=42):
+    lines = ['@startuml']
+    lines.extend(f'[n{a}] --> [n{b}]' for a, b in _edges(nodes, edge_factor, seed))
+    lines.append('@enduml')
+    return '\n'.join(lines)
+
+
+GENERATORS = {
+    'graphviz': graphviz_diagram,
+    'mermaid': mermaid_diagram,
+    'd2': d2_diagram,
+    'plantuml': plantuml_diagram,
+}
+
+
+def generate(format_type, nodes, edge_factor=1.5, seed=42):
+    """Generate a synthetic diagram of the given format and size"""
+    return GENERATORS[format_type](nodes, edge_factor, seed)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+End-to-end relay benchmark: add_request -> add_response -> WebSocket delivery
+
+Starts ClaudeCodeServer in-process against a scratch database, connects a
+client, and for each iteration times
+  - request:  client send -> request saved and acknowledged
+  - delivery: DiagramDatabase.add_response() -> diagram_code frame received
+  - total:    client send -> diagram_code frame received
+
+Usage:
+    python benchmarks/relay_bench.py --iterations 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import websockets
+
+from database import DiagramDatabase
+from server import ClaudeCodeServer
+
+SAMPLE_CODE = 'digraph G { A -> B; B -> C; }'
+
+
+def free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[max(0, int(len(samples) * 0.95) - 1)], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+async def relay_round_trips(iterations, db_path):
+    ws_port = free_port()
+    notify_port = free_port(socket.SOCK_DGRAM)
+
+    server = ClaudeCodeServer(db_path=db_path, notify_port=notify_port)
+    server_task = asyncio.create_task(server.start_server('127.0.0.1', ws_port))
+    await asyncio.sleep(0.3)
+
+    responder = DiagramDatabase(db_path, notify_port=notify_port)
+    loop = asyncio.get_running_loop()
+    request_ms, delivery_ms, total_ms = [], [], []
+
+    try:
+        async with websockets.connect(f'ws://127.0.0.1:{ws_port}') as ws:
+            await ws.recv()  # greeting
+
+            for i in range(iterations):
+                start = time.perf_counter()
+                await ws.send(json.dumps({'type': 'chat', 'message': f'bench {i}', 'context': {}}))
+                ack = json.loads(await ws.recv())
+                acked = time.perf_counter()
+                request_id = int(ack['content'].split('#')[1].split()[0])
+
+                answered = time.perf_counter()
+                await loop.run_in_executor(None, responder.add_response, request_id, SAMPLE_CODE)
+
+                while True:
+                    message = json.loads(await ws.recv())
+                    if message.get('type') == 'diagram_code':
+                        break
+                done = time.perf_counter()
+
+                request_ms.append((acked - start) * 1000)
+                delivery_ms.append((done - answered) * 1000)
+                total_ms.append((done - start) * 1000)
+    finally:
+        server_task.cancel()
+        responder.close()
+
+    return {
+        'iterations': iterations,
+        'request': summarize(request_ms),
+        'delivery': summarize(delivery_ms),
+        'total': summarize(total_ms),
+    }
+
+
+def run_relay_bench(iterations=100):
+    with tempfile.TemporaryDirectory() as tmp:
+        return asyncio.run(relay_round_trips(iterations, os.path.join(tmp, 'relay.db')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Request/response relay benchmark')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run_relay_bench(args.iterations)
+    for stage in ('request', 'delivery', 'total'):
+        stats = results[stage]
+        print(f"   {stage:<9} p50 {stats['p50_ms']:>8} ms   p95 {stats['p95_ms']:>8} ms   max {stats['max_ms']:>8} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
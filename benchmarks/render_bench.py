@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Rendering benchmark for /render and /export
+
+Drives the renderer's Flask app in-process with synthetic diagrams of growing
+size and records latency, throughput and peak RSS per format. The render cache
+is cleared before every request so each sample pays for a real render.
+Formats whose CLI/engine is not installed are reported as skipped. For each
+size it also reports the bytes one preview costs on the wire: unoptimized vs
+optimized SVG, base64 JSON vs raw mode, gzip/brotli, and a 304 revalidation.
+
+Usage:
+    python benchmarks/render_bench.py --formats graphviz d2 --sizes 10 100 1000
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RENDER_CACHE_DIR', '')
+
+from diagrams import generate
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+FORMATS = ['graphviz', 'mermaid', 'd2', 'plantuml']
+
+
+def backend_available(renderer, format_type):
+    """Return None if the format can be rendered here, else a skip reason"""
+    info = renderer.status.report()['backends'].get(format_type)
+    if info is None:
+        return 'unknown format'
+    if info['state'] == 'missing':
+        return f'{format_type} not installed'
+    if info['state'] != 'ready':
+        return info.get('error') or f"{format_type} {info['state']}"
+    return None
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process and of its child processes"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == 'darwin':  # reported in bytes on macOS
+        own, children = own // 1024, children // 1024
+    return {'self_kb': own, 'children_kb': children}
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[max(0, int(len(samples) * 0.95) - 1)], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def timed_post(client, cache, path, payload):
+    cache.invalidate()
+    start = time.perf_counter()
+    response = client.post(path, json=payload)
+    elapsed = (time.perf_counter() - start) * 1000
+    return response, elapsed
+
+
+def bench_endpoint(app, cache, path, payload, iterations, concurrency):
+    client = app.test_client()
+    latencies = []
+    sizes = []
+    errors = []
+
+    for _ in range(iterations):
+        response, elapsed = timed_post(client, cache, path, payload)
+        if response.status_code != 200:
+            errors.append(response.get_json(silent=True) or response.status_code)
+            break
+        latencies.append(elapsed)
+        sizes.append(len(response.get_data()))
+
+    if errors:
+        return {'error': str(errors[0])}
+
+    # Throughput: `concurrency` clients each issuing `iterations` requests
+    def worker(_):
+        worker_client = app.test_client()
+        for _ in range(iterations):
+            worker_client.post(path, json=payload)
+
+    cache.invalidate()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = summarize(latencies)
+    result['response_bytes'] = sizes[-1]
+    result['throughput_rps'] = round(concurrency * iterations / elapsed, 2)
+    return result
+
+
+def payload_bytes(app, renderer, format_type, code):
+    """Response sizes of one /render by optimization, response mode and encoding"""
+    client = app.test_client()
+    payload = {'code': code, 'format': format_type}
+    raw_payload = dict(payload, raw=True)
+
+    def post(body, **headers):
+        return client.post('/render', json=body, headers=headers)
+
+    optimize = renderer.optimize_svg
+    renderer.optimize_svg = False
+    try:
+        renderer.cache.invalidate()
+        sizes = {
+            'unoptimized_json': len(post(payload).get_data()),
+            'unoptimized_svg': len(post(raw_payload).get_data()),
+        }
+    finally:
+        renderer.optimize_svg = optimize
+
+    renderer.cache.invalidate()
+    raw = post(raw_payload)
+    sizes['optimized_json'] = len(post(payload).get_data())
+    sizes['optimized_svg'] = len(raw.get_data())
+    for encoding in ('gzip', 'br'):
+        response = post(raw_payload, **{'Accept-Encoding': encoding})
+        if response.headers.get('Content-Encoding') == encoding:
+            sizes[f'optimized_svg_{encoding}'] = len(response.get_data())
+    sizes['not_modified'] = len(post(raw_payload, **{'If-None-Match': raw.headers['ETag']}).get_data())
+
+    # What a preview used to cost (unoptimized, base64 JSON) vs the best the client can get now
+    best = min(sizes[name] for name in sizes if name.startswith('optimized_'))
+    sizes['saved_pct'] = round(100 * (1 - best / sizes['unoptimized_json']), 1)
+    return sizes
+
+
+def run_render_bench(formats=FORMATS, sizes=DEFAULT_SIZES, iterations=5, concurrency=4,
+                     export_format='png', max_seconds=30.0):
+    import renderer as renderer_module
+
+    app = renderer_module.app
+    renderer = renderer_module.renderer
+    # Measure warm backends, not their cold start
+    renderer.start()
+    renderer.wait_started()
+    results = {}
+
+    for format_type in formats:
+        skip = backend_available(renderer, format_type)
+        if skip:
+            results[format_type] = {'skipped': skip}
+            print(f"⏭  {format_type}: skipped ({skip})")
+            continue
+
+        results[format_type] = {}
+        for size in sizes:
+            code = generate(format_type, size)
+            entry = {'nodes': size, 'source_bytes': len(code)}
+
+            render = bench_endpoint(app, renderer.cache, '/render',
+                                    {'code': code, 'format': format_type}, iterations, concurrency)
+            entry['render'] = render
+
+            if 'error' not in render:
+                entry['bytes'] = payload_bytes(app, renderer, format_type, code)
+                entry['export'] = bench_endpoint(
+                    app, renderer.cache, '/export',
+                    {'code': code, 'format': export_format, 'diagramFormat': format_type},
+                    iterations, concurrency)
+
+            entry['peak_rss'] = peak_rss_kb()
+            results[format_type][str(size)] = entry
+
+            if 'error' in render:
+                print(f"✗  {format_type} {size:>6} nodes: {render['error'][:80]}")
+                break
+
+            print(f"✓  {format_type} {size:>6} nodes: render p50 {render['p50_ms']:>9} ms   "
+                  f"{render['throughput_rps']:>7} req/s")
+            wire = entry['bytes']
+            compressed = wire.get('optimized_svg_br', wire.get('optimized_svg_gzip'))
+            print(f"   bytes: json {wire['unoptimized_json']} -> raw {wire['optimized_svg']}"
+                  f"{f' -> compressed {compressed}' if compressed else ''}   "
+                  f"304 {wire['not_modified']}   saved {wire['saved_pct']}%")
+
+            # Don't try bigger graphs once a single render blows the budget
+            if render['max_ms'] / 1000 > max_seconds:
+                for larger in sizes[sizes.index(size) + 1:]:
+                    results[format_type][str(larger)] = {'skipped': f'over {max_seconds}s budget'}
+                break
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Renderer latency/throughput/RSS benchmark')
+    parser.add_argument('--formats', nargs='+', default=FORMATS, choices=FORMATS)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--export-format', default='png')
+    parser.add_argument('--max-seconds', type=float, default=30.0,
+                        help='stop growing a format once one render takes longer than this')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run_render_bench(args.formats, args.sizes, args.iterations, args.concurrency,
+                               args.export_format, args.max_seconds)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
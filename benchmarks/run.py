@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite and emit one JSON report
+
+Combines the render benchmark (/render and /export per format and size), the
+server load benchmark (threaded vs asyncio renderer under concurrent /render)
+and the relay benchmark (add_request -> add_response -> WebSocket delivery), tagged
+with the git commit and machine details so runs can be compared.
+
+Usage:
+    python benchmarks/run.py --json results/today.json
+    python benchmarks/run.py --json results/new.json --compare results/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from render_bench import run_render_bench, DEFAULT_SIZES, FORMATS
+from relay_bench import run_relay_bench
+from server_load_bench import run_server_load_bench
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=REPO_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def flatten(report, prefix=''):
+    """Yield (path, value) for every *_ms / *_rps number in a report"""
+    for key, value in report.items():
+        path = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, path)
+        elif isinstance(value, (int, float)) and key.endswith(('_ms', '_rps')):
+            yield path, value
+
+
+def compare(baseline, current):
+    """Print per-metric change between two reports"""
+    old = dict(flatten(baseline['results']))
+    print(f"\n📊 Compared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    for path, value in flatten(current['results']):
+        if path not in old or not old[path]:
+            continue
+        change = (value - old[path]) / old[path] * 100
+        # Lower is better for latency, higher is better for throughput
+        worse = change > 0 if path.endswith('_ms') else change < 0
+        marker = '⚠' if worse and abs(change) >= 10 else ' '
+        print(f"  {marker} {path:<60} {old[path]:>10} -> {value:>10}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kre8 benchmark suite')
+    parser.add_argument('--formats', nargs='+', default=FORMATS, choices=FORMATS)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--relay-iterations', type=int, default=100)
+    parser.add_argument('--max-seconds', type=float, default=30.0)
+    parser.add_argument('--skip-render', action='store_true')
+    parser.add_argument('--skip-relay', action='store_true')
+    parser.add_argument('--load-requests', type=int, default=200)
+    parser.add_argument('--skip-server-load', action='store_true')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--compare', help='baseline report to compare against')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes': args.sizes,
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+        },
+        'results': {},
+    }
+
+    if not args.skip_render:
+        print("🎨 Render benchmark")
+        report['results']['render'] = run_render_bench(
+            args.formats, args.sizes, args.iterations, args.concurrency, max_seconds=args.max_seconds)
+
+    if not args.skip_server_load:
+        print("\n⚖️  Server load benchmark")
+        report['results']['server_load'] = run_server_load_bench(requests=args.load_requests)
+
+    if not args.skip_relay:
+        print("\n🔁 Relay benchmark")
+        report['results']['relay'] = run_relay_bench(args.relay_iterations)
+
+    output = json.dumps(report, indent=2)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            f.write(output)
+        print(f"\n✓ Report written to {args.json}")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+HTTP load benchmark: threaded renderer.py vs asyncio async_renderer.py
+
+Starts each server as a subprocess on a free port and fires /render requests
+at increasing concurrency. Every request carries unique DOT source so it pays
+for a real `dot` run instead of a cache hit. Reports latency, throughput and
+how many requests were shed with 503.
+
+Usage:
+    python benchmarks/server_load_bench.py --concurrency 1 8 32 --requests 200
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'threaded': 'renderer.py',
+    'async': 'async_renderer.py',
+}
+
+SAMPLE_CODE = 'digraph G {{ n{0} -> A; A -> B; B -> C; C -> n{0}; }}'
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[max(0, int(len(samples) * 0.95) - 1)], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def start_server(script, port, timeout=60):
+    env = dict(os.environ, RENDERER_PORT=str(port), RENDER_CACHE_DIR='')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, script)],
+        cwd=REPO_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True  # the Flask reloader forks a child; stop both
+    )
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1)
+            return process
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+
+    stop_server(process)
+    raise RuntimeError(f"{script} did not become healthy within {timeout}s")
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def post_render(port, code):
+    body = json.dumps({'code': code, 'format': 'graphviz'}).encode()
+    req = urllib.request.Request(
+        f'http://127.0.0.1:{port}/render', data=body, headers={'Content-Type': 'application/json'}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, (time.perf_counter() - start) * 1000
+
+
+def load(port, concurrency, requests, offset):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(
+            lambda i: post_render(port, SAMPLE_CODE.format(offset + i)), range(requests)
+        ))
+        elapsed = time.perf_counter() - start
+
+    ok = [ms for status, ms in results if status == 200]
+    result = summarize(ok) if ok else {}
+    result['ok'] = len(ok)
+    result['shed_503'] = sum(1 for status, _ in results if status == 503)
+    result['errors'] = sum(1 for status, _ in results if status not in (200, 503))
+    result['throughput_rps'] = round(len(ok) / elapsed, 2)
+    return result
+
+
+def run_server_load_bench(concurrency_levels=(1, 8, 32), requests=200, servers=tuple(SERVERS)):
+    if not shutil.which('dot'):
+        print("⏭  server load: skipped (dot not installed)")
+        return {'skipped': 'dot not installed'}
+
+    results = {}
+    for name in servers:
+        port = free_port()
+        try:
+            process = start_server(SERVERS[name], port)
+        except RuntimeError as e:
+            print(f"✗  {name}: {e}")
+            results[name] = {'error': str(e)}
+            continue
+
+        results[name] = {}
+        try:
+            for level, concurrency in enumerate(concurrency_levels):
+                # Fresh source per run so nothing is served from the cache
+                result = load(port, concurrency, requests, offset=level * requests)
+                results[name][str(concurrency)] = result
+                print(f"✓  {name:<8} c={concurrency:<4} {result['throughput_rps']:>8} req/s   "
+                      f"p95 {result.get('p95_ms', '-'):>9} ms   503s {result['shed_503']}")
+        finally:
+            stop_server(process)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Threaded vs asyncio renderer load benchmark')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--servers', nargs='+', default=list(SERVERS), choices=list(SERVERS))
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run_server_load_bench(args.concurrency, args.requests, args.servers)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+WebSocket server load benchmark
+
+Opens many simultaneous clients against a running server.py and measures the
+time from sending a request to receiving its "saved" acknowledgement, which
+includes the database insert. A blocked event loop shows up as tail latency.
+
+Usage:
+    python server.py &
+    python benchmarks/ws_load_bench.py --clients 200 --messages 10
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+
+async def client(url, messages, latencies):
+    async with websockets.connect(url) as ws:
+        await ws.recv()  # greeting
+        for i in range(messages):
+            start = time.perf_counter()
+            await ws.send(json.dumps({
+                'type': 'chat',
+                'message': f'load test {i}',
+                'context': {'format': 'graphviz', 'currentCode': 'digraph { A -> B; }'}
+            }))
+            while True:
+                reply = json.loads(await ws.recv())
+                if reply.get('type') in ('message', 'error'):
+                    break
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run(url, clients, messages):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(url, messages, latencies) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'messages_per_client': messages,
+        'requests': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'p50_ms': round(latencies[len(latencies) // 2], 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        'max_ms': round(latencies[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebSocket relay load benchmark')
+    parser.add_argument('--url', default='ws://localhost:8765')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--messages', type=int, default=10)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = []
+    for clients in args.clients:
+        result = asyncio.run(run(args.url, clients, args.messages))
+        results.append(result)
+        print(f"👥 {clients:>4} clients: {result['throughput_rps']:>8} req/s   "
+              f"p50 {result['p50_ms']:>8} ms   p95 {result['p95_ms']:>8} ms   p99 {result['p99_ms']:>8} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,89 +3,270 @@
 Database handler for Claude Code communication
 """
 
+import asyncio
+import hashlib
+import os
+import socket
 import sqlite3
+import threading
 import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from datetime import datetime
 from pathlib import Path
+from timing import stage
+
+# server.py listens here for "response ready" signals
+NOTIFY_HOST = '127.0.0.1'
+NOTIFY_PORT = int(os.environ.get('RESPONSE_NOTIFY_PORT', 8766))
+
+# A claimed request whose lease lapses this many times is given up on
+MAX_ATTEMPTS = int(os.environ.get('REQUEST_MAX_ATTEMPTS', 5))
+
+# Retention work is done in short transactions of this many rows
+PRUNE_BATCH = 500
+
+def store_code(conn, code):
+    """Store diagram code once, compressed, and return its content hash"""
+    if not code:
+        return None
+    raw = code.encode('utf-8')
+    digest = hashlib.sha256(raw).hexdigest()
+    conn.execute(
+        'INSERT OR IGNORE INTO blobs (hash, data, size) VALUES (?, ?, ?)',
+        (digest, zlib.compress(raw, 6), len(raw))
+    )
+    return digest
+
+def migrate_code_to_blobs(conn):
+    """Move inline current_code/diagram_code into the content-addressed blob table"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL
+        )
+    ''')
+    # Before migrations were transactional, a crash here could leave a column
+    # behind at version 2; skip columns that already exist
+    for table in ('requests', 'responses'):
+        columns = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if 'code_hash' not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN code_hash TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_requests_code_hash ON requests(code_hash)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_code_hash ON responses(code_hash)')
+
+    for table, column in (('requests', 'current_code'), ('responses', 'diagram_code')):
+        last_id = 0
+        while True:
+            rows = conn.execute(f'''
+                SELECT id, {column} FROM {table}
+                WHERE id > ? AND {column} != ''
+                ORDER BY id LIMIT ?
+            ''', (last_id, PRUNE_BATCH)).fetchall()
+            if not rows:
+                break
+            conn.executemany(
+                f"UPDATE {table} SET {column} = '', code_hash = ? WHERE id = ?",
+                [(store_code(conn, row[column]), row['id']) for row in rows]
+            )
+            last_id = rows[-1]['id']
+
+def enable_incremental_vacuum(conn):
+    """Let retention hand freed pages back with incremental_vacuum"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        # Existing files need one full VACUUM for the setting to take effect
+        conn.execute('VACUUM')
+
+# VACUUM cannot run inside a transaction; the step is safe to repeat instead
+enable_incremental_vacuum.outside_transaction = True
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# A step is a list of SQL statements or a function taking the connection.
+# Each step and its version bump commit together, so a crash mid-step
+# leaves the database at the previous version rather than half-migrated.
+MIGRATIONS = [
+    # 1: indexes for the pending-queue, response lookup and retention queries
+    [
+        'CREATE INDEX IF NOT EXISTS idx_requests_status_created ON requests(status, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_requests_created ON requests(created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_responses_request ON responses(request_id, created_at)',
+    ],
+    # 2: leases so several responders can claim requests without racing
+    [
+        'ALTER TABLE requests ADD COLUMN claimed_by TEXT',
+        'ALTER TABLE requests ADD COLUMN lease_expires_at TIMESTAMP',
+        'ALTER TABLE requests ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0',
+        'CREATE INDEX IF NOT EXISTS idx_requests_status_lease ON requests(status, lease_expires_at)',
+    ],
+    # 3: diagram code stored once per distinct content, zlib-compressed
+    migrate_code_to_blobs,
+    # 4: incremental auto-vacuum, converted once rather than checked on every start
+    enable_incremental_vacuum,
+]
 
 class DiagramDatabase:
-    def __init__(self, db_path='kre8_diagrams.db'):
+    def __init__(self, db_path='kre8_diagrams.db', notify_port=NOTIFY_PORT):
         self.db_path = db_path
+        self.notify_port = notify_port
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self.init_database()
 
+    def connection(self):
+        """Return this thread's persistent connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            # WAL lets readers run alongside a writer (e.g. respond.py)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close every connection opened by this instance"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
     def init_database(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Create requests table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                message TEXT NOT NULL,
-                diagram_type TEXT,
-                format_type TEXT,
-                current_code TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                processed_at TIMESTAMP
-            )
-        ''')
-
-        # Create responses table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS responses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                request_id INTEGER,
-                diagram_code TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (request_id) REFERENCES requests(id)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+        conn = self.connection()
+
+        with conn:
+            # Create requests table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS requests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    message TEXT NOT NULL,
+                    diagram_type TEXT,
+                    format_type TEXT,
+                    current_code TEXT,
+                    status TEXT DEFAULT 'pending',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    processed_at TIMESTAMP
+                )
+            ''')
+
+            # Create responses table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    request_id INTEGER,
+                    diagram_code TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (request_id) REFERENCES requests(id)
+                )
+            ''')
+
+        self.migrate()
+
+    def migrate(self):
+        """Bring an existing database up to the current schema version"""
+        conn = self.connection()
+        # Manage transactions by hand: the sqlite3 module would autocommit the DDL
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None
+        try:
+            for number, step in enumerate(MIGRATIONS, start=1):
+                if conn.execute('PRAGMA user_version').fetchone()[0] >= number:
+                    continue
+                outside = getattr(step, 'outside_transaction', False)
+                if outside:
+                    step(conn)
+
+                # IMMEDIATE takes the write lock before re-reading the version, so
+                # server.py and respond.py starting together apply each step once
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    if conn.execute('PRAGMA user_version').fetchone()[0] < number:
+                        if callable(step) and not outside:
+                            step(conn)
+                        elif not callable(step):
+                            for statement in step:
+                                conn.execute(statement)
+                        conn.execute(f'PRAGMA user_version = {number}')
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+        finally:
+            conn.isolation_level = isolation_level
+
+    def _load_code(self, rows, column):
+        """Fill column from the blob table for rows that reference one"""
+        hashes = list({row['code_hash'] for row in rows if row.get('code_hash')})
+        blobs = {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = self.connection().execute(
+                f'SELECT hash, data FROM blobs WHERE hash IN ({placeholders})', chunk)
+            blobs.update((row['hash'], row['data']) for row in cursor.fetchall())
+
+        for row in rows:
+            digest = row.pop('code_hash', None)
+            if digest in blobs:
+                row[column] = zlib.decompress(blobs[digest]).decode('utf-8')
+        return rows
 
     def add_request(self, message, diagram_type='architecture', format_type='graphviz', current_code=''):
         """Add a new diagram request"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO requests (message, diagram_type, format_type, current_code)
-            VALUES (?, ?, ?, ?)
-        ''', (message, diagram_type, format_type, current_code))
-
-        request_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-
-        return request_id
+        conn = self.connection()
+
+        with conn:
+            cursor = conn.execute('''
+                INSERT INTO requests (message, diagram_type, format_type, current_code, code_hash)
+                VALUES (?, ?, ?, '', ?)
+            ''', (message, diagram_type, format_type, store_code(conn, current_code)))
+
+        return cursor.lastrowid
+
+    def add_requests(self, rows):
+        """Add several requests in one transaction; rows are add_request kwargs"""
+        conn = self.connection()
+        request_ids = []
+
+        with conn:
+            for row in rows:
+                cursor = conn.execute('''
+                    INSERT INTO requests (message, diagram_type, format_type, current_code, code_hash)
+                    VALUES (?, ?, ?, '', ?)
+                ''', (
+                    row['message'],
+                    row.get('diagram_type', 'architecture'),
+                    row.get('format_type', 'graphviz'),
+                    store_code(conn, row.get('current_code', ''))
+                ))
+                request_ids.append(cursor.lastrowid)
+
+        return request_ids
 
     def get_pending_requests(self):
         """Get all pending requests"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute('''
+        cursor = self.connection().execute('''
             SELECT * FROM requests
             WHERE status = 'pending'
             ORDER BY created_at ASC
         ''')
 
-        requests = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-
-        return requests
+        return self._load_code([dict(row) for row in cursor.fetchall()], 'current_code')
 
     def get_latest_pending_request(self):
         """Get the most recent pending request"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute('''
+        cursor = self.connection().execute('''
             SELECT * FROM requests
             WHERE status = 'pending'
             ORDER BY created_at DESC
@@ -93,38 +274,88 @@ class DiagramDatabase:
         ''')
 
         request = cursor.fetchone()
-        conn.close()
-
-        return dict(request) if request else None
+        return self._load_code([dict(request)], 'current_code')[0] if request else None
 
     def add_response(self, request_id, diagram_code):
         """Add a response to a request"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Insert response
-        cursor.execute('''
-            INSERT INTO responses (request_id, diagram_code)
-            VALUES (?, ?)
-        ''', (request_id, diagram_code))
-
-        # Update request status
-        cursor.execute('''
-            UPDATE requests
-            SET status = 'completed', processed_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (request_id,))
-
-        conn.commit()
-        conn.close()
+        conn = self.connection()
+
+        with conn:
+            # Insert response
+            conn.execute('''
+                INSERT INTO responses (request_id, diagram_code, code_hash)
+                VALUES (?, '', ?)
+            ''', (request_id, store_code(conn, diagram_code)))
+
+            # Update request status
+            conn.execute('''
+                UPDATE requests
+                SET status = 'completed', processed_at = CURRENT_TIMESTAMP,
+                    claimed_by = NULL, lease_expires_at = NULL
+                WHERE id = ?
+            ''', (request_id,))
+
+        self.notify_response(request_id)
+
+    def add_responses(self, records):
+        """
+        Add many (request_id, diagram_code) responses in one transaction.
+
+        Returns one error message (or None on success) per record; records for
+        unknown requests are skipped rather than failing the whole batch.
+        """
+        records = list(records)
+        conn = self.connection()
+        errors = [None] * len(records)
+
+        with conn:
+            ids = list({request_id for request_id, _ in records})
+            known = set()
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                known.update(row['id'] for row in conn.execute(
+                    f'SELECT id FROM requests WHERE id IN ({placeholders})', chunk))
+
+            answered = []
+            for index, (request_id, diagram_code) in enumerate(records):
+                if request_id not in known:
+                    errors[index] = f'request #{request_id} not found'
+                    continue
+                conn.execute('''
+                    INSERT INTO responses (request_id, diagram_code, code_hash)
+                    VALUES (?, '', ?)
+                ''', (request_id, store_code(conn, diagram_code)))
+                answered.append(request_id)
+
+            conn.executemany('''
+                UPDATE requests
+                SET status = 'completed', processed_at = CURRENT_TIMESTAMP,
+                    claimed_by = NULL, lease_expires_at = NULL
+                WHERE id = ?
+            ''', [(request_id,) for request_id in answered])
+
+        # One datagram per batch, not per record
+        for start in range(0, len(answered), 100):
+            self.notify_response(*answered[start:start + 100])
+        return errors
+
+    def notify_response(self, *request_ids):
+        """Signal the WebSocket server that responses are ready (best effort)"""
+        if not self.notify_port or not request_ids:
+            return
+
+        payload = ','.join(str(request_id) for request_id in request_ids).encode()
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(payload, (NOTIFY_HOST, self.notify_port))
+        except OSError:
+            # Server not running; its fallback watcher will still pick this up
+            pass
 
     def get_response(self, request_id):
         """Get response for a specific request"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute('''
+        cursor = self.connection().execute('''
             SELECT * FROM responses
             WHERE request_id = ?
             ORDER BY created_at DESC
@@ -132,41 +363,346 @@ class DiagramDatabase:
         ''', (request_id,))
 
         response = cursor.fetchone()
-        conn.close()
+        return self._load_code([dict(response)], 'diagram_code')[0] if response else None
+
+    def get_responses(self, request_ids):
+        """Get the latest response for each of several requests in one query"""
+        request_ids = list(request_ids)
+        if not request_ids:
+            return {}
+
+        conn = self.connection()
+
+        responses = {}
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(request_ids), 500):
+            chunk = request_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = conn.execute(f'''
+                SELECT * FROM responses
+                WHERE id IN (
+                    SELECT MAX(id) FROM responses
+                    WHERE request_id IN ({placeholders})
+                    GROUP BY request_id
+                )
+            ''', chunk)
+            rows = self._load_code([dict(row) for row in cursor.fetchall()], 'diagram_code')
+            responses.update((row['request_id'], row) for row in rows)
+
+        return responses
+
+    def count_requests_by_status(self):
+        """Return {status: count} for the requests table"""
+        cursor = self.connection().execute('''
+            SELECT status, COUNT(*) AS count FROM requests
+            GROUP BY status
+        ''')
 
-        return dict(response) if response else None
+        return {row['status']: row['count'] for row in cursor.fetchall()}
 
     def mark_request_processing(self, request_id):
-        """Mark a request as being processed"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
+        """Mark a pending request as being processed; False if it was not pending"""
+        conn = self.connection()
+
+        with conn:
+            cursor = conn.execute('''
+                UPDATE requests
+                SET status = 'processing'
+                WHERE id = ? AND status = 'pending'
+            ''', (request_id,))
+
+        return cursor.rowcount == 1
+
+    def claim_next_request(self, worker_id, lease_seconds=60):
+        """
+        Atomically take the oldest claimable request for worker_id.
+
+        Pending requests and processing ones whose lease has lapsed (their
+        worker died) are claimable. Returns the request dict, or None when the
+        queue is empty.
+        """
+        conn = self.connection()
+
+        with conn:
+            # Take the write lock up front so two workers can't pick the same row
+            conn.execute('BEGIN IMMEDIATE')
+            self._fail_exhausted(conn)
+
+            row = conn.execute('''
+                SELECT id FROM requests
+                WHERE status = 'pending'
+                   OR (status = 'processing' AND lease_expires_at < datetime('now'))
+                ORDER BY created_at ASC, id ASC
+                LIMIT 1
+            ''').fetchone()
+            if row is None:
+                return None
+
+            conn.execute('''
+                UPDATE requests
+                SET status = 'processing',
+                    claimed_by = ?,
+                    lease_expires_at = datetime('now', '+' || ? || ' seconds'),
+                    attempts = attempts + 1
+                WHERE id = ?
+            ''', (worker_id, lease_seconds, row['id']))
+
+            request = conn.execute('SELECT * FROM requests WHERE id = ?', (row['id'],)).fetchone()
+
+        return self._load_code([dict(request)], 'current_code')[0]
+
+    def heartbeat(self, request_id, worker_id, lease_seconds=60):
+        """Extend a lease; False means the lease was lost and the job may be re-run"""
+        conn = self.connection()
+
+        with conn:
+            cursor = conn.execute('''
+                UPDATE requests
+                SET lease_expires_at = datetime('now', '+' || ? || ' seconds')
+                WHERE id = ? AND claimed_by = ? AND status = 'processing'
+            ''', (lease_seconds, request_id, worker_id))
+
+        return cursor.rowcount == 1
+
+    def complete_request(self, request_id, worker_id, diagram_code):
+        """Answer a claimed request; False (and nothing stored) if the lease was lost"""
+        conn = self.connection()
+
+        with conn:
+            cursor = conn.execute('''
+                UPDATE requests
+                SET status = 'completed', processed_at = CURRENT_TIMESTAMP,
+                    claimed_by = NULL, lease_expires_at = NULL
+                WHERE id = ? AND claimed_by = ? AND status = 'processing'
+            ''', (request_id, worker_id))
+            if cursor.rowcount != 1:
+                return False
+
+            conn.execute('''
+                INSERT INTO responses (request_id, diagram_code, code_hash)
+                VALUES (?, '', ?)
+            ''', (request_id, store_code(conn, diagram_code)))
+
+        self.notify_response(request_id)
+        return True
+
+    def release_request(self, request_id, worker_id):
+        """Hand a claimed request back to the queue (e.g. the handler failed)"""
+        conn = self.connection()
+
+        with conn:
+            cursor = conn.execute('''
+                UPDATE requests
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    claimed_by = NULL, lease_expires_at = NULL
+                WHERE id = ? AND claimed_by = ? AND status = 'processing'
+            ''', (MAX_ATTEMPTS, request_id, worker_id))
+
+        return cursor.rowcount == 1
+
+    def requeue_expired(self):
+        """Put requests whose worker stopped heartbeating back in the queue"""
+        conn = self.connection()
+
+        with conn:
+            self._fail_exhausted(conn)
+            cursor = conn.execute('''
+                UPDATE requests
+                SET status = 'pending', claimed_by = NULL, lease_expires_at = NULL
+                WHERE status = 'processing' AND lease_expires_at < datetime('now')
+            ''')
+
+        return cursor.rowcount
+
+    def _fail_exhausted(self, conn):
+        # A request that keeps killing its worker must not block the queue forever
+        conn.execute('''
             UPDATE requests
-            SET status = 'processing'
-            WHERE id = ?
-        ''', (request_id,))
-
-        conn.commit()
-        conn.close()
-
-    def clear_old_requests(self, days=7):
-        """Clear requests older than specified days"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            DELETE FROM responses
-            WHERE request_id IN (
+            SET status = 'failed', claimed_by = NULL, lease_expires_at = NULL
+            WHERE status = 'processing' AND lease_expires_at < datetime('now')
+              AND attempts >= ?
+        ''', (MAX_ATTEMPTS,))
+
+    def clear_old_requests(self, days=7, batch_size=PRUNE_BATCH):
+        """Clear requests older than specified days, in short batched transactions"""
+        deleted = 0
+        while True:
+            count = self.prune_requests(days, batch_size)
+            deleted += count
+            if count < batch_size:
+                break
+
+        while self.prune_blobs(batch_size) == batch_size:
+            pass
+        self.incremental_vacuum()
+        return deleted
+
+    def prune_requests(self, days=7, batch_size=PRUNE_BATCH):
+        """Delete one batch of old requests and their responses; returns the batch size"""
+        conn = self.connection()
+
+        with conn:
+            ids = [row['id'] for row in conn.execute('''
                 SELECT id FROM requests
                 WHERE created_at < datetime('now', '-' || ? || ' days')
-            )
-        ''', (days,))
-
-        cursor.execute('''
-            DELETE FROM requests
-            WHERE created_at < datetime('now', '-' || ? || ' days')
-        ''', (days,))
-
-        conn.commit()
-        conn.close()
+                ORDER BY created_at
+                LIMIT ?
+            ''', (days, batch_size))]
+            if not ids:
+                return 0
+
+            placeholders = ','.join('?' * len(ids))
+            conn.execute(f'DELETE FROM responses WHERE request_id IN ({placeholders})', ids)
+            conn.execute(f'DELETE FROM requests WHERE id IN ({placeholders})', ids)
+
+        return len(ids)
+
+    def prune_blobs(self, batch_size=PRUNE_BATCH):
+        """Delete one batch of blobs no request or response refers to any more"""
+        conn = self.connection()
+
+        with conn:
+            cursor = conn.execute('''
+                DELETE FROM blobs WHERE hash IN (
+                    SELECT hash FROM blobs
+                    WHERE NOT EXISTS (SELECT 1 FROM requests WHERE code_hash = blobs.hash)
+                      AND NOT EXISTS (SELECT 1 FROM responses WHERE code_hash = blobs.hash)
+                    LIMIT ?
+                )
+            ''', (batch_size,))
+
+        return cursor.rowcount
+
+    def incremental_vacuum(self, pages=None):
+        """Return free pages to the filesystem (all of them when pages is None)"""
+        conn = self.connection()
+        if pages is None:
+            conn.execute('PRAGMA incremental_vacuum').fetchall()
+        else:
+            conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+
+    def storage_stats(self):
+        """Distinct code blobs and their raw vs. compressed size"""
+        row = self.connection().execute('''
+            SELECT COUNT(*) AS blobs,
+                   COALESCE(SUM(size), 0) AS raw_bytes,
+                   COALESCE(SUM(LENGTH(data)), 0) AS stored_bytes
+            FROM blobs
+        ''').fetchone()
+        return dict(row)
+
+
+class AsyncDiagramDatabase:
+    """
+    Non-blocking facade over DiagramDatabase for asyncio code.
+
+    Writes go to a single writer thread and concurrent add_request calls are
+    coalesced into one transaction. Reads run on a small reader pool, which
+    WAL mode allows alongside the writer.
+    """
+
+    def __init__(self, db=None, readers=4, batch_window=0.002, max_batch=100):
+        self.db = db or DiagramDatabase()
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-reader')
+        self._batch = []
+        self._flush_handle = None
+
+    async def _read(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        with stage(f'db.{fn.__name__}'):
+            return await loop.run_in_executor(self._readers, partial(fn, *args, **kwargs))
+
+    async def _write(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        with stage(f'db.{fn.__name__}'):
+            return await loop.run_in_executor(self._writer, partial(fn, *args, **kwargs))
+
+    async def add_request(self, message, diagram_type='architecture', format_type='graphviz', current_code=''):
+        """Queue a request insert; concurrent callers share one transaction"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append(({
+            'message': message,
+            'diagram_type': diagram_type,
+            'format_type': format_type,
+            'current_code': current_code,
+        }, future))
+
+        if len(self._batch) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+        # Batch window plus the shared commit
+        with stage('db.add_request'):
+            return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._batch = self._batch, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._commit_batch(batch))
+
+    async def _commit_batch(self, batch):
+        try:
+            request_ids = await self._write(self.db.add_requests, [row for row, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), request_id in zip(batch, request_ids):
+            if not future.done():
+                future.set_result(request_id)
+
+    async def add_response(self, request_id, diagram_code):
+        return await self._write(self.db.add_response, request_id, diagram_code)
+
+    async def mark_request_processing(self, request_id):
+        return await self._write(self.db.mark_request_processing, request_id)
+
+    async def clear_old_requests(self, days=7):
+        return await self._write(self.db.clear_old_requests, days)
+
+    async def prune(self, days=7, batch_size=PRUNE_BATCH, pause=0.05):
+        """
+        Background retention: delete old rows and orphaned blobs one small
+        transaction at a time, so queued inserts get the writer in between.
+        """
+        deleted = 0
+        while True:
+            count = await self._write(self.db.prune_requests, days, batch_size)
+            deleted += count
+            if count < batch_size:
+                break
+            await asyncio.sleep(pause)
+
+        while await self._write(self.db.prune_blobs, batch_size) == batch_size:
+            await asyncio.sleep(pause)
+
+        await self._write(self.db.incremental_vacuum)
+        return deleted
+
+    async def get_response(self, request_id):
+        return await self._read(self.db.get_response, request_id)
+
+    async def get_responses(self, request_ids):
+        return await self._read(self.db.get_responses, list(request_ids))
+
+    async def get_pending_requests(self):
+        return await self._read(self.db.get_pending_requests)
+
+    async def count_requests_by_status(self):
+        return await self._read(self.db.count_requests_by_status)
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.db.close()
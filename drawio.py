@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Native Draw.io export
+
+Builds an editable mxGraph document from a Graphviz layout (the output of
+`-Tjson0`): every node becomes a positioned vertex, every edge a connector
+routed through its layout waypoints and every cluster a container behind its
+nodes.
+"""
+
+import base64
+import re
+from xml.sax.saxutils import quoteattr
+
+# Graphviz node shapes -> mxGraph vertex styles
+SHAPE_STYLES = {
+    'box': 'rounded=0',
+    'rect': 'rounded=0',
+    'rectangle': 'rounded=0',
+    'square': 'rounded=0',
+    'record': 'rounded=0',
+    'Mrecord': 'rounded=1',
+    'ellipse': 'ellipse',
+    'oval': 'ellipse',
+    'circle': 'ellipse;aspect=fixed',
+    'doublecircle': 'ellipse;shape=doubleEllipse;aspect=fixed',
+    'point': 'ellipse;aspect=fixed;fillColor=#000000',
+    'diamond': 'rhombus',
+    'hexagon': 'shape=hexagon;perimeter=hexagonPerimeter2',
+    'parallelogram': 'shape=parallelogram;perimeter=parallelogramPerimeter',
+    'trapezium': 'shape=trapezoid;perimeter=trapezoidPerimeter',
+    'triangle': 'triangle;direction=north',
+    'cylinder': 'shape=cylinder3;boundedLbl=1;size=8',
+    'note': 'shape=note;size=12',
+    'tab': 'shape=folder',
+    'folder': 'shape=folder',
+    'component': 'shape=component',
+    'plaintext': 'text',
+    'plain': 'text',
+    'none': 'text',
+}
+
+ESCAPED_NEWLINE_RE = re.compile(r'\\[nlr]')
+
+
+def _points(value):
+    """Parse "x,y x,y ..." (optionally with e,/s, arrow tips) into float pairs"""
+    points = []
+    for token in value.split():
+        if token.startswith(('e,', 's,')):
+            continue
+        x, y = token.split(',')[:2]
+        points.append((float(x), float(y)))
+    return points
+
+
+def _label(obj, default):
+    label = obj.get('label', '\\N')
+    if label in ('\\N', '\\G') or label.startswith('<'):
+        # Default or HTML-like label; fall back to the object's name
+        return default
+    if label == '\\E':
+        return ''
+    return ESCAPED_NEWLINE_RE.sub('\n', label)
+
+
+def _colors(obj, font=True):
+    style = []
+    if 'filled' in obj.get('style', '') or 'fillcolor' in obj:
+        style.append(f"fillColor={obj.get('fillcolor') or obj.get('color') or '#d3d3d3'}")
+    if 'color' in obj:
+        style.append(f"strokeColor={obj['color']}")
+    if font and 'fontcolor' in obj:
+        style.append(f"fontColor={obj['fontcolor']}")
+    return style
+
+
+def graphviz_to_drawio(layout, name='Page-1'):
+    """Convert a parsed Graphviz json0 layout into Draw.io XML bytes"""
+    x0, y0, x1, y1 = (float(v) for v in layout.get('bb', '0,0,0,0').split(','))
+
+    # Graphviz puts the origin bottom-left; mxGraph puts it top-left
+    def flip(x, y):
+        return round(x - x0, 2), round(y1 - y, 2)
+
+    cells = []
+    objects = layout.get('objects', [])
+    node_ids = {}
+
+    for obj in objects:
+        if 'nodes' not in obj or 'bb' not in obj or not obj.get('name', '').startswith('cluster'):
+            continue
+        cx0, cy0, cx1, cy1 = (float(v) for v in obj['bb'].split(','))
+        left, top = flip(cx0, cy1)
+        style = ';'.join(['rounded=0', 'whiteSpace=wrap', 'verticalAlign=top', 'fillColor=none']
+                         + _colors(obj, font=False))
+        cells.append(
+            f'<mxCell id="c{obj["_gvid"]}" value={quoteattr(_label(obj, ""))} style={quoteattr(style)} vertex="1" parent="1">'
+            f'<mxGeometry x="{left}" y="{top}" width="{round(cx1 - cx0, 2)}" height="{round(cy1 - cy0, 2)}" as="geometry" />'
+            '</mxCell>'
+        )
+
+    for obj in objects:
+        if 'nodes' in obj or 'pos' not in obj:
+            continue
+        x, y = _points(obj['pos'])[0]
+        width = float(obj.get('width', 0.75)) * 72
+        height = float(obj.get('height', 0.5)) * 72
+        left, top = flip(x - width / 2, y + height / 2)
+        shape = SHAPE_STYLES.get(obj.get('shape', 'ellipse'), 'rounded=0')
+        style = ';'.join([shape, 'whiteSpace=wrap'] + _colors(obj))
+        cell_id = f'n{obj["_gvid"]}'
+        node_ids[obj['_gvid']] = cell_id
+        cells.append(
+            f'<mxCell id="{cell_id}" value={quoteattr(_label(obj, obj["name"]))} style={quoteattr(style)} vertex="1" parent="1">'
+            f'<mxGeometry x="{left}" y="{top}" width="{round(width, 2)}" height="{round(height, 2)}" as="geometry" />'
+            '</mxCell>'
+        )
+
+    arrow = 'classic' if layout.get('directed') else 'none'
+    for edge in layout.get('edges', []):
+        source = node_ids.get(edge.get('tail'))
+        target = node_ids.get(edge.get('head'))
+        if source is None or target is None:
+            continue
+
+        # Route through the end point of each interior Bezier segment
+        points = _points(edge.get('pos', ''))
+        waypoints = ''.join(
+            '<mxPoint x="{}" y="{}" />'.format(*flip(x, y)) for x, y in points[3:-1:3]
+        )
+        style = ';'.join(['curved=1', 'html=0', f'endArrow={arrow}'] + _colors(edge))
+        cells.append(
+            f'<mxCell id="e{edge["_gvid"]}" value={quoteattr(_label(edge, ""))} style={quoteattr(style)} edge="1" parent="1" source="{source}" target="{target}">'
+            f'<mxGeometry relative="1" as="geometry"><Array as="points">{waypoints}</Array></mxGeometry>'
+            '</mxCell>'
+        )
+
+    width, height = round(x1 - x0), round(y1 - y0)
+    body = '\n        '.join(cells)
+    drawio_xml = f"""<?xml version="1.0" encoding="UTF-8"?>
+<mxfile host="Kre8 Diagram Builder" version="22.0.0">
+  <diagram name={quoteattr(name)} id="diagram">
+    <mxGraphModel dx="{width}" dy="{height}" grid="1" gridSize="10" guides="1" tooltips="1" connect="1" arrows="1" fold="1" page="1" pageScale="1" pageWidth="{max(width, 850)}" pageHeight="{max(height, 1100)}" math="0" shadow="0">
+      <root>
+        <mxCell id="0" />
+        <mxCell id="1" parent="0" />
+        {body}
+      </root>
+    </mxGraphModel>
+  </diagram>
+</mxfile>"""
+    return drawio_xml.encode()
+
+
+def svg_to_drawio(svg_data):
+    """Wrap a rendered SVG as a single image cell, for backends with no layout data"""
+    # Convert SVG to Draw.io XML (simplified)
+    drawio_xml = f"""<?xml version="1.0" encoding="UTF-8"?>
+<mxfile host="Kre8 Diagram Builder" modified="2025-01-01T00:00:00.000Z" version="22.0.0">
+  <diagram name="Page-1" id="diagram">
+    <mxGraphModel dx="1422" dy="794" grid="1" gridSize="10" guides="1" tooltips="1" connect="1" arrows="1" fold="1" page="1" pageScale="1" pageWidth="850" pageHeight="1100" math="0" shadow="0">
+      <root>
+        <mxCell id="0" />
+        <mxCell id="1" parent="0" />
+        <mxCell id="2" value="" style="shape=image;verticalLabelPosition=bottom;labelBackgroundColor=default;verticalAlign=top;aspect=fixed;imageAspect=0;image=data:image/svg+xml,{base64.b64encode(svg_data).decode()}" vertex="1" parent="1">
+          <mxGeometry x="40" y="40" width="760" height="600" as="geometry" />
+        </mxCell>
+      </root>
+    </mxGraphModel>
+  </diagram>
+</mxfile>"""
+    return drawio_xml.encode()
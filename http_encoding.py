@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Response compression and conditional requests
+
+Shared by the threaded and the asyncio renderers. Text-like responses (JSON,
+SVG, XML) are brotli- or gzip-encoded for clients that accept it, and renders
+carry an ETag derived from their cache key so a client re-posting an
+unchanged diagram gets an empty 304 instead of the image again.
+
+Brotli is optional: without it responses are gzip-encoded.
+"""
+
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS = os.environ.get('HTTP_COMPRESS', '1') != '0'
+COMPRESS_MIN_BYTES = int(os.environ.get('HTTP_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('HTTP_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('HTTP_BROTLI_QUALITY', 5))
+
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+    'text/plain',
+    'text/html',
+}
+
+
+def accepted_encoding(accept_encoding):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None for identity"""
+    qualities = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = qualities.get(name, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compressible(mimetype, size):
+    return COMPRESS and mimetype in COMPRESSIBLE_TYPES and size >= COMPRESS_MIN_BYTES
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the encoded bytes identical for identical bodies
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def render_etag(cache_key, *variant):
+    """Weak ETag for a render: the cache key already hashes format, theme and code"""
+    return 'W/"{}"'.format('-'.join((cache_key[:32],) + tuple(str(part) for part in variant if part)))
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith('W/') else tag) == opaque:
+            return True
+    return False
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Warm Mermaid rendering pool
+
+Instead of launching mmdc (and a fresh headless Chromium) per diagram, the
+renderer keeps a few Node workers (mermaid_worker.mjs) alive. Each worker
+boots Chromium once, reuses a page for every render and is recycled after a
+fixed number of renders to bound memory.
+"""
+
+import base64
+import functools
+import json
+import os
+import queue
+import select
+import subprocess
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(BASE_DIR, 'mermaid_worker.mjs')
+
+
+class MermaidError(Exception):
+    """Raised for diagram errors reported by Mermaid"""
+
+
+class MermaidEngineError(Exception):
+    """Raised when a Mermaid worker crashes or stops responding"""
+
+
+@functools.lru_cache(maxsize=None)
+def find_mermaid_cli():
+    """Locate the installed @mermaid-js/mermaid-cli package directory (looked up once)"""
+    cli_dir = os.environ.get('MERMAID_CLI_DIR')
+    if not cli_dir:
+        try:
+            result = subprocess.run(
+                ['npm', 'root', '-g'],
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+        cli_dir = os.path.join(result.stdout.strip(), '@mermaid-js', 'mermaid-cli')
+
+    return cli_dir if os.path.isdir(cli_dir) else None
+
+
+class MermaidWorker:
+    def __init__(self, cli_dir, timeout=30, startup_timeout=60):
+        self.cli_dir = cli_dir
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.renders = 0
+        self._next_id = 0
+        self._buffer = b''
+
+    def start(self):
+        """Launch the Node worker; call wait_ready() before rendering"""
+        env = dict(os.environ, MERMAID_CLI_DIR=self.cli_dir)
+        self.process = subprocess.Popen(
+            ['node', WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env
+        )
+        self._buffer = b''
+        self.renders = 0
+
+    def wait_ready(self):
+        message = self._read_message(self.startup_timeout)
+        if not message.get('ready'):
+            raise MermaidEngineError(f"Unexpected Mermaid worker greeting: {message}")
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.kill()
+            self.process.wait(timeout=5)
+        except Exception:
+            pass
+        self.process = None
+
+    def render(self, code, output_format='svg'):
+        """Render one diagram on the worker's warm page"""
+        if not self.is_alive():
+            raise MermaidEngineError("Mermaid worker is not running")
+
+        self._next_id += 1
+        request = {
+            'id': self._next_id,
+            'code': code,
+            'format': output_format,
+            'backgroundColor': 'transparent',
+        }
+
+        try:
+            self.process.stdin.write(json.dumps(request).encode('utf-8') + b'\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise MermaidEngineError(f"Mermaid worker died: {e}")
+
+        message = self._read_message(self.timeout)
+        self.renders += 1
+
+        if message.get('id') != request['id']:
+            raise MermaidEngineError("Mermaid worker answered out of order")
+        if not message.get('ok'):
+            raise MermaidError(message.get('error') or 'Unknown Mermaid error')
+
+        return base64.b64decode(message['data'])
+
+    def _read_message(self, timeout):
+        fd = self.process.stdout.fileno()
+        deadline = time.monotonic() + timeout
+
+        while b'\n' not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise MermaidEngineError(f"Mermaid timed out after {timeout}s")
+
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise MermaidEngineError("Mermaid worker closed its output")
+            self._buffer += chunk
+
+        line, _, self._buffer = self._buffer.partition(b'\n')
+        try:
+            return json.loads(line)
+        except ValueError:
+            raise MermaidEngineError(f"Malformed Mermaid worker output: {line[:200]!r}")
+
+
+class MermaidPool:
+    def __init__(self, size=2, timeout=30, recycle_after=100, startup_timeout=60,
+                 relaunch_attempts=3, autostart=True):
+        self.size = size
+        self.timeout = timeout
+        self.recycle_after = recycle_after
+        self.startup_timeout = startup_timeout
+        self.relaunch_attempts = relaunch_attempts
+
+        self.available = False
+        self.restarts = 0
+        self.recycles = 0
+        self.lost = 0
+        self.last_error = None
+        self.cli_dir = None
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+
+        if autostart:
+            self.start()
+
+    def start(self):
+        """Boot every worker once; Chromium cold-start happens here, not per request"""
+        if self.cli_dir is None:
+            self.cli_dir = find_mermaid_cli()
+        if not self.cli_dir:
+            self.last_error = 'mermaid-cli not found'
+            return
+
+        workers = []
+        try:
+            for _ in range(self.size):
+                worker = MermaidWorker(self.cli_dir, self.timeout, self.startup_timeout)
+                worker.start()
+                workers.append(worker)
+            for worker in workers:
+                worker.wait_ready()
+        except (OSError, MermaidEngineError) as e:
+            self.last_error = str(e)
+            for worker in workers:
+                worker.stop()
+            return
+
+        for worker in workers:
+            self._idle.put(worker)
+        self.available = True
+
+    def close(self):
+        self.available = False
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+    def render(self, code, output_format='svg'):
+        """Render a diagram on a warm worker"""
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise MermaidEngineError(f"No Mermaid worker free after {self.timeout}s")
+
+        try:
+            data = worker.render(code, output_format)
+        except MermaidEngineError as e:
+            self.last_error = str(e)
+            self._replace(worker, restart=True)
+            raise
+        except MermaidError:
+            self._release(worker)
+            raise
+
+        self._release(worker)
+        return data
+
+    def health(self):
+        """Report pool status"""
+        return {
+            'available': self.available,
+            'workers': self.size - self.lost,
+            'lost': self.lost,
+            'idle': self._idle.qsize(),
+            'restarts': self.restarts,
+            'recycles': self.recycles,
+            'last_error': self.last_error,
+        }
+
+    def _release(self, worker):
+        if worker.renders >= self.recycle_after:
+            self._replace(worker, restart=False)
+        else:
+            self._idle.put(worker)
+
+    def _replace(self, worker, restart):
+        """Relaunch a worker in the background so the caller isn't held up"""
+        def relaunch():
+            worker.stop()
+            with self._lock:
+                if restart:
+                    self.restarts += 1
+                else:
+                    self.recycles += 1
+
+            # Only a worker that came back ready rejoins the pool; back off between tries
+            for attempt in range(self.relaunch_attempts):
+                if attempt:
+                    time.sleep(min(2 ** attempt, 30))
+                try:
+                    worker.start()
+                    worker.wait_ready()
+                except (OSError, MermaidEngineError) as e:
+                    self.last_error = str(e)
+                    worker.stop()
+                    continue
+                if self.available:
+                    self._idle.put(worker)
+                else:
+                    worker.stop()  # the pool closed meanwhile
+                return
+
+            # Give up on this slot; with none left, renders fall back to mmdc
+            with self._lock:
+                self.lost += 1
+                if self.lost >= self.size:
+                    self.available = False
+
+        threading.Thread(target=relaunch, name='mermaid-relaunch', daemon=True).start()
@@ -0,0 +1,126 @@
+#!/usr/bin/env node
+/**
+ * Kre8 Diagram Builder - Warm Mermaid rendering worker
+ *
+ * Launches headless Chromium once and renders Mermaid diagrams on a reused
+ * page. Requests and responses are JSON lines on stdin/stdout:
+ *
+ *   -> {"id": 1, "code": "graph TD; A-->B", "format": "svg"}
+ *   <- {"id": 1, "ok": true, "data": "<base64>"}
+ *   <- {"id": 1, "ok": false, "error": "Parse error on line 1 ..."}
+ *
+ * Dependencies (puppeteer, mermaid) are resolved from the installed
+ * @mermaid-js/mermaid-cli package given in MERMAID_CLI_DIR.
+ */
+
+import { createRequire } from 'node:module';
+import { join } from 'node:path';
+import readline from 'node:readline';
+
+const cliDir = process.env.MERMAID_CLI_DIR;
+const require = createRequire(join(cliDir, 'package.json'));
+const puppeteer = require('puppeteer');
+const mermaidPath = require.resolve('mermaid/dist/mermaid.min.js');
+
+const theme = process.env.MERMAID_THEME || 'dark';
+const pageRecycleAfter = parseInt(process.env.MERMAID_PAGE_RECYCLE || '50', 10);
+const launchArgs = (process.env.MERMAID_PUPPETEER_ARGS || '').split(' ').filter(Boolean);
+
+let browser = null;
+let page = null;
+let pageRenders = 0;
+let counter = 0;
+
+function send(message) {
+  process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+async function openPage() {
+  if (page) {
+    await page.close().catch(() => {});
+  }
+
+  page = await browser.newPage();
+  await page.setContent('<!DOCTYPE html><html><body><div id="container"></div></body></html>');
+  await page.addScriptTag({ path: mermaidPath });
+  await page.evaluate((theme) => {
+    window.mermaid.initialize({ startOnLoad: false, theme });
+  }, theme);
+  pageRenders = 0;
+}
+
+async function render({ code, format = 'svg', backgroundColor = 'transparent' }) {
+  // Recycle the page periodically so DOM and mermaid state can't grow forever
+  if (pageRenders >= pageRecycleAfter) {
+    await openPage();
+  }
+  pageRenders += 1;
+  counter += 1;
+
+  const svg = await page.evaluate(async (code, id, backgroundColor) => {
+    const container = document.getElementById('container');
+    container.innerHTML = '';
+    try {
+      const { svg } = await window.mermaid.render(id, code);
+      container.innerHTML = svg;
+      const element = container.querySelector('svg');
+      element.style.backgroundColor = backgroundColor;
+      return new XMLSerializer().serializeToString(element);
+    } finally {
+      // mermaid leaves its scratch/error element behind on failure
+      document.getElementById(`d${id}`)?.remove();
+    }
+  }, code, `kre8-${counter}`, backgroundColor);
+
+  if (format === 'svg') {
+    return Buffer.from(svg, 'utf-8');
+  }
+
+  const element = await page.$('#container svg');
+  if (format === 'pdf') {
+    const box = await element.boundingBox();
+    return Buffer.from(await page.pdf({
+      printBackground: true,
+      width: `${Math.ceil(box.x + box.width)}px`,
+      height: `${Math.ceil(box.y + box.height)}px`,
+      pageRanges: '1',
+    }));
+  }
+
+  return Buffer.from(await element.screenshot({ type: 'png', omitBackground: true }));
+}
+
+async function main() {
+  browser = await puppeteer.launch({ headless: 'new', args: launchArgs });
+  await openPage();
+  send({ ready: true });
+
+  const input = readline.createInterface({ input: process.stdin });
+  for await (const line of input) {
+    if (!line.trim()) {
+      continue;
+    }
+
+    let request;
+    try {
+      request = JSON.parse(line);
+    } catch (error) {
+      send({ id: null, ok: false, error: `Invalid request: ${error.message}` });
+      continue;
+    }
+
+    try {
+      const data = await render(request);
+      send({ id: request.id, ok: true, data: data.toString('base64') });
+    } catch (error) {
+      send({ id: request.id, ok: false, error: String((error && error.message) || error) });
+    }
+  }
+
+  await browser.close();
+}
+
+main().catch((error) => {
+  process.stderr.write(`Mermaid worker failed: ${error && error.stack ? error.stack : error}\n`);
+  process.exit(1);
+});
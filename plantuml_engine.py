@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Persistent PlantUML engine
+
+Keeps long-lived PlantUML JVMs running in -pipe mode so a render only pays for
+layout, not for JVM start-up. Workers are pooled per output format, restarted
+when they crash and periodically health-checked.
+"""
+
+import os
+import queue
+import re
+import select
+import shlex
+import subprocess
+import threading
+import time
+
+# Printed by PlantUML after every diagram so we know where one image ends
+PIPE_DELIMITER = b'__KRE8_PLANTUML_END__'
+
+HEALTH_CHECK_DIAGRAM = '@startuml\nA -> B\n@enduml'
+
+START_MARKER_RE = re.compile(r'^\s*@start', re.MULTILINE)
+
+
+class PlantUMLError(Exception):
+    """Raised for diagram errors reported by PlantUML"""
+
+
+class PlantUMLEngineError(Exception):
+    """Raised when a PlantUML worker crashes or stops responding"""
+
+
+class PlantUMLWorker:
+    def __init__(self, command, output_format='svg', timeout=30):
+        self.command = command
+        self.output_format = output_format
+        self.timeout = timeout
+        self.process = None
+        self.renders = 0
+        self._buffer = b''
+        self.start()
+
+    def start(self):
+        """Launch the PlantUML JVM in pipe mode"""
+        self.process = subprocess.Popen(
+            self.command + [
+                '-pipe',
+                f'-t{self.output_format}',
+                '-charset', 'UTF-8',
+                '-pipedelimitor', PIPE_DELIMITER.decode(),
+                '-pipeNoStderr',
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self._buffer = b''
+        self.renders = 0
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.kill()
+            self.process.wait(timeout=5)
+        except Exception:
+            pass
+        self.process = None
+
+    def has_stale_output(self):
+        """Whether output no request asked for is waiting, which would be read as the next answer"""
+        if not self.is_alive():
+            return False
+        if self._buffer.strip():
+            return True
+        ready, _, _ = select.select([self.process.stdout.fileno()], [], [], 0)
+        return bool(ready)
+
+    def render(self, code):
+        """Render one diagram through the running JVM"""
+        if not self.is_alive():
+            raise PlantUMLEngineError("PlantUML worker is not running")
+
+        try:
+            self.process.stdin.write(code.encode('utf-8') + b'\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise PlantUMLEngineError(f"PlantUML worker died: {e}")
+
+        payload = self._read_until_delimiter()
+        self.renders += 1
+        return self._extract_image(payload)
+
+    def _read_until_delimiter(self):
+        fd = self.process.stdout.fileno()
+        deadline = time.monotonic() + self.timeout
+
+        while PIPE_DELIMITER not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PlantUMLEngineError(f"PlantUML timed out after {self.timeout}s")
+
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise PlantUMLEngineError("PlantUML worker closed its output")
+            self._buffer += chunk
+
+        payload, _, rest = self._buffer.partition(PIPE_DELIMITER)
+        self._buffer = rest.lstrip(b'\r\n')
+        return payload
+
+    def _extract_image(self, payload):
+        """Split the image from any trailing ERROR block PlantUML appended"""
+        if self.output_format == 'svg':
+            end = payload.rfind(b'</svg>')
+            end = end + len(b'</svg>') if end >= 0 else -1
+        else:
+            end = payload.rfind(b'IEND')
+            end = end + 8 if end >= 0 else -1  # chunk type + CRC
+
+        tail = payload[end:] if end >= 0 else payload
+        text = tail.decode('utf-8', errors='replace').strip()
+
+        if text.startswith('ERROR'):
+            lines = text.splitlines()[1:]
+            line_no = lines[0].strip() if lines else '?'
+            message = ' '.join(line.strip() for line in lines[1:]) or 'Syntax error'
+            raise PlantUMLError(f"line {line_no}: {message}")
+
+        if end < 0:
+            if not payload.strip():
+                raise PlantUMLError("PlantUML produced no output")
+            return payload
+
+        return payload[:end]
+
+
+class PlantUMLPool:
+    def __init__(self, command=None, size=2, timeout=30, formats=('svg',), health_interval=30, autostart=True):
+        if command is None:
+            command = os.environ.get('PLANTUML_CMD', 'plantuml')
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        self.size = size
+        self.timeout = timeout
+        self.health_interval = health_interval
+
+        self.available = False
+        self.restarts = 0
+        self.last_error = None
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._health_thread = None
+
+        if autostart:
+            self.start(formats)
+
+    def start(self, formats=('svg',)):
+        """Warm up workers for the given output formats"""
+        try:
+            for fmt in formats:
+                self._ensure_format(fmt)
+            self.available = True
+        except FileNotFoundError as e:
+            self.available = False
+            self.last_error = str(e)
+            return
+
+        if self.health_interval and self._health_thread is None:
+            self._health_thread = threading.Thread(
+                target=self._health_loop, name='plantuml-health', daemon=True
+            )
+            self._health_thread.start()
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            pools = list(self._idle.values())
+            self._idle = {}
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().stop()
+                except queue.Empty:
+                    break
+
+    def render(self, code, output_format='svg'):
+        """Render a diagram on a warm worker"""
+        fmt = 'svg' if output_format == 'svg' else 'png'
+        if '@start' not in code:
+            code = f'@startuml\n{code}\n@enduml'
+        elif len(START_MARKER_RE.findall(code)) > 1:
+            # The pipe would answer with one image per block, one request too many
+            raise PlantUMLError("only one @start...@end diagram per source is supported")
+
+        idle = self._ensure_format(fmt)
+        try:
+            worker = idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PlantUMLEngineError(f"No PlantUML worker free after {self.timeout}s")
+
+        try:
+            if worker.has_stale_output():
+                self.last_error = "PlantUML worker out of sync: discarded unclaimed output"
+                worker = self._restart(worker)
+            data = worker.render(code)
+        except PlantUMLEngineError as e:
+            self.last_error = str(e)
+            worker = self._restart(worker)
+            raise
+        finally:
+            idle.put(worker)
+
+        return data
+
+    def health(self):
+        """Report worker liveness per output format"""
+        with self._lock:
+            formats = {fmt: pool.qsize() for fmt, pool in self._idle.items()}
+        return {
+            'available': self.available,
+            'workers_per_format': self.size,
+            'idle': formats,
+            'restarts': self.restarts,
+            'last_error': self.last_error,
+        }
+
+    def _ensure_format(self, fmt):
+        with self._lock:
+            idle = self._idle.get(fmt)
+            if idle is None:
+                idle = queue.Queue()
+                for _ in range(self.size):
+                    idle.put(PlantUMLWorker(self.command, fmt, self.timeout))
+                self._idle[fmt] = idle
+            return idle
+
+    def _restart(self, worker):
+        worker.stop()
+        try:
+            worker.start()
+        except OSError as e:
+            self.last_error = str(e)
+        with self._lock:
+            self.restarts += 1
+        return worker
+
+    def _health_loop(self):
+        """Restart dead workers and ping idle ones with a trivial diagram"""
+        while not self._closed.wait(self.health_interval):
+            with self._lock:
+                pools = list(self._idle.values())
+
+            for idle in pools:
+                for _ in range(idle.qsize()):
+                    try:
+                        worker = idle.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        if not worker.is_alive():
+                            raise PlantUMLEngineError("PlantUML worker exited")
+                        worker.render(HEALTH_CHECK_DIAGRAM)
+                    except (PlantUMLError, PlantUMLEngineError) as e:
+                        self.last_error = str(e)
+                        worker = self._restart(worker)
+                    finally:
+                        idle.put(worker)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Content-addressed render cache for the diagram renderer
+
+Rendered images are keyed by a hash of (format, code, theme, output format).
+Entries live in a bounded in-memory LRU and in a size-capped on-disk store
+that survives restarts.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Bump when the rendering pipeline changes so stale disk entries are ignored
+CACHE_VERSION = '2'
+
+
+class RenderCache:
+    def __init__(self, max_entries=256, max_memory_bytes=64 * 1024 * 1024,
+                 cache_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    @staticmethod
+    def make_key(format_type, code, theme, output_format):
+        """Build the content-addressed key for a render"""
+        digest = hashlib.sha256()
+        for part in (CACHE_VERSION, format_type, theme or '', output_format, code):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return cached bytes for key, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._read_disk(key)
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._store_memory(key, data)
+            return data
+
+    def put(self, key, data):
+        """Store rendered bytes in both tiers"""
+        with self._lock:
+            self._store_memory(key, data)
+        self._write_disk(key, data)
+
+    def invalidate(self, key=None):
+        """Drop a single entry, or the whole cache when no key is given"""
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+                self._memory_bytes = 0
+            elif key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key))
+
+        if not self.cache_dir:
+            return
+
+        if key is None:
+            for path, _, _ in self._disk_entries():
+                self._remove_file(path)
+            with self._lock:
+                self._disk_bytes = 0
+        else:
+            path = self._disk_path(key)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return
+            if self._remove_file(path):
+                with self._lock:
+                    self._disk_bytes -= size
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+                'cache_dir': self.cache_dir,
+            }
+
+    # Memory tier (caller holds the lock)
+
+    def _store_memory(self, key, data):
+        if len(data) > self.max_memory_bytes:
+            return
+
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        while (len(self._memory) > self.max_entries
+               or self._memory_bytes > self.max_memory_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    # Disk tier
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _disk_entries(self):
+        """Yield (path, size, mtime) for every file in the disk tier"""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Refresh mtime so disk eviction is least-recently-used
+            os.utime(path, None)
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.cache_dir or len(data) > self.max_disk_bytes:
+            return
+
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # A full disk must not leave half-written temp files behind
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        with self._lock:
+            self._disk_bytes += len(data)
+            over_budget = self._disk_bytes > self.max_disk_bytes
+
+        if over_budget:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete least recently used files until the disk tier fits its budget"""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            if self._remove_file(path):
+                total -= size
+                with self._lock:
+                    self.evictions += 1
+
+        with self._lock:
+            self._disk_bytes = total
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
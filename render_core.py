@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+"""
+Render backends shared by the threaded and the asyncio renderers
+
+Everything that decides *what* to run for a diagram lives here once: the
+Graphviz engine fallback, the Mermaid/PlantUML warm pools with their CLI
+fallbacks, D2's workspace, export and Draw.io conversion, and the
+optimize/measure/cache steps around a render. It is written as generators
+that yield requests (run this CLI, call this blocking function, render that
+diagram) instead of doing I/O themselves. renderer.py drives them with
+subprocesses on its worker threads, async_renderer.py with asyncio
+subprocesses on the event loop; each server keeps only its own transport.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from render_cache import RenderCache
+from svg_optimize import optimize_svg
+from tiles import TilePyramid, TileNotFound
+from timing import stage
+from validators import DiagramSyntaxError, check
+from backends import BackendStatus, INSTALL_HINTS, WARMUP_SOURCES, PREWARM
+from graphviz_layout import (
+    LAYOUT_ENGINES, LAYOUT_FALLBACKS, LAYOUT_TIME_BUDGET, choose_engine, layout_command, apply_theme
+)
+from metrics import MetricsRegistry, SIZE_BUCKETS
+from plantuml_engine import PlantUMLPool, PlantUMLError, PlantUMLEngineError
+from mermaid_engine import MermaidPool, MermaidError, MermaidEngineError
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EXPORT_MIMETYPES = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+    'pdf': 'application/pdf',
+    'drawio': 'application/xml',
+}
+
+MIMETYPES = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+    'pdf': 'application/pdf',
+}
+
+class RendererBusy(Exception):
+    """Raised when the render pool and its queue are full"""
+
+class RenderCancelled(Exception):
+    """Raised when a render is superseded by a newer one from the same session"""
+
+class RenderTimeout(Exception):
+    """Raised when a CLI runs past its deadline and has been killed"""
+
+def parse_batch(data, workers):
+    """
+    Normalize a /render/batch body into (jobs, concurrency).
+
+    Raises ValueError with the message for a 400. Concurrency is clamped to
+    the renderer's workers and is None when the client left it to us.
+    """
+    jobs = data.get('jobs') if isinstance(data, dict) else data
+    max_jobs = int(os.environ.get('RENDER_BATCH_MAX', 200))
+
+    if not isinstance(jobs, list) or not jobs:
+        raise ValueError('No jobs provided')
+    if len(jobs) > max_jobs:
+        raise ValueError(f'Too many jobs: {len(jobs)} (max {max_jobs})')
+
+    normalized = []
+    for job in jobs:
+        job = job if isinstance(job, dict) else {}
+        normalized.append({
+            'id': job.get('id'),
+            'code': job.get('code', ''),
+            'format': job.get('format', 'graphviz'),
+            'theme': job.get('theme', 'dark'),
+            'output': job.get('output', 'svg'),
+        })
+
+    concurrency = data.get('concurrency') if isinstance(data, dict) else None
+    if concurrency is not None:
+        try:
+            concurrency = int(concurrency)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid concurrency: {concurrency!r}')
+        if concurrency < 1:
+            raise ValueError(f'Invalid concurrency: {concurrency} (must be at least 1)')
+        concurrency = min(concurrency, workers)
+    return normalized, concurrency
+
+def batch_rejection(job, backends):
+    """Why a batch job can't be rendered at all, or None"""
+    if not job['code']:
+        return 'No code provided'
+    if job['format'] not in backends:
+        return f"Unsupported format: {job['format']}"
+    if job['output'] not in MIMETYPES:
+        return f"Unsupported output: {job['output']}"
+    return None
+
+def batch_item(index, job, diagram_data=None, error=None, engine=None):
+    """One NDJSON result line of /render/batch"""
+    if error is not None:
+        item = {
+            'index': index,
+            'id': job['id'],
+            'success': False,
+            'error': str(error),
+            'busy': isinstance(error, RendererBusy),
+        }
+        if isinstance(error, DiagramSyntaxError):
+            item['errors'] = error.errors
+        return json.dumps(item) + '\n'
+
+    b64_data = base64.b64encode(diagram_data).decode()
+    item = {
+        'index': index,
+        'id': job['id'],
+        'success': True,
+        'image': f"data:{MIMETYPES[job['output']]};base64,{b64_data}",
+    }
+    if engine:
+        item['engine'] = engine
+    return json.dumps(item) + '\n'
+
+class Step:
+    """A request from a render generator, answered by the server driving it"""
+    handler = None
+
+    def __init__(self, *args):
+        self.args = args
+
+class Tool(Step):
+    """Run a CLI: run_tool(args, input_data=None, timeout=None) -> (returncode, stdout, stderr)"""
+    handler = 'run_tool'
+
+class Call(Step):
+    """Blocking work (warm pools, optimizer, disk cache): call(fn, *args) -> result"""
+    handler = 'call'
+
+class Render(Step):
+    """A whole cached render: render(format_type, code, output_format, theme) -> bytes"""
+    handler = 'render'
+
+class Pooled(Step):
+    """Nested steps that need a render slot of their own: pooled(steps) -> result"""
+    handler = 'pooled'
+
+def drive(steps, runner):
+    """Run render steps to completion, answering each request with the runner's handler"""
+    value, error = None, None
+    try:
+        while True:
+            try:
+                request = steps.throw(error) if error is not None else steps.send(value)
+            except StopIteration as e:
+                return e.value
+            try:
+                value, error = getattr(runner, request.handler)(*request.args), None
+            except RenderCancelled:
+                raise  # not an error the steps handle; closing them cleans up
+            except Exception as e:
+                value, error = None, e
+    finally:
+        steps.close()
+
+async def drive_async(steps, runner):
+    """drive() for a runner whose handlers are coroutines"""
+    value, error = None, None
+    try:
+        while True:
+            try:
+                request = steps.throw(error) if error is not None else steps.send(value)
+            except StopIteration as e:
+                return e.value
+            try:
+                value, error = await getattr(runner, request.handler)(*request.args), None
+            except RenderCancelled:
+                raise
+            except Exception as e:
+                value, error = None, e
+    finally:
+        steps.close()
+
+class RendererCore:
+    """Cache, warm pools, metrics and backends; subclasses supply the handlers"""
+
+    def __init__(self, temp_prefix='kre8-render-'):
+        self.temp_dir = tempfile.mkdtemp(prefix=temp_prefix)
+        self.backends = {
+            'graphviz': self.render_graphviz,
+            'mermaid': self.render_mermaid,
+            'd2': self.render_d2,
+            'plantuml': self.render_plantuml,
+        }
+        self.cache = RenderCache(
+            max_entries=int(os.environ.get('RENDER_CACHE_ENTRIES', 256)),
+            max_memory_bytes=int(os.environ.get('RENDER_CACHE_MEMORY_MB', 64)) * 1024 * 1024,
+            cache_dir=os.environ.get('RENDER_CACHE_DIR', os.path.join(BASE_DIR, '.render_cache')) or None,
+            max_disk_bytes=int(os.environ.get('RENDER_CACHE_DISK_MB', 512)) * 1024 * 1024
+        )
+
+        # Strip and compact SVG output before it is cached
+        self.optimize_svg = os.environ.get('SVG_OPTIMIZE', '1') != '0'
+
+        # Graphviz engines learned from time-budget fallbacks, by source hash,
+        # least recently used first; kept apart so lookups don't skew cache stats
+        self.max_learned_engines = int(os.environ.get('GRAPHVIZ_LEARNED_ENGINES', 1024))
+        self._learned_engines = OrderedDict()
+        self._learned_lock = threading.Lock()
+
+        # Decoded tile pyramids, most recently used last
+        self.max_pyramids = int(os.environ.get('TILE_PYRAMIDS', 2))
+        self.tile_max_pixels = int(os.environ.get('TILE_MAX_PIXELS', 64_000_000))
+        self._pyramids = OrderedDict()
+        self._pyramids_lock = threading.Lock()
+
+        # Long-lived PlantUML JVMs (falls back to the CLI when unavailable)
+        self.plantuml = PlantUMLPool(
+            size=int(os.environ.get('PLANTUML_WORKERS', 2)),
+            timeout=int(os.environ.get('PLANTUML_TIMEOUT', 30)),
+            autostart=False
+        )
+
+        # Warm headless-Chromium Mermaid workers (falls back to mmdc when unavailable)
+        self.mermaid = MermaidPool(
+            size=int(os.environ.get('MERMAID_WORKERS', 2)),
+            timeout=int(os.environ.get('MERMAID_TIMEOUT', 30)),
+            recycle_after=int(os.environ.get('MERMAID_RECYCLE_AFTER', 100)),
+            relaunch_attempts=int(os.environ.get('MERMAID_RELAUNCH_ATTEMPTS', 3)),
+            autostart=False
+        )
+
+        # Tool discovery and pool start-up run in the background; /ready reports progress
+        self.status = BackendStatus(self.backends)
+        self.setup_metrics()
+
+    def setup_metrics(self):
+        """Register the Prometheus metrics both renderers share"""
+        self.metrics = MetricsRegistry()
+        self.render_seconds = self.metrics.histogram(
+            'kre8_render_duration_seconds', 'Time spent in a render backend, by format')
+        self.render_bytes = self.metrics.histogram(
+            'kre8_render_output_bytes', 'Size of rendered output, by format', SIZE_BUCKETS)
+        self.render_failures = self.metrics.counter(
+            'kre8_render_failures_total', 'Renders that raised an error, by format')
+        self.svg_bytes_saved = self.metrics.counter(
+            'kre8_svg_optimize_saved_bytes_total', 'Bytes removed from SVG output by the optimizer, by format')
+        self.render_rejected = self.metrics.counter(
+            'kre8_render_rejected_total', 'Renders refused by syntax pre-validation, by format')
+        self.render_timeouts = self.metrics.counter(
+            'kre8_render_timeouts_total', 'Subprocesses killed for running past their deadline')
+
+        self.metrics.counter('kre8_render_cache_hits_total', 'Render cache hits',
+                             fn=lambda: self.cache.hits)
+        self.metrics.counter('kre8_render_cache_misses_total', 'Render cache misses',
+                             fn=lambda: self.cache.misses)
+        self.metrics.gauge('kre8_render_cache_hit_ratio', 'Render cache hits / lookups',
+                           fn=lambda: self.cache.stats()['hit_ratio'])
+        self.metrics.gauge('kre8_render_cache_bytes', 'Bytes held by each render cache tier',
+                           fn=lambda: {
+                               (('tier', 'memory'),): self.cache.stats()['memory_bytes'],
+                               (('tier', 'disk'),): self.cache.stats()['disk_bytes'],
+                           })
+        self.http_requests = self.metrics.counter(
+            'kre8_http_requests_total', 'HTTP requests by endpoint and status')
+        self.stage_seconds = self.metrics.histogram(
+            'kre8_http_stage_duration_seconds', 'Time spent in each stage of a request, by endpoint and stage')
+
+    def start_steps(self, name, tool):
+        """Boot a backend's warm pool and pay its cold start with one trivial render"""
+        details = {'tool': tool}
+        pool = {'plantuml': self.plantuml, 'mermaid': self.mermaid}.get(name)
+        if pool is not None:
+            yield Call(pool.start)
+            details['pool'] = pool.available
+
+        if not PREWARM:
+            self.status.set(name, 'ready', **details)
+            return
+
+        self.status.set(name, 'warming', **details)
+        start = time.perf_counter()
+        try:
+            yield from self.backends[name](WARMUP_SOURCES[name], 'svg')
+        except Exception as e:
+            self.status.set(name, 'failed', error=str(e) or type(e).__name__, **details)
+            return
+        self.status.set(name, 'ready', warmup_ms=round((time.perf_counter() - start) * 1000, 1), **details)
+
+    def settled(self):
+        """Mark start-up finished and log where each backend ended up"""
+        self.status.finish()
+        report = self.status.report()
+        states = ', '.join(f"{name} {info['state']}" for name, info in report['backends'].items())
+        print(f"✓ Render backends settled in {report['startup_ms']:g} ms: {states}")
+
+    def cleanup(self):
+        """Stop the warm pools and remove scratch space"""
+        self.plantuml.close()
+        self.mermaid.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @contextmanager
+    def workspace(self):
+        """Give a single render job its own scratch directory"""
+        work_dir = tempfile.mkdtemp(prefix='job-', dir=self.temp_dir)
+        try:
+            yield work_dir
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def lookup(self, format_type, code, output_format='svg', theme='dark'):
+        """
+        Everything a render does before it needs a backend.
+
+        Returns (key, cached bytes or None); raises DiagramSyntaxError for a
+        source that fails pre-validation and the install hint for a backend
+        that start-up found missing.
+        """
+        if format_type not in self.backends:
+            raise Exception(f"Unsupported format: {format_type}")
+
+        key = self.cache.make_key(format_type, code, theme, output_format)
+        with stage('cache'):
+            cached = self.cache.get(key)
+        if cached is not None:
+            return key, cached
+
+        with stage('validate'):
+            try:
+                check(format_type, code)
+            except DiagramSyntaxError:
+                self.render_rejected.inc(format=format_type)
+                raise
+
+        if self.status.missing(format_type):
+            # Known at start-up; don't spawn a process just to find out again
+            raise Exception(INSTALL_HINTS[format_type])
+        return key, None
+
+    def render_steps(self, key, format_type, code, output_format='svg', theme='dark'):
+        """Run the backend, then optimize, measure and cache its output"""
+        if format_type == 'graphviz':
+            args = (code, output_format, theme)
+        else:
+            args = (code, output_format)
+
+        start = time.perf_counter()
+        try:
+            diagram_data = yield from self.backends[format_type](*args)
+        except Exception:
+            self.render_failures.inc(format=format_type)
+            raise
+
+        if output_format == 'svg':
+            diagram_data = yield from self.optimize(diagram_data, format_type)
+
+        self.render_seconds.observe(time.perf_counter() - start, format=format_type)
+        self.render_bytes.observe(len(diagram_data), format=format_type)
+
+        # The disk tier writes and evicts files
+        with stage('store'):
+            yield Call(self.cache.put, key, diagram_data)
+        return diagram_data
+
+    def optimize(self, svg_data, format_type):
+        """Run rendered SVG through the optimizer, counting the bytes it saves"""
+        if not self.optimize_svg:
+            return svg_data
+        with stage('optimize'):
+            optimized = yield Call(optimize_svg, svg_data)
+        self.svg_bytes_saved.inc(len(svg_data) - len(optimized), format=format_type)
+        return optimized
+
+    def layout_engine(self, code):
+        """Pick the Graphviz layout for this source based on its size"""
+        # A previous render fell back to a faster engine under the time budget
+        digest = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        with self._learned_lock:
+            learned = self._learned_engines.get(digest)
+            if learned is not None:
+                self._learned_engines.move_to_end(digest)
+                return learned
+        return choose_engine(code)
+
+    def learn_engine(self, code, engine):
+        """Remember a downgrade so the next render of this source starts there"""
+        digest = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        with self._learned_lock:
+            self._learned_engines[digest] = engine
+            self._learned_engines.move_to_end(digest)
+            while len(self._learned_engines) > self.max_learned_engines:
+                self._learned_engines.popitem(last=False)
+
+    def render_graphviz(self, code, output_format='svg', theme='dark'):
+        """Render Graphviz (DOT) diagram"""
+        try:
+            # Both scan the whole source; as Calls they stay off the async renderer's loop
+            engine = yield Call(self.layout_engine, code)
+            source = code
+            with stage('theme'):
+                code = yield Call(apply_theme, code, theme)
+
+            if engine not in LAYOUT_ENGINES:
+                # The source names its own layout; let Graphviz honour it
+                return (yield from self.run_graphviz(layout_command(engine, output_format), code))
+
+            # Try the chosen engine, falling back to faster ones if it blows the budget
+            candidates = LAYOUT_FALLBACKS[LAYOUT_FALLBACKS.index(engine):]
+            for attempt in candidates:
+                cmd = layout_command(attempt, output_format)
+                try:
+                    data = yield from self.run_graphviz(cmd, code, timeout=LAYOUT_TIME_BUDGET)
+                except RenderTimeout:
+                    if attempt == candidates[-1]:
+                        raise Exception(
+                            f"layout did not finish within {LAYOUT_TIME_BUDGET:g}s even with {attempt}"
+                        )
+                    continue
+
+                if attempt != engine:
+                    self.learn_engine(source, attempt)
+                return data
+        except Exception as e:
+            raise Exception(f"Graphviz render error: {str(e)}")
+
+    def run_graphviz(self, cmd, code, timeout=None):
+        # Stream source in and image bytes out; nothing touches the disk
+        import graphviz  # only for its exception types; keeps start-up lean
+
+        try:
+            returncode, stdout, stderr = yield Tool(cmd, code, timeout)
+        except FileNotFoundError as e:
+            raise graphviz.ExecutableNotFound(cmd) from e
+
+        if returncode != 0:
+            raise graphviz.CalledProcessError(returncode, cmd, output=stdout, stderr=stderr)
+
+        return stdout
+
+    def render_mermaid(self, code, output_format='svg'):
+        """Render Mermaid diagram using mermaid-cli"""
+        if self.mermaid.available:
+            try:
+                with stage('tool'):
+                    return (yield Call(self.mermaid.render, code, output_format))
+            except MermaidError as e:
+                raise Exception(f"Mermaid render error: Mermaid error: {e}")
+            except MermaidEngineError as e:
+                raise Exception(f"Mermaid render error: {e}")
+
+        try:
+            # Use mermaid-cli (mmdc) if available, piping stdin -> stdout
+            returncode, stdout, stderr = yield Tool(
+                ['mmdc', '-i', '-', '-o', '-', '-e', output_format, '-t', 'dark', '-b', 'transparent'],
+                code
+            )
+
+            if returncode != 0:
+                raise Exception(f"Mermaid error: {stderr.decode(errors='replace')}")
+
+            return stdout
+        except FileNotFoundError:
+            raise Exception("Mermaid CLI (mmdc) not installed. Install with: npm install -g @mermaid-js/mermaid-cli")
+        except Exception as e:
+            raise Exception(f"Mermaid render error: {str(e)}")
+
+    def render_d2(self, code, output_format='svg'):
+        """Render D2 diagram"""
+        try:
+            if output_format == 'svg':
+                # d2 reads stdin and writes SVG to stdout when given '-'
+                returncode, stdout, stderr = yield Tool(['d2', '--theme', '200', '-', '-'], code)
+
+                if returncode != 0:
+                    raise Exception(f"D2 error: {stderr.decode(errors='replace')}")
+
+                return stdout
+
+            # Raster/PDF output is chosen from the file extension, so use a workspace
+            with self.workspace() as work_dir:
+                input_file = os.path.join(work_dir, 'diagram.d2')
+                output_file = os.path.join(work_dir, f'diagram.{output_format}')
+
+                with stage('write'), open(input_file, 'w') as f:
+                    f.write(code)
+
+                returncode, stdout, stderr = yield Tool(['d2', input_file, output_file, '--theme', '200'])
+
+                if returncode != 0:
+                    raise Exception(f"D2 error: {stderr.decode(errors='replace')}")
+
+                with stage('read'), open(output_file, 'rb') as f:
+                    return f.read()
+        except FileNotFoundError:
+            raise Exception("D2 CLI not installed. Install from: https://d2lang.com/")
+        except Exception as e:
+            raise Exception(f"D2 render error: {str(e)}")
+
+    def render_plantuml(self, code, output_format='svg'):
+        """Render PlantUML diagram"""
+        if self.plantuml.available:
+            try:
+                with stage('tool'):
+                    return (yield Call(self.plantuml.render, code, output_format))
+            except PlantUMLError as e:
+                raise Exception(f"PlantUML render error: PlantUML error: {e}")
+            except PlantUMLEngineError as e:
+                raise Exception(f"PlantUML render error: {e}")
+
+        try:
+            # Use PlantUML in one-shot pipe mode: stdin -> stdout
+            fmt = 'svg' if output_format == 'svg' else 'png'
+            returncode, stdout, stderr = yield Tool(['plantuml', '-pipe', f'-t{fmt}', '-charset', 'UTF-8'], code)
+
+            if returncode != 0:
+                raise Exception(f"PlantUML error: {stderr.decode(errors='replace')}")
+
+            return stdout
+        except FileNotFoundError:
+            raise Exception("PlantUML not installed. Install from: https://plantuml.com/")
+        except Exception as e:
+            raise Exception(f"PlantUML render error: {str(e)}")
+
+    def tile_pyramid_steps(self, format_type, code, theme='dark'):
+        """Render a diagram as PNG and open it as a tile pyramid; returns (id, pyramid)"""
+        png_data = yield Render(format_type, code, 'png', theme)
+        # The pyramid is named after its source render, so it survives in the cache
+        pyramid_id = self.cache.make_key(format_type, code, theme, 'png')
+        pyramid = yield Call(self.open_pyramid, pyramid_id, png_data)
+        return pyramid_id, pyramid
+
+    def open_pyramid(self, pyramid_id, png_data=None):
+        """Return a decoded pyramid, reopening it from the cached render if it was evicted"""
+        with self._pyramids_lock:
+            pyramid = self._pyramids.get(pyramid_id)
+            if pyramid is not None:
+                self._pyramids.move_to_end(pyramid_id)
+                return pyramid
+
+        if png_data is None:
+            png_data = self.cache.get(pyramid_id)
+            if png_data is None:
+                raise TileNotFound("Unknown tile pyramid; request it again with POST /tiles")
+
+        pyramid = TilePyramid(png_data, max_pixels=self.tile_max_pixels)
+        with self._pyramids_lock:
+            pyramid = self._pyramids.setdefault(pyramid_id, pyramid)
+            while len(self._pyramids) > self.max_pyramids:
+                self._pyramids.popitem(last=False)
+        return pyramid
+
+    def tile_steps(self, pyramid_id, z, x, y):
+        """Cut one tile on the render pool; levels are built the first time they are needed"""
+        pyramid = yield Call(self.open_pyramid, pyramid_id)
+        return (yield Pooled(self.cut_tile(pyramid, z, x, y)))
+
+    def cut_tile(self, pyramid, z, x, y):
+        return (yield Call(pyramid.tile, z, x, y))
+
+    def export_steps(self, format_type, code, formats, theme='dark'):
+        """
+        Render several output formats of one diagram.
+
+        Graphviz diagrams are laid out once (as xdot, cached like any render)
+        and every requested format is drawn from that layout with `neato -n2`,
+        so N formats cost one layout. Other backends render each format.
+        """
+        results = {}
+        if format_type != 'graphviz':
+            for fmt in formats:
+                if fmt == 'drawio':
+                    results[fmt] = yield from self.drawio_steps(code, format_type)
+                else:
+                    results[fmt] = yield Render(format_type, code, fmt, theme)
+            return results
+
+        keys = {}
+        for fmt in formats:
+            key = self.cache.make_key('graphviz', code, theme, fmt)
+            cached = yield Call(self.cache.get, key)
+            if cached is not None:
+                results[fmt] = cached
+            else:
+                keys[fmt] = key
+
+        if keys:
+            layout = yield Render('graphviz', code, 'xdot', theme)
+            emitted = yield Pooled(self.emit_graphviz(layout, list(keys)))
+            for fmt, key in keys.items():
+                yield Call(self.cache.put, key, emitted[fmt])
+            results.update(emitted)
+        return results
+
+    def emit_graphviz(self, layout, formats):
+        """Draw an already laid-out graph in several formats with one process"""
+        try:
+            with self.workspace() as work_dir:
+                # -n2 keeps the positions in the xdot input; every -T/-o pair
+                # is written from the same parsed graph
+                cmd = ['neato', '-n2']
+                for fmt in formats:
+                    renderer_format = 'json0' if fmt == 'drawio' else fmt
+                    cmd += [f'-T{renderer_format}', '-o', os.path.join(work_dir, f'diagram.{fmt}')]
+                yield from self.run_graphviz(cmd, layout)
+
+                results = {}
+                with stage('read'):
+                    for fmt in formats:
+                        with open(os.path.join(work_dir, f'diagram.{fmt}'), 'rb') as f:
+                            results[fmt] = f.read()
+        except Exception as e:
+            raise Exception(f"Graphviz render error: {str(e)}")
+
+        if 'svg' in results:
+            results['svg'] = yield from self.optimize(results['svg'], 'graphviz')
+        if 'drawio' in results:
+            from drawio import graphviz_to_drawio
+            results['drawio'] = graphviz_to_drawio(json.loads(results['drawio']))
+        return results
+
+    def drawio_steps(self, code, format_type):
+        """Convert diagram to Draw.io XML format"""
+        try:
+            if format_type == 'graphviz':
+                # Native, editable shapes and connectors from the layout
+                return (yield from self.export_steps('graphviz', code, ['drawio']))['drawio']
+
+            # No layout to read positions from; embed the rendered SVG instead
+            if format_type == 'mermaid':
+                svg_data = yield Render(format_type, code, 'svg', 'dark')
+            else:
+                raise Exception(f"Draw.io conversion not supported for {format_type}")
+
+            from drawio import svg_to_drawio
+            return svg_to_drawio(svg_data)
+        except (RendererBusy, DiagramSyntaxError):
+            raise
+        except Exception as e:
+            raise Exception(f"Draw.io conversion error: {str(e)}")
@@ -3,199 +3,476 @@
 Kre8 Diagram Builder - Diagram Rendering Server
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-import graphviz
 import os
-import tempfile
 import base64
 from io import BytesIO
 import subprocess
+import atexit
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError, wait, FIRST_COMPLETED
+import time
+from http_encoding import (
+    COMPRESSIBLE_TYPES, accepted_encoding, compressible, compress, render_etag, etag_matches
+)
+from timing import StageTimer, stage, carry, current_timer, activate, deactivate, profile_requested
+from validators import DiagramSyntaxError
+from tiles import TilesUnavailable, TileNotFound, PyramidTooLarge
+from backends import discover_tools, INSTALL_HINTS
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from render_core import (
+    RendererCore, RendererBusy, RenderCancelled, RenderTimeout, EXPORT_MIMETYPES, drive,
+    parse_batch, batch_rejection, batch_item
+)
 
 app = Flask(__name__)
-CORS(app)
-
-class DiagramRenderer:
-    def __init__(self):
-        self.temp_dir = tempfile.mkdtemp()
-
-    def render_graphviz(self, code, output_format='svg', theme='dark'):
-        """Render Graphviz (DOT) diagram"""
-        try:
-            # Add graph attributes for dark theme
-            if theme == 'dark' and 'bgcolor' not in code.lower():
-                # Insert bgcolor and fontcolor into graph definition
-                if 'digraph' in code or 'graph' in code:
-                    lines = code.split('\n')
-                    for i, line in enumerate(lines):
-                        if '{' in line and i < 3:  # Find opening brace in first few lines
-                            lines.insert(i+1, '  bgcolor="transparent";')
-                            lines.insert(i+2, '  fontcolor="white";')
-                            break
-                    code = '\n'.join(lines)
-
-            src = graphviz.Source(code)
-            output_file = os.path.join(self.temp_dir, f'diagram.{output_format}')
-            src.render(output_file, format=output_format, cleanup=True)
-
-            with open(f'{output_file}.{output_format}', 'rb') as f:
-                return f.read()
-        except Exception as e:
-            raise Exception(f"Graphviz render error: {str(e)}")
-
-    def render_mermaid(self, code, output_format='svg'):
-        """Render Mermaid diagram using mermaid-cli"""
-        try:
-            input_file = os.path.join(self.temp_dir, 'diagram.mmd')
-            output_file = os.path.join(self.temp_dir, f'diagram.{output_format}')
-
-            # Write mermaid code to file
-            with open(input_file, 'w') as f:
-                f.write(code)
-
-            # Use mermaid-cli (mmdc) if available
-            result = subprocess.run(
-                ['mmdc', '-i', input_file, '-o', output_file, '-t', 'dark', '-b', 'transparent'],
-                capture_output=True,
-                text=True
+CORS(app, expose_headers=['Content-Disposition', 'ETag', 'Server-Timing', 'X-Layout-Engine', 'X-Profiled-Status'])
+
+class RenderJob:
+    """One in-flight render, shared by every caller asking for the same key"""
+
+    def __init__(self, key, format_type=None, output_format=None):
+        self.key = key
+        self.format_type = format_type
+        self.output_format = output_format
+        self.future = None
+        self.waiters = 0
+        self.sessions = set()
+        self.cancelled = False
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def attach(self, process):
+        with self._lock:
+            self._processes.add(process)
+            cancelled = self.cancelled
+        if cancelled:
+            process.kill()
+
+    def detach(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+    def cancel(self):
+        """Drop the job if still queued, or kill its running subprocesses"""
+        with self._lock:
+            self.cancelled = True
+            processes = list(self._processes)
+        self.future.cancel()
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+class DiagramRenderer(RendererCore):
+    """Drives the shared backends on a bounded thread pool with blocking subprocesses"""
+
+    def __init__(self, workers=None, max_queue=None):
+        # Bounded worker pool: N renders run in parallel, a few more may queue
+        self.workers = workers or int(os.environ.get('RENDER_WORKERS', 0)) or os.cpu_count() or 1
+        if max_queue is None:
+            max_queue = int(os.environ.get('RENDER_QUEUE', self.workers * 2))
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='render')
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+
+        # Single-flight bookkeeping: cache key -> RenderJob, session -> RenderJob
+        self._in_flight = {}
+        self._sessions = {}
+        self._jobs_lock = threading.RLock()
+        self._local = threading.local()
+
+        self._startup = None
+        self._startup_lock = threading.Lock()
+        super().__init__('kre8-render-')
+
+    def setup_metrics(self):
+        """Register the renderer's Prometheus metrics"""
+        super().setup_metrics()
+        self.renders_in_progress = self.metrics.gauge(
+            'kre8_renders_in_progress', 'Renders currently executing on the pool')
+        self.renders_queued = self.metrics.gauge(
+            'kre8_render_queue_depth', 'Renders waiting for a free worker')
+        self.renders_in_progress.set(0)
+        self.renders_queued.set(0)
+
+    def start(self):
+        """Discover installed tools, boot the warm pools and pre-warm each backend, once"""
+        with self._startup_lock:
+            if self._startup is None:
+                self._startup = threading.Thread(target=self._start_backends, name='render-startup', daemon=True)
+                self._startup.start()
+
+    def wait_started(self, timeout=None):
+        """Block until start-up has settled; True if it did within `timeout`"""
+        self.start()
+        self._startup.join(timeout)
+        return not self._startup.is_alive()
+
+    def _start_backends(self):
+        threads = []
+        for name, tool in discover_tools().items():
+            if tool is None:
+                self.status.set(name, 'missing', error=INSTALL_HINTS[name])
+                continue
+            self.status.set(name, 'starting', tool=tool)
+            # Backends boot side by side; a slow JVM or Chromium doesn't hold up dot
+            thread = threading.Thread(target=self.run, args=(self.start_steps(name, tool),),
+                                      name=f'start-{name}', daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+        self.settled()
+
+    def close(self):
+        """Stop the worker pool and remove scratch space"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.cleanup()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue a job on the render pool, refusing work when it is saturated"""
+        if not self._slots.acquire(blocking=False):
+            raise RendererBusy(
+                f"Renderer busy: {self.workers} renders running and {self.max_queue} queued"
             )
 
-            if result.returncode != 0:
-                raise Exception(f"Mermaid error: {result.stderr}")
-
-            with open(output_file, 'rb') as f:
-                return f.read()
-        except FileNotFoundError:
-            raise Exception("Mermaid CLI (mmdc) not installed. Install with: npm install -g @mermaid-js/mermaid-cli")
-        except Exception as e:
-            raise Exception(f"Mermaid render error: {str(e)}")
-
-    def render_d2(self, code, output_format='svg'):
-        """Render D2 diagram"""
+        queued_at = time.perf_counter()
+
+        def run():
+            self.renders_queued.dec()
+            self.renders_in_progress.inc()
+            timer = current_timer()
+            if timer is not None:
+                timer.add('queue', time.perf_counter() - queued_at)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.renders_in_progress.dec()
+
+        def done(future):
+            self._slots.release()
+            if future.cancelled():
+                self.renders_queued.dec()
+
+        self.renders_queued.inc()
         try:
-            input_file = os.path.join(self.temp_dir, 'diagram.d2')
-            output_file = os.path.join(self.temp_dir, f'diagram.{output_format}')
-
-            # Write D2 code to file
-            with open(input_file, 'w') as f:
-                f.write(code)
-
-            # Use d2 CLI
-            result = subprocess.run(
-                ['d2', input_file, output_file, '--theme', '200'],
-                capture_output=True,
-                text=True
+            # The worker runs inside the submitting request's timing and profile
+            future = self.executor.submit(carry(run))
+        except Exception:
+            self.renders_queued.dec()
+            self._slots.release()
+            raise
+
+        future.add_done_callback(done)
+        return future
+
+    def run(self, steps):
+        """Drive shared render steps on this thread"""
+        return drive(steps, self)
+
+    def run_tool(self, args, input_data=None, timeout=None):
+        """Run an external CLI, streaming source in and image bytes out"""
+        if isinstance(input_data, str):
+            input_data = input_data.encode('utf-8')
+
+        job = getattr(self._local, 'job', None)
+        with stage('tool'):
+            process = subprocess.Popen(
+                args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
             )
-
-            if result.returncode != 0:
-                raise Exception(f"D2 error: {result.stderr}")
-
-            with open(output_file, 'rb') as f:
-                return f.read()
-        except FileNotFoundError:
-            raise Exception("D2 CLI not installed. Install from: https://d2lang.com/")
-        except Exception as e:
-            raise Exception(f"D2 render error: {str(e)}")
-
-    def render_plantuml(self, code, output_format='svg'):
-        """Render PlantUML diagram"""
+            # Register the process so a superseding render can kill it
+            if job is not None:
+                job.attach(process)
+            try:
+                stdout, stderr = process.communicate(input_data, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                self.render_timeouts.inc()
+                raise RenderTimeout(f"{args[0]} timed out after {timeout:g}s and was killed")
+            finally:
+                if job is not None:
+                    job.detach(process)
+
+        if job is not None and job.cancelled:
+            raise RenderCancelled("Render superseded by a newer request")
+
+        return process.returncode, stdout, stderr
+
+    def call(self, fn, *args):
+        """Blocking work runs inline; this is already a worker thread"""
+        return fn(*args)
+
+    def pooled(self, steps):
+        """Run nested steps as a job of their own on the render pool"""
+        return self.submit(self.run, steps).result()
+
+    def render(self, format_type, code, output_format='svg', theme='dark', session=None):
+        """Render a diagram, serving repeated requests from the render cache"""
+        future = self.render_future(format_type, code, output_format, theme, session)
         try:
-            input_file = os.path.join(self.temp_dir, 'diagram.puml')
-            output_file = os.path.join(self.temp_dir, f'diagram.{output_format}')
-
-            # Write PlantUML code to file
-            with open(input_file, 'w') as f:
-                f.write(code)
-
-            # Use PlantUML
-            fmt = 'svg' if output_format == 'svg' else 'png'
-            result = subprocess.run(
-                ['plantuml', f'-t{fmt}', input_file, '-o', self.temp_dir],
-                capture_output=True,
-                text=True
-            )
-
-            if result.returncode != 0:
-                raise Exception(f"PlantUML error: {result.stderr}")
-
-            with open(output_file, 'rb') as f:
-                return f.read()
-        except FileNotFoundError:
-            raise Exception("PlantUML not installed. Install from: https://plantuml.com/")
-        except Exception as e:
-            raise Exception(f"PlantUML render error: {str(e)}")
+            return future.result()
+        except CancelledError:
+            raise RenderCancelled("Render superseded by a newer request")
+
+    def render_future(self, format_type, code, output_format='svg', theme='dark', session=None):
+        """
+        Start a render on the pool and return a Future for its bytes.
+
+        Identical in-flight renders share one execution. When a session key is
+        given, a newer render for that session cancels the session's older one
+        unless some other caller is still waiting on it.
+        """
+        if format_type not in self.backends:
+            raise Exception(f"Unsupported format: {format_type}")
+
+        # Before the cache: a cache hit is still newer than the session's slow render
+        if session is not None:
+            self.supersede(session)
+
+        self.start()
+        key, cached = self.lookup(format_type, code, output_format, theme)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        with self._jobs_lock:
+            job = self._in_flight.get(key)
+            if job is None:
+                job = RenderJob(key, format_type, output_format)
+                job.future = self.submit(self._render_and_store, job, code, theme)
+                self._in_flight[key] = job
+                job.future.add_done_callback(lambda _: self._forget(job))
+            job.waiters += 1
+
+            if session is not None:
+                previous = self._sessions.get(session)
+                self._sessions[session] = job
+                job.sessions.add(session)
+                if previous is not None and previous is not job:
+                    previous.sessions.discard(session)
+                    self._release(previous)
+
+        return job.future
+
+    def supersede(self, session):
+        """A newer request from this session arrived: let go of its in-flight render"""
+        with self._jobs_lock:
+            previous = self._sessions.pop(session, None)
+            if previous is not None:
+                previous.sessions.discard(session)
+                self._release(previous)
+
+    def _release(self, job):
+        """Drop one waiter from a superseded job, cancelling it when nobody is left"""
+        job.waiters -= 1
+        if job.waiters <= 0 and not job.future.done():
+            job.cancel()
+            self._forget(job)
+
+    def _forget(self, job):
+        with self._jobs_lock:
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+            for session in job.sessions:
+                if self._sessions.get(session) is job:
+                    del self._sessions[session]
+            job.sessions.clear()
+
+    def _render_and_store(self, job, code, theme):
+        if job.cancelled:
+            raise RenderCancelled("Render superseded by a newer request")
+
+        # run_tool registers its processes with the job so they can be killed
+        self._local.job = job
+        try:
+            return self.run(self.render_steps(job.key, job.format_type, code, job.output_format, theme))
+        finally:
+            self._local.job = None
+
+    def render_batch(self, jobs, concurrency=None):
+        """
+        Render many jobs concurrently, yielding (index, data, error) as each finishes.
+
+        At most `concurrency` jobs from this batch are in flight at once; a job
+        that fails never stops the rest of the batch.
+        """
+        concurrency = max(1, int(concurrency or self.workers))
+        queued = deque(enumerate(jobs))
+        in_flight = {}
+
+        while queued or in_flight:
+            while queued and len(in_flight) < concurrency:
+                index, job = queued[0]
+                try:
+                    future = self.render_future(
+                        job['format'], job['code'], job['output'], job['theme']
+                    )
+                except RendererBusy as e:
+                    if in_flight:
+                        break  # wait for our own jobs to free a slot
+                    queued.popleft()
+                    yield index, None, e
+                    continue
+                except Exception as e:
+                    queued.popleft()
+                    yield index, None, e
+                    continue
+
+                queued.popleft()
+                # Identical jobs share one future, so track every index waiting on it
+                in_flight.setdefault(future, []).append(index)
+
+            if not in_flight:
+                continue
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                for index in in_flight.pop(future):
+                    try:
+                        yield index, future.result(), None
+                    except Exception as e:
+                        yield index, None, e
+
+    def export(self, format_type, code, formats, theme='dark'):
+        """Render several output formats of one diagram, laying Graphviz out once"""
+        return self.run(self.export_steps(format_type, code, formats, theme))
 
     def convert_to_drawio(self, code, format_type):
         """Convert diagram to Draw.io XML format"""
-        try:
-            # First render as SVG
-            if format_type == 'graphviz':
-                svg_data = self.render_graphviz(code, 'svg')
-            elif format_type == 'mermaid':
-                svg_data = self.render_mermaid(code, 'svg')
-            else:
-                raise Exception(f"Draw.io conversion not supported for {format_type}")
-
-            # Convert SVG to Draw.io XML (simplified)
-            drawio_xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<mxfile host="Kre8 Diagram Builder" modified="2025-01-01T00:00:00.000Z" version="22.0.0">
-  <diagram name="Page-1" id="diagram">
-    <mxGraphModel dx="1422" dy="794" grid="1" gridSize="10" guides="1" tooltips="1" connect="1" arrows="1" fold="1" page="1" pageScale="1" pageWidth="850" pageHeight="1100" math="0" shadow="0">
-      <root>
-        <mxCell id="0" />
-        <mxCell id="1" parent="0" />
-        <mxCell id="2" value="" style="shape=image;verticalLabelPosition=bottom;labelBackgroundColor=default;verticalAlign=top;aspect=fixed;imageAspect=0;image=data:image/svg+xml,{base64.b64encode(svg_data).decode()}" vertex="1" parent="1">
-          <mxGeometry x="40" y="40" width="760" height="600" as="geometry" />
-        </mxCell>
-      </root>
-    </mxGraphModel>
-  </diagram>
-</mxfile>"""
-            return drawio_xml.encode()
-        except Exception as e:
-            raise Exception(f"Draw.io conversion error: {str(e)}")
+        return self.run(self.drawio_steps(code, format_type))
+
+    def tile_pyramid(self, format_type, code, theme='dark'):
+        """Render a diagram as PNG and open it as a tile pyramid; returns (id, pyramid)"""
+        return self.run(self.tile_pyramid_steps(format_type, code, theme))
+
+    def tile(self, pyramid_id, z, x, y):
+        """Cut one tile on the render pool"""
+        return self.run(self.tile_steps(pyramid_id, z, x, y))
 
 renderer = DiagramRenderer()
+atexit.register(renderer.close)
+
+def busy_response(e):
+    """Backpressure response when the render pool is saturated"""
+    response = jsonify({'error': str(e)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def syntax_error_response(e):
+    """Rejected before rendering: the diagram has syntax errors"""
+    return jsonify({'error': str(e), 'errors': e.errors}), 400
 
 @app.route('/render', methods=['POST'])
 def render_diagram():
     """Render diagram endpoint"""
     try:
-        data = request.json
+        with stage('parse'):
+            data = request.json
         code = data.get('code', '')
         format_type = data.get('format', 'graphviz')
         theme = data.get('theme', 'dark')
+        # Editor session: a newer render for the same session cancels the older one
+        session = data.get('session') or request.headers.get('X-Render-Session')
 
         if not code:
             return jsonify({'error': 'No code provided'}), 400
 
-        # Render based on format
-        if format_type == 'graphviz':
-            diagram_data = renderer.render_graphviz(code, 'svg', theme)
-        elif format_type == 'mermaid':
-            diagram_data = renderer.render_mermaid(code, 'svg')
-        elif format_type == 'd2':
-            diagram_data = renderer.render_d2(code, 'svg')
-        elif format_type == 'plantuml':
-            diagram_data = renderer.render_plantuml(code, 'svg')
-        else:
+        if format_type not in renderer.backends:
             return jsonify({'error': f'Unsupported format: {format_type}'}), 400
 
-        # Return as base64 data URL
-        b64_data = base64.b64encode(diagram_data).decode()
-        return jsonify({
-            'success': True,
-            'image': f'data:image/svg+xml;base64,{b64_data}'
-        })
+        # Raw mode returns the SVG itself instead of base64 inside JSON
+        raw = bool(data.get('raw')) or request.accept_mimetypes.best_match(
+            ['application/json', 'image/svg+xml']) == 'image/svg+xml'
+        key = renderer.cache.make_key(format_type, code, theme, 'svg')
+
+        # Chosen once per request; the same engine names the ETag and the response
+        engine = renderer.layout_engine(code) if format_type == 'graphviz' else None
+        etag = render_etag(key, engine, 'raw' if raw else 'json')
+
+        # Even a 304 answers this session's latest request; its older render is moot
+        if session:
+            renderer.supersede(session)
+
+        # The render key names the output, so an unchanged diagram is known before rendering
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            response = Response(status=304)
+            response.headers['ETag'] = etag
+            # Caches must key the 304 the same way as the compressed 200 it revalidates
+            response.vary.add('Accept-Encoding')
+            return response
+
+        # Render based on format
+        diagram_data = renderer.render(format_type, code, 'svg', theme, session)
 
+        if raw:
+            response = Response(diagram_data, mimetype='image/svg+xml')
+            if engine:
+                response.headers['X-Layout-Engine'] = engine
+        else:
+            with stage('encode'):
+                # Return as base64 data URL
+                b64_data = base64.b64encode(diagram_data).decode()
+                result = {
+                    'success': True,
+                    'image': f'data:image/svg+xml;base64,{b64_data}'
+                }
+                if engine:
+                    result['engine'] = engine
+                response = jsonify(result)
+        response.headers['ETag'] = etag
+        return response
+
+    except RenderCancelled as e:
+        return jsonify({'error': str(e), 'superseded': True}), 409
+    except DiagramSyntaxError as e:
+        return syntax_error_response(e)
+    except RendererBusy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/render/batch', methods=['POST'])
+def render_batch():
+    """Render many diagrams concurrently, streaming NDJSON results as they finish"""
+    try:
+        normalized, concurrency = parse_batch(request.json, renderer.workers)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        runnable = []
+        for index, job in enumerate(normalized):
+            error = batch_rejection(job, renderer.backends)
+            if error is None:
+                runnable.append((index, job))
+            else:
+                yield batch_item(index, job, error=error)
+
+        results = renderer.render_batch([job for _, job in runnable], concurrency)
+        for position, diagram_data, error in results:
+            index, job = runnable[position]
+            engine = renderer.layout_engine(job['code']) if error is None and job['format'] == 'graphviz' else None
+            yield batch_item(index, job, diagram_data, error, engine)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/export', methods=['POST'])
 def export_diagram():
     """Export diagram endpoint"""
     try:
-        data = request.json
+        with stage('parse'):
+            data = request.json
         code = data.get('code', '')
         export_format = data.get('format', 'png')
         diagram_format = data.get('diagramFormat', 'graphviz')
@@ -203,54 +480,209 @@ def export_diagram():
         if not code:
             return jsonify({'error': 'No code provided'}), 400
 
-        # Render based on format
-        if export_format == 'drawio':
-            diagram_data = renderer.convert_to_drawio(code, diagram_format)
-            mimetype = 'application/xml'
+        formats = data.get('formats') or [export_format]
+        if isinstance(formats, str):
+            formats = [formats]
+        unknown = [fmt for fmt in formats if fmt not in EXPORT_MIMETYPES]
+        if unknown:
+            return jsonify({'error': f'Unsupported export format: {", ".join(unknown)}'}), 400
+        if diagram_format not in renderer.backends:
+            return jsonify({'error': f'Unsupported format: {diagram_format}'}), 400
+
+        # One layout, however many formats were asked for
+        outputs = renderer.export(diagram_format, code, formats)
+
+        if len(formats) == 1:
+            body = outputs[formats[0]]
+            mimetype = EXPORT_MIMETYPES[formats[0]]
+            filename = f'diagram.{formats[0]}'
         else:
-            if diagram_format == 'graphviz':
-                diagram_data = renderer.render_graphviz(code, export_format)
-            elif diagram_format == 'mermaid':
-                diagram_data = renderer.render_mermaid(code, export_format)
-            elif diagram_format == 'd2':
-                diagram_data = renderer.render_d2(code, export_format)
-            elif diagram_format == 'plantuml':
-                diagram_data = renderer.render_plantuml(code, export_format)
-            else:
-                return jsonify({'error': f'Unsupported format: {diagram_format}'}), 400
+            import zipfile
+
+            archive = BytesIO()
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as bundle:
+                for fmt in formats:
+                    bundle.writestr(f'diagram.{fmt}', outputs[fmt])
+            body = archive.getvalue()
+            mimetype = 'application/zip'
+            filename = 'diagram.zip'
+
+        # A plain response (not send_file's passthrough) so SVG/XML exports get compressed
+        response = Response(body, mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        if diagram_format == 'graphviz':
+            response.headers['X-Layout-Engine'] = renderer.layout_engine(code)
+        return response
+
+    except DiagramSyntaxError as e:
+        return syntax_error_response(e)
+    except RendererBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/tiles', methods=['POST'])
+def create_tiles():
+    """Render a diagram for tiled zooming and describe its pyramid"""
+    try:
+        data = request.json
+        code = data.get('code', '')
+        format_type = data.get('format', 'graphviz')
+        theme = data.get('theme', 'dark')
 
-            mimetype = f'image/{export_format}'
+        if not code:
+            return jsonify({'error': 'No code provided'}), 400
+        if format_type not in renderer.backends:
+            return jsonify({'error': f'Unsupported format: {format_type}'}), 400
 
-        # Send file
-        return send_file(
-            BytesIO(diagram_data),
-            mimetype=mimetype,
-            as_attachment=True,
-            download_name=f'diagram.{export_format}'
-        )
+        pyramid_id, pyramid = renderer.tile_pyramid(format_type, code, theme)
+        result = pyramid.describe()
+        result['id'] = pyramid_id
+        result['url'] = f'/tiles/{pyramid_id}/{{z}}/{{x}}/{{y}}.png'
+        return jsonify(result)
+
+    except TilesUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except PyramidTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except DiagramSyntaxError as e:
+        return syntax_error_response(e)
+    except RendererBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+@app.route('/tiles/<pyramid_id>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def get_tile(pyramid_id, z, x, y):
+    """One 256px PNG tile of a pyramid"""
+    try:
+        tile = renderer.tile(pyramid_id, z, x, y)
+    except TileNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except TilesUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except PyramidTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except RendererBusy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    response = Response(tile, mimetype='image/png')
+    # Tiles are named by content hash, so they never change
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    """Render cache statistics endpoint"""
+    return jsonify(renderer.cache.stats())
+
+@app.route('/cache', methods=['DELETE'])
+def cache_invalidate():
+    """Invalidate the render cache"""
+    renderer.cache.invalidate()
+    return jsonify({'success': True, 'cache': renderer.cache.stats()})
+
+@app.before_request
+def start_timer():
+    # ?profile=1 or X-Profile: 1 runs this request under cProfile (needs PROFILE_REQUESTS=1)
+    profile = profile_requested(request.args.get('profile') or request.headers.get('X-Profile'))
+    g.timer = StageTimer(f'{request.method} {request.path}', profile=profile)
+    g.timer_token = activate(g.timer)
+
+@app.teardown_request
+def stop_timer(exc):
+    token = g.pop('timer_token', None)
+    if token is not None:
+        deactivate(token)
+
+@app.after_request
+def report_timing(response):
+    """Server-Timing header, stage histogram and slow-request log; runs after every other hook"""
+    timer = g.get('timer')
+    if timer is None:
+        return response
+    if timer.profiler is not None:
+        profiled = Response(timer.profile_report(), mimetype='text/plain')
+        profiled.headers['X-Profiled-Status'] = str(response.status_code)
+        response = profiled
+    response.headers['Server-Timing'] = timer.server_timing()
+    # Lets the web UI, on another origin, read the timings from the Performance API
+    response.headers['Timing-Allow-Origin'] = '*'
+    timer.observe(renderer.stage_seconds, endpoint=request.endpoint or 'unknown')
+    timer.log_if_slow()
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Brotli/gzip-encode JSON, SVG and XML bodies for clients that accept it"""
+    if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+        return response
+    if 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+    body = response.get_data()
+    if encoding and compressible(response.mimetype, len(body)):
+        with stage('compress'):
+            response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.after_request
+def count_request(response):
+    renderer.http_requests.inc(endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics endpoint"""
+    return Response(renderer.metrics.expose(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'ok',
-        'message': 'Kre8 Diagram Renderer is running'
+        'message': 'Kre8 Diagram Renderer is running',
+        'plantuml': renderer.plantuml.health(),
+        'mermaid': renderer.mermaid.health(),
+        'backends': renderer.status.report()['backends']
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 once start-up has settled and required backends are warm"""
+    report = renderer.status.report()
+    return jsonify(report), 200 if report['ready'] else 503
+
 def main():
     """Main entry point"""
+    port = int(os.environ.get('RENDERER_PORT', 8000))
     print("🚀 Starting Kre8 Diagram Renderer Server...")
-    print("📡 Listening on http://localhost:8000")
+    print(f"📡 Listening on http://localhost:{port}")
     print("\nEndpoints:")
     print("  POST /render  - Render diagram")
+    print("  POST /render/batch - Render many diagrams (NDJSON stream)")
     print("  POST /export  - Export diagram")
+    print("  POST /tiles   - Tile pyramid for zooming large diagrams")
+    print("  GET  /tiles/<id>/<z>/<x>/<y>.png - One tile")
+    print("  GET  /cache   - Render cache stats")
+    print("  DELETE /cache - Invalidate render cache")
+    print("  GET  /metrics - Prometheus metrics")
     print("  GET  /health  - Health check")
+    print("  GET  /ready   - Readiness probe")
+    print(f"\n⚙️  Render pool: {renderer.workers} workers, queue of {renderer.max_queue}")
     print("\nWaiting for requests...\n")
 
-    app.run(host='0.0.0.0', port=8000, debug=True)
+    # The reloader re-imports this module in a child; only the process that serves warms up
+    use_reloader = os.environ.get('RENDERER_RELOAD') == '1'
+    if not use_reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        renderer.start()
+
+    app.run(host='0.0.0.0', port=port, debug=True, threaded=True, use_reloader=use_reloader)
 
 if __name__ == '__main__':
     main()
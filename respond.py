@@ -2,12 +2,206 @@
 """
 Claude Code Response Helper
 This script helps Claude Code respond to diagram requests from the web UI
+
+Worker mode claims requests one at a time under a lease, so any number of
+responders can drain the queue in parallel:
+
+    python respond.py --worker --handler "python my_handler.py"
+
+The handler gets the request as JSON on stdin and prints the diagram code on
+stdout; a non-zero exit hands the request back to the queue.
+
+Bulk mode answers many requests at once from JSON lines
+({"request_id": 1, "diagram_code": "..."}), committed in batches:
+
+    python respond.py --bulk answers.jsonl
+    producer | python respond.py --bulk
 """
 
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
 import sys
+import threading
+import time
 from database import DiagramDatabase
 
+def run_handler(db, request, handler, worker_id, lease, timeout):
+    """Run the handler for one claimed request, heartbeating its lease meanwhile"""
+    process = subprocess.Popen(
+        handler,
+        shell=True,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True
+    )
+
+    def kill():
+        # The handler runs under a shell in its own session; take out the whole group
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    done = threading.Event()
+    lost = threading.Event()
+
+    def keep_alive():
+        while not done.wait(lease / 3):
+            if not db.heartbeat(request['id'], worker_id, lease):
+                # Someone else owns it now; stop wasting work on it
+                lost.set()
+                kill()
+                return
+
+    heartbeat = threading.Thread(target=keep_alive, daemon=True)
+    heartbeat.start()
+    try:
+        stdout, stderr = process.communicate(json.dumps(request), timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill()
+        try:
+            process.communicate(timeout=5)
+        except subprocess.TimeoutExpired:
+            # Something that left the group still holds the pipes; don't wait on it
+            process.kill()
+        raise Exception(f"handler timed out after {timeout}s")
+    finally:
+        done.set()
+        heartbeat.join()
+
+    if lost.is_set():
+        raise Exception("lease lost")
+    if process.returncode != 0:
+        raise Exception(f"handler exited with {process.returncode}: {stderr.strip()[:200]}")
+    if not stdout.strip():
+        raise Exception("handler produced no diagram code")
+
+    return stdout
+
+def worker(argv):
+    """Claim and answer requests until the queue is empty (--once) or forever"""
+    parser = argparse.ArgumentParser(prog='respond.py --worker', description='Leased request worker')
+    parser.add_argument('--handler', required=True,
+                        help='shell command: request JSON on stdin, diagram code on stdout')
+    parser.add_argument('--worker-id', default=f'{socket.gethostname()}:{os.getpid()}')
+    parser.add_argument('--lease', type=int, default=60, help='lease length in seconds')
+    parser.add_argument('--timeout', type=int, default=300, help='seconds before the handler is killed')
+    parser.add_argument('--poll', type=float, default=1.0, help='seconds to wait when the queue is empty')
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    parser.add_argument('--db', default='kre8_diagrams.db')
+    args = parser.parse_args(argv)
+
+    db = DiagramDatabase(args.db)
+    print(f"👷 Worker {args.worker_id} waiting for requests...")
+    handled = 0
+
+    while True:
+        request = db.claim_next_request(args.worker_id, args.lease)
+        if request is None:
+            if args.once:
+                break
+            time.sleep(args.poll)
+            continue
+
+        print(f"🆔 Request #{request['id']} (attempt {request['attempts']}): {request['message'][:60]}")
+        try:
+            diagram_code = run_handler(db, request, args.handler, args.worker_id, args.lease, args.timeout)
+        except KeyboardInterrupt:
+            db.release_request(request['id'], args.worker_id)
+            print(f"↩️  Request #{request['id']} returned to the queue")
+            break
+        except Exception as e:
+            db.release_request(request['id'], args.worker_id)
+            print(f"✗ Request #{request['id']} failed: {e}")
+            continue
+
+        if db.complete_request(request['id'], args.worker_id, diagram_code):
+            handled += 1
+            print(f"✓ Response added for request #{request['id']}")
+        else:
+            print(f"⚠ Lease on request #{request['id']} expired; response discarded")
+
+    print(f"\n✓ Worker {args.worker_id} answered {handled} request(s)")
+
+def parse_record(line):
+    """Turn one JSONL line into (request_id, diagram_code) or raise ValueError"""
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"invalid JSON: {e}")
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+
+    request_id = record.get('request_id')
+    diagram_code = record.get('diagram_code')
+    if isinstance(request_id, bool) or not isinstance(request_id, (int, str)) \
+            or not str(request_id).strip().isdigit():
+        raise ValueError(f"request_id must be an integer, got {request_id!r}")
+    if not isinstance(diagram_code, str) or not diagram_code.strip():
+        raise ValueError("diagram_code must be a non-empty string")
+
+    return int(request_id), diagram_code
+
+def bulk(argv):
+    """Answer many requests from a JSONL file or stdin in batched transactions"""
+    parser = argparse.ArgumentParser(prog='respond.py --bulk', description='Bulk response ingestion')
+    parser.add_argument('file', nargs='?', default='-', help="JSONL file, or '-' for stdin")
+    parser.add_argument('--batch-size', type=int, default=200, help='records per transaction')
+    parser.add_argument('--db', default='kre8_diagrams.db')
+    args = parser.parse_args(argv)
+
+    db = DiagramDatabase(args.db)
+    source = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+    added = failed = 0
+    batch = []
+
+    def flush():
+        nonlocal added, failed
+        try:
+            errors = db.add_responses(record for _, record in batch)
+        except Exception as e:
+            errors = [f"batch failed: {e}"] * len(batch)
+        for (line_no, (request_id, _)), error in zip(batch, errors):
+            if error:
+                failed += 1
+                print(f"✗ Line {line_no} (request #{request_id}): {error}")
+            else:
+                added += 1
+        batch.clear()
+
+    try:
+        for line_no, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                batch.append((line_no, parse_record(line)))
+            except ValueError as e:
+                failed += 1
+                print(f"✗ Line {line_no}: {e}")
+                continue
+            if len(batch) >= args.batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    print(f"\n✓ {added} response(s) added" + (f", ✗ {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        return worker(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == '--bulk':
+        return bulk(sys.argv[2:])
+
     db = DiagramDatabase()
 
     # Check if request ID provided
@@ -20,6 +214,8 @@ def main():
         if not requests:
             print("✓ No pending requests")
             print("\nUsage: python respond.py <request_id> '<diagram_code>'")
+            print("       python respond.py --worker --handler '<command>'")
+            print("       python respond.py --bulk [answers.jsonl]")
             return
 
         for req in requests:
@@ -75,4 +271,4 @@ def main():
         print(f"✗ Error: {e}")
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -5,53 +5,287 @@ This server acts as a relay between the web UI and Claude Code terminal via SQLi
 """
 
 import asyncio
+import itertools
 import json
+import os
+import urllib.request
 import websockets
 import sys
+from collections import OrderedDict, defaultdict
 from datetime import datetime
-from database import DiagramDatabase
+from http import HTTPStatus
+from database import DiagramDatabase, AsyncDiagramDatabase, NOTIFY_HOST, NOTIFY_PORT
+from metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from timing import StageTimer, stage, activate, deactivate, profile_requested
+
+class ResponseNotifyProtocol(asyncio.DatagramProtocol):
+    """Receives "response ready" signals sent by DiagramDatabase.add_response"""
+
+    def __init__(self, server):
+        self.server = server
+        # The loop only keeps weak references to tasks; hold deliveries until they finish
+        self.deliveries = set()
+
+    def datagram_received(self, data, addr):
+        request_ids = []
+        for part in data.decode(errors='ignore').split(','):
+            if part.strip().isdigit():
+                request_ids.append(int(part))
+        if request_ids:
+            task = asyncio.create_task(self.server.deliver_responses(request_ids))
+            self.deliveries.add(task)
+            task.add_done_callback(self.deliveries.discard)
+
+class ClientChannel:
+    """Per-client outbox drained by its own writer task, so a slow client only delays itself
+
+    Direct messages (acks, errors, the requester's own response) are always kept.
+    Room updates carry a key: a newer update with the same key replaces one that
+    hasn't been sent yet, and once more than `limit` are waiting the oldest is
+    dropped.
+    """
+
+    _direct = itertools.count()
+
+    def __init__(self, websocket, limit, on_coalesce=None, on_drop=None):
+        self.websocket = websocket
+        self.limit = limit
+        self.rooms = set()
+        self.push_images = False
+        self.on_coalesce = on_coalesce
+        self.on_drop = on_drop
+        self.queue = OrderedDict()  # key -> (droppable, frames)
+        self.wakeup = asyncio.Event()
+
+    def send(self, *frames):
+        """Queue frames that must reach this client, in order"""
+        self.queue[('direct', next(self._direct))] = (False, frames)
+        self.wakeup.set()
+
+    def push(self, key, *frames):
+        """Queue a room update; stale updates are coalesced or dropped"""
+        if key in self.queue:
+            del self.queue[key]
+            if self.on_coalesce:
+                self.on_coalesce()
+        self.queue[key] = (True, frames)
+
+        droppable = [k for k, (can_drop, _) in self.queue.items() if can_drop]
+        for stale in droppable[:max(0, len(droppable) - self.limit)]:
+            del self.queue[stale]
+            if self.on_drop:
+                self.on_drop()
+        self.wakeup.set()
+
+    def discard(self, key):
+        """Forget a room update that hasn't been sent yet; it counts as coalesced"""
+        if self.queue.pop(key, None) is not None and self.on_coalesce:
+            self.on_coalesce()
+
+    async def run(self):
+        """Writer loop: send queued frames until the connection closes"""
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while self.queue:
+                    _, (_, frames) = self.queue.popitem(last=False)
+                    for frame in frames:
+                        await self.websocket.send(frame)
+        except websockets.exceptions.ConnectionClosed:
+            pass
 
 class ClaudeCodeServer:
-    def __init__(self):
-        self.connected_clients = set()
-        self.db = DiagramDatabase()
+    def __init__(self, response_timeout=300, db_path='kre8_diagrams.db', notify_port=NOTIFY_PORT):
+        # websocket -> ClientChannel
+        self.connected_clients = {}
+        # diagram id -> subscribed ClientChannels
+        self.rooms = defaultdict(set)
+        self.client_queue_limit = int(os.environ.get('CLIENT_QUEUE_LIMIT', 16))
+        self.db_path = db_path
+        self.notify_port = notify_port
+        # Database calls run off the event loop so one slow query can't stall every client
+        self.db = AsyncDiagramDatabase(DiagramDatabase(db_path, notify_port=notify_port))
+        self.response_timeout = response_timeout
+        # request_id -> (channel, deadline, saved_at, format, push_image, room) for requests awaiting a response
+        self.pending = {}
+        self.poll_interval = float(os.environ.get('RESPONSE_POLL_INTERVAL', 2.0))
+        # Old requests, responses and unused code blobs are pruned in the background
+        self.retention_days = float(os.environ.get('RETENTION_DAYS', 7))
+        self.retention_interval = float(os.environ.get('RETENTION_INTERVAL', 3600))
+        # Render on delivery and push the image as a binary frame to clients that ask
+        self.renderer_url = os.environ.get('RENDERER_URL', 'http://localhost:8000')
+        self.render_on_delivery = os.environ.get('RENDER_ON_DELIVERY', '1') != '0'
+        self.render_timeout = float(os.environ.get('RENDER_PUSH_TIMEOUT', 30))
+        self.setup_metrics()
         print("✓ Database initialized")
 
+    def setup_metrics(self):
+        """Register the relay's Prometheus metrics"""
+        self.metrics = MetricsRegistry()
+        self.metrics.gauge('kre8_ws_connected_clients', 'Connected WebSocket clients',
+                           fn=lambda: len(self.connected_clients))
+        self.metrics.gauge('kre8_ws_awaiting_responses', 'Requests waiting for push delivery',
+                           fn=lambda: len(self.pending))
+        self.metrics.gauge('kre8_ws_rooms', 'Diagram rooms with at least one subscriber',
+                           fn=lambda: len(self.rooms))
+        self.db_requests = self.metrics.gauge(
+            'kre8_db_requests', 'Requests in the database by status')
+        self.messages_received = self.metrics.counter(
+            'kre8_ws_messages_total', 'WebSocket messages received')
+        self.responses_delivered = self.metrics.counter(
+            'kre8_responses_delivered_total', 'Responses pushed to clients')
+        self.images_pushed = self.metrics.counter(
+            'kre8_images_pushed_total', 'Rendered images pushed as binary frames')
+        self.updates_coalesced = self.metrics.counter(
+            'kre8_ws_updates_coalesced_total', 'Room updates replaced by a newer one before sending')
+        self.updates_dropped = self.metrics.counter(
+            'kre8_ws_updates_dropped_total', 'Room updates dropped from a full client queue')
+        self.requests_timed_out = self.metrics.counter(
+            'kre8_requests_timed_out_total', 'Requests that expired without a response')
+        self.stage_seconds = self.metrics.histogram(
+            'kre8_ws_message_stage_duration_seconds',
+            'Time spent in each stage of handling a WebSocket message, by message type and stage')
+        self.response_latency = self.metrics.histogram(
+            'kre8_request_response_latency_seconds',
+            'Time from a request being saved to its response being delivered',
+            buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300))
+
+    async def process_http(self, path, request_headers):
+        """Serve plain HTTP /metrics and /health on the WebSocket port"""
+        if path == '/metrics':
+            # Refresh database-backed gauges at scrape time
+            try:
+                for status, count in (await self.db.count_requests_by_status()).items():
+                    self.db_requests.set(count, status=status)
+            except Exception as e:
+                print(f"Error collecting database metrics: {e}")
+            body = self.metrics.expose().encode()
+            return HTTPStatus.OK, [('Content-Type', METRICS_CONTENT_TYPE)], body
+
+        if path == '/health':
+            body = json.dumps({'status': 'ok', 'clients': len(self.connected_clients)}).encode()
+            return HTTPStatus.OK, [('Content-Type', 'application/json')], body
+
+        if path == '/ready':
+            # Listening already; ready once the database answers too
+            try:
+                await self.db.count_requests_by_status()
+                status, report = HTTPStatus.OK, {'ready': True}
+            except Exception as e:
+                status, report = HTTPStatus.SERVICE_UNAVAILABLE, {'ready': False, 'error': str(e)}
+            return status, [('Content-Type', 'application/json')], json.dumps(report).encode()
+
+        return None
+
     async def handle_client(self, websocket, path):
         """Handle WebSocket client connection"""
-        self.connected_clients.add(websocket)
+        channel = ClientChannel(websocket, self.client_queue_limit,
+                                on_coalesce=self.updates_coalesced.inc,
+                                on_drop=self.updates_dropped.inc)
+        self.connected_clients[websocket] = channel
+        writer = asyncio.create_task(channel.run())
         print(f"✓ New client connected. Total clients: {len(self.connected_clients)}")
 
         try:
-            await websocket.send(json.dumps({
+            channel.send(json.dumps({
                 'type': 'message',
                 'content': 'Connected to Claude Code server'
             }))
 
             async for message in websocket:
-                await self.process_message(websocket, message)
+                self.messages_received.inc()
+                await self.process_message(channel, message)
 
         except websockets.exceptions.ConnectionClosed:
             print("Client disconnected")
         finally:
-            self.connected_clients.remove(websocket)
+            del self.connected_clients[websocket]
+            for room in channel.rooms:
+                self.leave_room(channel, room)
+            # The room still wants responses to requests its members made
+            for request_id, (client, *_, room) in list(self.pending.items()):
+                if client is channel and room is None:
+                    del self.pending[request_id]
+            writer.cancel()
 
-    async def process_message(self, websocket, message):
-        """Process incoming WebSocket message"""
+    def join_room(self, channel, room, push_images=False):
+        """Subscribe a client to a diagram's updates"""
+        self.rooms[room].add(channel)
+        channel.rooms.add(room)
+        channel.push_images = channel.push_images or push_images
+
+    def leave_room(self, channel, room):
+        """Unsubscribe a client; empty rooms are forgotten"""
+        subscribers = self.rooms.get(room)
+        if subscribers is not None:
+            subscribers.discard(channel)
+            if not subscribers:
+                del self.rooms[room]
+
+    async def process_message(self, channel, message):
+        """Process incoming WebSocket message, timing each stage (database calls included)"""
+        timer = StageTimer('WebSocket message')
+        token = activate(timer)
         try:
-            data = json.loads(message)
+            message_type = await self.handle_message(channel, message, timer)
+        finally:
+            deactivate(token)
+
+        timer.observe(self.stage_seconds, type=message_type or 'invalid')
+        timer.log_if_slow()
+        if timer.profiler is not None:
+            channel.send(json.dumps({
+                'type': 'profile',
+                'timing': timer.server_timing(),
+                'content': timer.profile_report()
+            }))
+
+    async def handle_message(self, channel, message, timer):
+        """Act on one message; returns its type"""
+        message_type = None
+        try:
+            with stage('parse'):
+                data = json.loads(message)
             message_type = data.get('type')
+            timer.name = f'WebSocket {message_type}'
+            # "profile": true runs the rest under cProfile (needs PROFILE_REQUESTS=1)
+            if profile_requested(data.get('profile')):
+                timer.start_profile()
             user_message = data.get('message', '')
             context = data.get('context', {})
 
+            if message_type in ('subscribe', 'unsubscribe'):
+                room = str(data.get('diagramId') or '')
+                if not room:
+                    raise ValueError(f"{message_type} needs a diagramId")
+                if message_type == 'subscribe':
+                    self.join_room(channel, room, push_images=bool(data.get('pushImage')))
+                else:
+                    channel.rooms.discard(room)
+                    self.leave_room(channel, room)
+                channel.send(json.dumps({
+                    'type': f'{message_type}d',
+                    'diagramId': room,
+                    'subscribers': len(self.rooms.get(room, ()))
+                }))
+                return message_type
+
             # Save request to database
-            request_id = self.db.add_request(
+            request_id = await self.db.add_request(
                 message=user_message,
                 diagram_type=context.get('diagramType', 'architecture'),
                 format_type=context.get('format', 'graphviz'),
                 current_code=context.get('currentCode', '')
             )
 
+            # Register for push delivery before anyone can answer
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            room = str(context.get('diagramId') or '') or None
+            self.pending[request_id] = (channel, now + self.response_timeout, now,
+                                        context.get('format', 'graphviz'), bool(context.get('pushImage')), room)
+
             # Print the user's message to terminal for Claude Code to see
             print("\n" + "="*60)
             print(f"📥 NEW REQUEST #{request_id} from Web UI:")
@@ -63,58 +297,180 @@ class ClaudeCodeServer:
             print(f"\n💭 Run: python respond.py {request_id} to respond\n")
 
             # Send acknowledgment to web UI
-            await websocket.send(json.dumps({
+            channel.send(json.dumps({
                 'type': 'message',
                 'content': f'⏳ Request #{request_id} saved. Waiting for Claude Code response...'
             }))
 
-            # Start polling for response
-            asyncio.create_task(self.poll_for_response(websocket, request_id))
+            # Let the rest of the room know a change is on its way
+            if room is not None:
+                notice = json.dumps({
+                    'type': 'message',
+                    'content': f'👥 Request #{request_id} from a collaborator: {user_message}'
+                })
+                for subscriber in self.rooms.get(room, ()):
+                    if subscriber is not channel:
+                        subscriber.push(('notice', request_id), notice)
 
         except Exception as e:
             print(f"Error processing message: {e}")
-            await websocket.send(json.dumps({
+            channel.send(json.dumps({
                 'type': 'error',
                 'message': str(e)
             }))
+        return message_type
+
+    async def deliver_responses(self, request_ids):
+        """Send any available responses for the given requests to their clients"""
+        request_ids = [request_id for request_id in request_ids if request_id in self.pending]
+        if not request_ids:
+            return
+
+        responses = await self.db.get_responses(request_ids)
+
+        deliveries = []
+        for request_id, response in responses.items():
+            entry = self.pending.pop(request_id, None)
+            if entry is not None:
+                deliveries.append(self.deliver_response(request_id, response, entry))
+
+        # Renders run side by side; one slow diagram doesn't hold up the rest
+        await asyncio.gather(*deliveries)
+
+    async def deliver_response(self, request_id, response, entry):
+        """Send one response to its client and every subscriber of its diagram
+
+        The image is rendered and each message encoded once, however many
+        subscribers there are; queueing to each client never blocks.
+        """
+        channel, _, saved_at, format_type, push_image, room = entry
+        subscribers = set(self.rooms.get(room, ())) if room is not None else set()
+        others = subscribers - {channel}
+        message = {
+            'type': 'diagram_code',
+            'code': response['diagram_code'],
+            'requestId': request_id
+        }
+        if room is not None:
+            message['diagramId'] = room
+
+        wants_image = push_image or any(subscriber.push_images for subscriber in others)
+        image = None
+        if wants_image and self.render_on_delivery:
+            try:
+                image = await self.render_image(response['diagram_code'], format_type)
+            except Exception as e:
+                # The client renders it itself, as before
+                print(f"⚠ Render on delivery failed for request #{request_id}: {e}")
+
+        code_only = (json.dumps(message),)
+        with_image = code_only
+        if image is not None:
+            data, mimetype, engine = image
+            message['image'] = {'mimetype': mimetype, 'bytes': len(data)}
+            if engine:
+                message['image']['engine'] = engine
+            # Diagram code first; the image follows as the next (binary) frame
+            with_image = (json.dumps(message), data)
 
-    async def poll_for_response(self, websocket, request_id, timeout=300):
-        """Poll database for response to the request"""
-        start_time = asyncio.get_event_loop().time()
+        # The requester always gets its answer; the room only needs the latest diagram
+        if channel.websocket in self.connected_clients:
+            frames = with_image if push_image else code_only
+            if channel in subscribers:
+                # A room update still waiting for this client is older than its answer
+                channel.discard(('diagram', room))
+            channel.send(*frames)
+        for subscriber in others:
+            subscriber.push(('diagram', room), *(with_image if subscriber.push_images else code_only))
+
+        if image is not None:
+            self.images_pushed.inc()
+        self.responses_delivered.inc()
+        self.response_latency.observe(asyncio.get_running_loop().time() - saved_at)
+        audience = f" and {len(others)} subscriber(s)" if others else ''
+        print(f"✓ Sent response for request #{request_id} to web UI{audience}")
+
+    async def render_image(self, code, format_type):
+        """Render through renderer.py's /render; returns (bytes, mimetype, engine)"""
+        def post():
+            # Raw mode: the image bytes themselves, no base64 round trip
+            body = json.dumps({'code': code, 'format': format_type, 'theme': 'dark', 'raw': True}).encode()
+            request = urllib.request.Request(
+                f'{self.renderer_url}/render', data=body, headers={'Content-Type': 'application/json'}
+            )
+            with urllib.request.urlopen(request, timeout=self.render_timeout) as reply:
+                return reply.read(), reply.headers.get_content_type(), reply.headers.get('X-Layout-Engine')
+
+        return await asyncio.get_running_loop().run_in_executor(None, post)
+
+    async def watch_pending(self):
+        """Single shared fallback watcher: one batched query for all pending requests"""
+        loop = asyncio.get_running_loop()
 
         while True:
-            # Check if timeout reached (5 minutes)
-            if asyncio.get_event_loop().time() - start_time > timeout:
-                await websocket.send(json.dumps({
-                    'type': 'error',
-                    'message': f'Request #{request_id} timed out after {timeout}s'
-                }))
-                break
+            await asyncio.sleep(self.poll_interval)
 
-            # Check for response in database
-            response = self.db.get_response(request_id)
+            if not self.pending:
+                continue
 
-            if response:
-                # Send diagram code to client
-                await websocket.send(json.dumps({
-                    'type': 'diagram_code',
-                    'code': response['diagram_code']
-                }))
-                print(f"✓ Sent response for request #{request_id} to web UI")
-                break
+            # Expire requests that waited too long
+            now = loop.time()
+            for request_id, (channel, deadline, *_) in list(self.pending.items()):
+                if now > deadline:
+                    del self.pending[request_id]
+                    self.requests_timed_out.inc()
+                    if channel.websocket not in self.connected_clients:
+                        continue
+                    channel.send(json.dumps({
+                        'type': 'error',
+                        'message': f'Request #{request_id} timed out after {self.response_timeout}s'
+                    }))
+
+            # Catch responses written without a notification
+            try:
+                await self.deliver_responses(list(self.pending))
+            except Exception as e:
+                print(f"Error checking pending responses: {e}")
 
-            # Wait before polling again
-            await asyncio.sleep(1)
+    async def prune_periodically(self):
+        """Run batched retention every retention_interval seconds"""
+        while True:
+            try:
+                deleted = await self.db.prune(self.retention_days)
+                if deleted:
+                    print(f"🧹 Pruned {deleted} request(s) older than {self.retention_days:g} days")
+            except Exception as e:
+                print(f"Error pruning old requests: {e}")
+            await asyncio.sleep(self.retention_interval)
 
     async def start_server(self, host='localhost', port=8765):
         """Start the WebSocket server"""
         print(f"🚀 Starting Kre8 Diagram Builder WebSocket Server...")
         print(f"📡 Listening on ws://{host}:{port}")
-        print(f"💾 Database: kre8_diagrams.db")
+        print(f"💾 Database: {self.db_path}")
+        print(f"🔔 Response notifications on udp://{NOTIFY_HOST}:{self.notify_port}")
+        print(f"📈 Metrics on http://{host}:{port}/metrics, readiness on /ready")
         print(f"\nWaiting for connections...\n")
 
-        async with websockets.serve(self.handle_client, host, port):
-            await asyncio.Future()  # Run forever
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: ResponseNotifyProtocol(self),
+            local_addr=(NOTIFY_HOST, self.notify_port)
+        )
+        watcher = asyncio.create_task(self.watch_pending())
+        pruner = asyncio.create_task(self.prune_periodically()) if self.retention_days > 0 else None
+
+        try:
+            # permessage-deflate shrinks JSON and pushed SVG frames on slow links
+            async with websockets.serve(self.handle_client, host, port,
+                                        process_request=self.process_http,
+                                        compression='deflate'):
+                await asyncio.Future()  # Run forever
+        finally:
+            watcher.cancel()
+            if pruner is not None:
+                pruner.cancel()
+            transport.close()
 
 def main():
     """Main entry point"""
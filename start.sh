@@ -47,27 +47,67 @@ mkdir -p logs
 echo -e "${GREEN}✓ Environment check complete${NC}"
 echo ""
 
+# Cleanup function
+cleanup() {
+    echo ""
+    echo -e "${YELLOW}🛑 Stopping servers...${NC}"
+    kill $RENDERER_PID 2>/dev/null || true
+    kill $WEBSOCKET_PID 2>/dev/null || true
+    kill $WEB_PID 2>/dev/null || true
+    rm -f logs/*.pid
+    echo -e "${GREEN}✓ All servers stopped${NC}"
+    exit ${1:-0}
+}
+
+# Trap Ctrl+C
+trap cleanup INT TERM
+
+# Wait until a URL answers 200 instead of sleeping a fixed time
+# Usage: wait_ready <name> <url> <log file>
+wait_ready() {
+    if ! python3 - "$2" "${READY_TIMEOUT:-120}" <<'PY'
+import sys, time, urllib.request
+url, deadline = sys.argv[1], time.monotonic() + float(sys.argv[2])
+while time.monotonic() < deadline:
+    try:
+        with urllib.request.urlopen(url, timeout=1):
+            sys.exit(0)
+    except Exception:
+        time.sleep(0.1)
+sys.exit(1)
+PY
+    then
+        echo -e "${YELLOW}⚠ $1 did not become ready; last lines of $3:${NC}"
+        tail -n 20 "$3"
+        cleanup 1
+    fi
+    echo -e "      ${GREEN}✓${NC} $1 ready"
+}
+
 # Start servers in background
 echo -e "${BLUE}🚀 Starting servers...${NC}"
 echo ""
 
 # 1. Start Renderer Server
 echo -e "${GREEN}[1/3]${NC} Starting Diagram Renderer (port 8000)..."
-python3 renderer.py > logs/renderer.log 2>&1 &
+# RENDERER_SCRIPT=async_renderer.py runs the asyncio service instead
+python3 "${RENDERER_SCRIPT:-renderer.py}" > logs/renderer.log 2>&1 &
 RENDERER_PID=$!
-sleep 2
 
 # 2. Start WebSocket Server
 echo -e "${GREEN}[2/3]${NC} Starting Claude Code WebSocket (port 8765)..."
 python3 server.py > logs/server.log 2>&1 &
 WEBSOCKET_PID=$!
-sleep 2
 
 # 3. Start Web Server
 echo -e "${GREEN}[3/3]${NC} Starting Web Server (port 3000)..."
 python3 -m http.server 3000 > logs/web.log 2>&1 &
 WEB_PID=$!
-sleep 2
+
+# All three boot in parallel; the renderer's /ready waits for tool discovery and warm-up
+wait_ready "Diagram Renderer" "http://localhost:${RENDERER_PORT:-8000}/ready" logs/renderer.log
+wait_ready "WebSocket server" "http://localhost:8765/ready" logs/server.log
+wait_ready "Web server" "http://localhost:3000/" logs/web.log
 
 echo ""
 echo -e "${GREEN}✓ All servers started successfully!${NC}"
@@ -98,20 +138,5 @@ echo $RENDERER_PID > logs/renderer.pid
 echo $WEBSOCKET_PID > logs/server.pid
 echo $WEB_PID > logs/web.pid
 
-# Cleanup function
-cleanup() {
-    echo ""
-    echo -e "${YELLOW}🛑 Stopping servers...${NC}"
-    kill $RENDERER_PID 2>/dev/null || true
-    kill $WEBSOCKET_PID 2>/dev/null || true
-    kill $WEB_PID 2>/dev/null || true
-    rm -f logs/*.pid
-    echo -e "${GREEN}✓ All servers stopped${NC}"
-    exit 0
-}
-
-# Trap Ctrl+C
-trap cleanup INT TERM
-
 # Wait for all background processes
 wait
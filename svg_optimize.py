@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+SVG post-render optimization
+
+Shrinks renderer SVG output without changing how it draws: drops comments,
+the DOCTYPE and metadata, rounds geometry to a fixed precision, removes
+whitespace-only lines between tags and deduplicates styling. Graphviz repeats
+the same presentation attributes on every node and edge; those become shared
+classes. Embedded stylesheets (Mermaid) lose repeated identical rules.
+"""
+
+import os
+import re
+
+SVG_PRECISION = int(os.environ.get('SVG_PRECISION', 2))
+
+COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+DOCTYPE_RE = re.compile(r'<!DOCTYPE[^>\[]*(?:\[[^\]]*\])?\s*>', re.IGNORECASE)
+METADATA_RE = re.compile(r'<metadata\b.*?</metadata>', re.DOTALL)
+BLANK_BETWEEN_TAGS_RE = re.compile(r'>\s*\n\s*<')
+STYLE_BLOCK_RE = re.compile(r'(<style\b[^>]*>)(.*?)(</style>)', re.DOTALL)
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+NUMBER_RE = re.compile(r'-?\d*\.\d+')
+# More decimals than SVG_PRECISION, or trailing zeros; both start with a literal '.', cheap to scan for
+NEEDS_ROUNDING_RE = re.compile(r'\.(?:\d{%d}|\d*0(?!\d))' % (SVG_PRECISION + 1))
+# Leading space rather than a lookbehind: a literal prefix keeps the scan fast
+GEOMETRY_ATTR_RE = re.compile(
+    r' (points|d|x|y|x1|y1|x2|y2|cx|cy|r|rx|ry|width|height|viewBox|transform'
+    r'|font-size|stroke-width)="([^"]*)"'
+)
+START_TAG_RE = re.compile(r'<([A-Za-z][\w:.-]*)((?:\s+[\w:.-]+="[^"]*")*)\s*(/?)>')
+ATTR_RE = re.compile(r'\s+([\w:.-]+)="([^"]*)"')
+SVG_OPEN_RE = re.compile(r'<svg\b[^>]*>')
+
+# Presentation attributes that mean the same thing as the CSS property of the same name
+PRESENTATION_ATTRS = frozenset((
+    'fill', 'fill-opacity', 'stroke', 'stroke-width', 'stroke-dasharray', 'stroke-opacity',
+    'font-family', 'font-size', 'font-weight', 'font-style', 'text-anchor',
+))
+
+# Unitless in an attribute, but CSS wants a length
+LENGTH_PROPERTIES = ('font-size', 'stroke-width')
+PLAIN_NUMBER_RE = re.compile(r'-?\d*\.?\d+')
+
+# A class only pays for itself once it replaces this many attribute groups
+MIN_STYLE_USES = 3
+
+
+def _round_number(match):
+    value = round(float(match.group(0)), SVG_PRECISION)
+    text = f'{value:.{SVG_PRECISION}f}'.rstrip('0').rstrip('.')
+    return '0' if text in ('', '-0') else text
+
+
+def _round_geometry(match):
+    if not NEEDS_ROUNDING_RE.search(match.group(2)):
+        return match.group(0)
+    return f' {match.group(1)}="{NUMBER_RE.sub(_round_number, match.group(2))}"'
+
+
+def _dedupe_css(match):
+    """Keep only the last copy of each identical rule; the last one decides the cascade"""
+    css = CSS_COMMENT_RE.sub('', match.group(2))
+    rules = [rule.strip() + '}' for rule in css.split('}') if rule.strip()]
+    if any('{' in rule[rule.index('{') + 1:] for rule in rules if '{' in rule):
+        return match.group(0)  # nested at-rules; leave them alone
+    kept = []
+    seen = set()
+    for rule in reversed(rules):
+        if rule not in seen:
+            seen.add(rule)
+            kept.append(rule)
+    return match.group(1) + ''.join(reversed(kept)) + match.group(3)
+
+
+def _css_declaration(name, value):
+    if name in LENGTH_PROPERTIES and PLAIN_NUMBER_RE.fullmatch(value):
+        value += 'px'
+    return f'{name}:{value}'
+
+
+def _style_key(attrs):
+    return tuple((name, value) for name, value in attrs if name in PRESENTATION_ATTRS)
+
+
+def _classify_presentation(svg):
+    """Replace repeated presentation attribute groups with shared CSS classes"""
+    tags = []
+    counts = {}
+    for match in START_TAG_RE.finditer(svg):
+        attrs = ATTR_RE.findall(match.group(2))
+        key = _style_key(attrs)
+        if len(key) > 1:
+            counts[key] = counts.get(key, 0) + 1
+            tags.append((match, attrs, key))
+
+    classes = {}
+    for key, uses in sorted(counts.items(), key=lambda item: -item[1]):
+        if uses >= MIN_STYLE_USES:
+            classes[key] = f's{len(classes)}'
+    if not classes:
+        return svg
+
+    # Splice the rewritten tags in one pass over the matches already found
+    parts = []
+    position = 0
+    for match, attrs, key in tags:
+        name = classes.get(key)
+        if name is None:
+            continue
+        kept = [(attr, value) for attr, value in attrs if attr not in PRESENTATION_ATTRS]
+        existing = [value for attr, value in kept if attr == 'class']
+        kept = [(attr, value) for attr, value in kept if attr != 'class']
+        kept.append(('class', f'{existing[0]} {name}' if existing else name))
+        attributes = ''.join(f' {attr}="{value}"' for attr, value in kept)
+        parts.append(svg[position:match.start()])
+        parts.append(f'<{match.group(1)}{attributes}{match.group(3)}>')
+        position = match.end()
+    parts.append(svg[position:])
+    svg = ''.join(parts)
+    rules = ''.join(
+        '.{}{{{}}}'.format(name, ';'.join(_css_declaration(attr, value) for attr, value in key))
+        for key, name in classes.items()
+    )
+    opening = SVG_OPEN_RE.search(svg)
+    return f'{svg[:opening.end()]}<style>{rules}</style>{svg[opening.end():]}'
+
+
+def optimize_svg(data):
+    """Return smaller SVG bytes that render the same; unparseable input is returned as is"""
+    try:
+        svg = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data
+    if not SVG_OPEN_RE.search(svg):
+        return data
+
+    svg = COMMENT_RE.sub('', svg)
+    svg = DOCTYPE_RE.sub('', svg)
+    svg = METADATA_RE.sub('', svg)
+    svg = GEOMETRY_ATTR_RE.sub(_round_geometry, svg)
+    svg = BLANK_BETWEEN_TAGS_RE.sub('><', svg)
+
+    if '<style' in svg:
+        # Author CSS beats presentation attributes but not always classes; keep them as they are
+        svg = STYLE_BLOCK_RE.sub(_dedupe_css, svg)
+    else:
+        svg = _classify_presentation(svg)
+
+    return svg.strip().encode('utf-8')
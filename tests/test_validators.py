@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Syntax pre-validation: valid sources pass whatever their line endings and
+trailing whitespace, and real errors come back with the right line and column.
+
+Run from the project root:  python -m unittest discover tests
+"""
+
+import unittest
+
+from validators import DiagramSyntaxError, check, validate
+
+
+class ValidatorCase(unittest.TestCase):
+    format_type = None
+
+    def assertValid(self, code):
+        self.assertEqual(validate(self.format_type, code), [], repr(code))
+
+    def assertError(self, code, line, column, message=None):
+        errors = validate(self.format_type, code)
+        self.assertTrue(errors, f"expected a syntax error in {code!r}")
+        self.assertEqual((errors[0]['line'], errors[0]['column']), (line, column), errors[0]['message'])
+        if message is not None:
+            self.assertIn(message, errors[0]['message'])
+
+
+class GraphvizTests(ValidatorCase):
+    format_type = 'graphviz'
+
+    def test_trailing_newline_and_spaces(self):
+        self.assertValid('digraph { a -> b }\n')
+        self.assertValid('digraph { a -> b }  \n\n')
+        self.assertValid('digraph { a -> b; }\t')
+
+    def test_trailing_comments(self):
+        self.assertValid('digraph { a -> b; }// c')
+        self.assertValid('digraph { a -> b }\n/* done */\n')
+        self.assertValid('digraph { a -> b }\n# done')
+
+    def test_comments_anywhere(self):
+        self.assertValid('digraph {\n  a -> b  # edge\n  # indented\n  b -> c // more\n}\n')
+
+    def test_crlf(self):
+        self.assertValid('digraph {\r\n  a -> b;\r\n  b [label="x"];\r\n}\r\n')
+
+    def test_errors_report_line_and_column(self):
+        self.assertError('digraph { a -> }\n', 1, 16, "after '->'")
+        self.assertError('digraph {\n  a -> b\n  c -> \n}\n', 4, 1, "after '->'")
+        self.assertError('graph { a -> b }', 1, 11, "'->'")
+        self.assertError('digraph { a -> b }\n/* open', 2, 1, 'unterminated comment')
+        self.assertError('digraph {\r\n  a [label="x];\r\n}\r\n', 2, 12, 'unterminated string')
+
+
+class MermaidTests(ValidatorCase):
+    format_type = 'mermaid'
+
+    def test_trailing_newline_and_spaces(self):
+        self.assertValid('graph TD\n  A[Start] --> B(End)\n')
+        self.assertValid('graph TD\n  A --> B  \n\n  ')
+
+    def test_comments(self):
+        self.assertValid('%% header comment\ngraph TD\n  A --> B %% trailing\n%% last\n')
+
+    def test_crlf(self):
+        self.assertValid('graph TD\r\n  subgraph one\r\n    A[a] --> B\r\n  end\r\n')
+        self.assertValid('sequenceDiagram\r\n  loop every minute\r\n    A->>B: ping\r\n  end\r\n')
+
+    def test_front_matter(self):
+        self.assertValid('---\ntitle: Flow\n---\ngraph TD\n  A --> B\n')
+        self.assertValid('---\r\ntitle: Flow\r\n---\r\ngraph TD\r\n  A --> B\r\n')
+
+    def test_unknown_types_pass_through(self):
+        self.assertValid('venn-beta\n  A\n')
+
+    def test_errors_report_line_and_column(self):
+        self.assertError('graph TD\n  A[Start --> B\n', 2, 4, "'[' is never closed")
+        self.assertError('sequenceDiagram\n  loop x\n    A->>B: hi\n', 2, 3, "'loop' is never closed")
+        self.assertError('\n\n', 1, 1, 'expected a diagram type')
+
+
+class D2Tests(ValidatorCase):
+    format_type = 'd2'
+
+    def test_trailing_newline_and_spaces(self):
+        self.assertValid('a -> b\n')
+        self.assertValid('server: {\n  shape: rectangle\n}  \n\n')
+
+    def test_comments(self):
+        self.assertValid('# top\na -> b # trailing\n"""\nblock comment\n"""\n')
+
+    def test_crlf(self):
+        self.assertValid('a -> b: "label"\r\nbox: {\r\n  c\r\n}\r\n')
+        self.assertValid('doc: |md\r\n  # Title\r\n|\r\n')
+
+    def test_errors_report_line_and_column(self):
+        self.assertError('a -> b\nbox: {\n  c\n', 2, 6, "'{' is never closed")
+        self.assertError('a -> b\n}\n', 2, 1, "unexpected '}'")
+        self.assertError('a -> b: "open\n', 1, 9, 'unterminated string')
+
+
+class PlantUMLTests(ValidatorCase):
+    format_type = 'plantuml'
+
+    def test_trailing_newline_and_spaces(self):
+        self.assertValid('@startuml\nA -> B\n@enduml\n')
+        self.assertValid('@startuml\nA -> B\n@enduml  \n\n')
+
+    def test_comments(self):
+        self.assertValid("' comment\n@startuml\nA -> B ' note\n/' block '/\n@enduml\n")
+
+    def test_crlf(self):
+        self.assertValid('@startuml\r\nA -> B\r\n@enduml\r\n')
+
+    def test_without_markers(self):
+        self.assertValid('A -> B\n')
+
+    def test_errors_report_line_and_column(self):
+        self.assertError('@startuml\nA -> B\n', 1, 1, 'never closed')
+        self.assertError('A -> B\n  @enduml\n', 2, 3, 'without a matching')
+        self.assertError('@startuml\nA -> B\n@endmindmap\n', 3, 1, 'does not close')
+
+
+class CheckTests(unittest.TestCase):
+    def test_check_raises_with_details(self):
+        with self.assertRaises(DiagramSyntaxError) as raised:
+            check('graphviz', 'digraph { a -> }')
+        self.assertEqual(raised.exception.errors[0]['line'], 1)
+        self.assertIn('line 1, column 16', str(raised.exception))
+
+    def test_unknown_format_is_not_checked(self):
+        self.assertEqual(validate('svgbob', '---->'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tiled image pyramid for zooming very large diagrams
+
+A rendered PNG is cut into fixed-size tiles at several zoom levels so the
+browser only fetches what is on screen. Level `max_level` is the render at
+full resolution; every level below halves it, down to level 0 which fits in a
+single tile. Levels are built on first use and tiles are cut on demand, so a
+pyramid costs only what is actually viewed.
+
+Pillow is optional: without it the renderer simply reports tiles as
+unavailable and the client shows the single image.
+"""
+
+import math
+import threading
+from io import BytesIO
+
+TILE_SIZE = 256
+
+
+class TilesUnavailable(Exception):
+    """Raised when Pillow is not installed"""
+
+
+class TileNotFound(Exception):
+    """Raised for a tile outside the pyramid"""
+
+
+class PyramidTooLarge(Exception):
+    """Raised when a render has more pixels than a pyramid may decode"""
+
+
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise TilesUnavailable("Tiled zoom needs Pillow. Install with: pip install Pillow")
+    return Image
+
+
+def max_level(width, height, tile_size=TILE_SIZE):
+    """Number of halvings until the whole image fits in one tile"""
+    return max(0, math.ceil(math.log2(max(width, height, 1) / tile_size)))
+
+
+def image_size(png_data):
+    """(width, height) of a PNG, read from its header without decoding pixels"""
+    with _pillow().open(BytesIO(png_data)) as image:
+        return image.size
+
+
+class TilePyramid:
+    def __init__(self, png_data, tile_size=TILE_SIZE, max_pixels=None):
+        self.png_data = png_data
+        self.tile_size = tile_size
+        self.width, self.height = image_size(png_data)
+        if max_pixels and self.width * self.height > max_pixels:
+            raise PyramidTooLarge(
+                f"Render is {self.width}x{self.height}, over the {max_pixels} pixel tile limit"
+            )
+        self.max_level = max_level(self.width, self.height, tile_size)
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def describe(self):
+        """Pyramid geometry for the client"""
+        return {
+            'width': self.width,
+            'height': self.height,
+            'tileSize': self.tile_size,
+            'maxLevel': self.max_level,
+        }
+
+    def level(self, z):
+        """Decoded image for level z, halving down from the nearest level already built"""
+        with self._lock:
+            built = min((level for level in self._levels if level >= z), default=None)
+            if built is None:
+                Image = _pillow()
+                with Image.open(BytesIO(self.png_data)) as source:
+                    self._levels[self.max_level] = source.convert('RGBA')
+                built = self.max_level
+
+            # reduce() box-filters by an integer factor, far cheaper than resize()
+            for level in range(built - 1, z - 1, -1):
+                self._levels[level] = self._levels[level + 1].reduce(2)
+            return self._levels[z]
+
+    def tile(self, z, x, y):
+        """PNG bytes of tile (x, y) at level z; edge tiles are padded transparent"""
+        if not 0 <= z <= self.max_level:
+            raise TileNotFound(f"Level {z} outside 0..{self.max_level}")
+
+        scale = 2 ** (self.max_level - z)
+        columns = math.ceil(self.width / scale / self.tile_size)
+        rows = math.ceil(self.height / scale / self.tile_size)
+        if not (0 <= x < columns and 0 <= y < rows):
+            raise TileNotFound(f"Tile {x},{y} outside {columns}x{rows} at level {z}")
+
+        left, top = x * self.tile_size, y * self.tile_size
+        tile = self.level(z).crop((left, top, left + self.tile_size, top + self.tile_size))
+        buffer = BytesIO()
+        tile.save(buffer, 'PNG', compress_level=1)
+        return buffer.getvalue()
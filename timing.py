@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Per-request stage timing and on-demand profiling
+
+A StageTimer is bound to the request being served through a context variable,
+so it follows asyncio tasks, and renderer.py carries it onto its worker
+threads. Code along the request path marks stages with `with stage('tool'):`
+whether or not a timer is active. A request's stages go out as a
+Server-Timing header, into a per-stage histogram and, past SLOW_REQUEST_MS,
+to the slow-request log.
+
+With PROFILE_REQUESTS=1 a single request can also ask to be run under
+cProfile and get the report back instead of its normal response.
+"""
+
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 1000))
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '0') == '1'
+PROFILE_LINES = int(os.environ.get('PROFILE_LINES', 40))
+
+_current = contextvars.ContextVar('stage_timer', default=None)
+
+
+class StageTimer:
+    def __init__(self, name, profile=False):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+        self.profiler = None
+        self._thread_profiles = []
+        if profile:
+            self.start_profile()
+
+    def start_profile(self):
+        """Run the rest of this request under cProfile"""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            self.profiler = profiler
+        except ValueError:
+            pass  # Python 3.12+ allows one profiler at a time and another request has it
+
+    def add(self, name, seconds):
+        """Add time to a stage; a stage entered more than once accumulates"""
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing header value: every stage plus the total, in milliseconds"""
+        with self._lock:
+            stages = list(self.stages.items())
+        entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in stages]
+        entries.append(f'total;dur={self.elapsed() * 1000:.2f}')
+        return ', '.join(entries)
+
+    def observe(self, histogram, **labels):
+        with self._lock:
+            stages = list(self.stages.items())
+        for name, seconds in stages:
+            histogram.observe(seconds, stage=name, **labels)
+
+    def log_if_slow(self):
+        elapsed_ms = self.elapsed() * 1000
+        if elapsed_ms < SLOW_REQUEST_MS:
+            return
+        with self._lock:
+            stages = ', '.join(f'{name} {seconds * 1000:.1f}' for name, seconds in self.stages.items())
+        print(f"🐢 Slow {self.name}: {elapsed_ms:.0f} ms ({stages or 'no stages recorded'})")
+
+    @contextmanager
+    def profile_thread(self):
+        """Profile work this request hands to another thread"""
+        if self.profiler is None:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from one profiler; the request's already covers this one
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                self._thread_profiles.append(profiler)
+
+    def profile_report(self):
+        """Stop profiling and return the report, heaviest cumulative time first"""
+        self.profiler.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=out)
+        with self._lock:
+            for profiler in self._thread_profiles:
+                stats.add(profiler)
+        stats.sort_stats('cumulative').print_stats(PROFILE_LINES)
+        return out.getvalue()
+
+
+def current_timer():
+    """The timer of the request being served, if any"""
+    return _current.get()
+
+
+def activate(timer):
+    return _current.set(timer)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Time a block against the current request; a no-op outside of one"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def carry(fn):
+    """Wrap fn to run on another thread inside the current request's timing and profile"""
+    timer = _current.get()
+    if timer is None:
+        return fn
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        with timer.profile_thread():
+            return context.run(fn, *args, **kwargs)
+    return run
+
+
+def profile_requested(flag):
+    """Whether a request's profile flag (query string, header or message field) asks for a profile"""
+    return PROFILE_REQUESTS and str(flag).lower() in ('1', 'true', 'yes')
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+In-process syntax pre-validation for diagram sources
+
+A half-typed diagram from the live editor should not cost a dot, mmdc, d2 or
+PlantUML process start just to get a syntax error back. Each format gets a
+lightweight checker that runs in milliseconds and reports errors with line
+and column. Graphviz sources go through a full DOT parser. The other formats
+are only checked for mistakes their tools are certain to reject: unbalanced
+brackets and blocks, unterminated strings, a missing diagram type. Anything
+the checkers are unsure about is left for the real tool to judge.
+
+Results are cached by content hash, so re-rendering a diagram doesn't
+re-validate it.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+RENDER_VALIDATE = os.environ.get('RENDER_VALIDATE', '1') != '0'
+VALIDATION_CACHE_ENTRIES = int(os.environ.get('VALIDATION_CACHE_ENTRIES', 1024))
+
+FORMAT_NAMES = {
+    'graphviz': 'Graphviz',
+    'mermaid': 'Mermaid',
+    'd2': 'D2',
+    'plantuml': 'PlantUML',
+}
+
+
+class DiagramSyntaxError(Exception):
+    """Raised when a diagram is rejected before rendering; `errors` has line/column details"""
+
+    def __init__(self, format_type, errors):
+        self.format_type = format_type
+        self.errors = errors
+        first = errors[0]
+        super().__init__(
+            f"{FORMAT_NAMES.get(format_type, format_type)} syntax error at line {first['line']}, "
+            f"column {first['column']}: {first['message']}"
+        )
+
+
+class _Source:
+    """Maps character offsets to 1-based (line, column)"""
+
+    def __init__(self, text):
+        self.text = text
+        self._line_starts = None
+
+    def error(self, offset, message):
+        if self._line_starts is None:
+            self._line_starts = [0] + [match.end() for match in re.finditer(r'\n', self.text)]
+        line = self._bisect(offset)
+        return {'line': line + 1, 'column': offset - self._line_starts[line] + 1, 'message': message}
+
+    def _bisect(self, offset):
+        low, high = 0, len(self._line_starts) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._line_starts[middle] <= offset:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+
+class _Invalid(Exception):
+    def __init__(self, error):
+        self.error = error
+
+
+# --- Graphviz (DOT) -------------------------------------------------------
+
+DOT_KEYWORDS = {'strict', 'graph', 'digraph', 'node', 'edge', 'subgraph'}
+
+# Whitespace and comments are consumed in front of each token rather than as tokens of their own,
+# and in front of the end of input
+DOT_TOKEN_RE = re.compile(r'''
+    (?:\s+|//[^\n]*|/\*.*?\*/|\#[^\n]*)*
+    (?:
+        (?P<id>"(?:[^"\\]|\\.)*"|-?(?:\.\d+|\d+(?:\.\d*)?))
+      | (?P<edgeop>->|--)
+      | (?P<word>(?:[^\W\d]|[^\x00-\x7f])(?:\w|[^\x00-\x7f])*)
+      | (?P<punct>[{}\[\]=;,:+])
+      | (?P<other>.)
+      | (?P<end>\Z)
+    )
+''', re.VERBOSE | re.DOTALL)
+
+
+def _html_label_end(source, start):
+    """Offset just past the HTML-like label opening at `start`: angle brackets nest"""
+    text = source.text
+    depth = 0
+    for index in range(start, len(text)):
+        if text[index] == '<':
+            depth += 1
+        elif text[index] == '>':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    raise _Invalid(source.error(start, "unterminated HTML label: missing '>'"))
+
+
+def _dot_tokens(source):
+    """
+    Tokenize into parallel (kinds, texts, offsets) lists, padded with 'eof'.
+
+    A kind is a keyword, a punctuation character, 'edgeop' or 'id'.
+    """
+    text = source.text
+    kinds, texts, offsets = [], [], []
+    position = 0
+    while position is not None:
+        resume = None
+        for match in DOT_TOKEN_RE.finditer(text, position):
+            kind = match.lastgroup
+            token = match.group(kind)
+            if kind == 'end':
+                break  # only trailing whitespace and comments were left
+            if kind == 'word':
+                kind = token.lower()
+                if kind not in DOT_KEYWORDS:
+                    kind = 'id'
+            elif kind == 'punct':
+                kind = token
+            elif kind == 'other':
+                offset = match.start(kind)
+                if token == '<':
+                    resume = _html_label_end(source, offset)
+                    kinds.append('id')
+                    texts.append(text[offset:resume])
+                    offsets.append(offset)
+                    break
+                if token == '"':
+                    raise _Invalid(source.error(offset, 'unterminated string'))
+                if text.startswith('/*', offset):
+                    raise _Invalid(source.error(offset, "unterminated comment: missing '*/'"))
+                raise _Invalid(source.error(offset, f"unexpected character '{token}'"))
+            kinds.append(kind)
+            texts.append(token)
+            offsets.append(match.end() - len(token))
+        position = resume
+
+    # Two sentinels: the parser looks one token ahead
+    kinds += ['eof', 'eof']
+    texts += ['', '']
+    offsets += [len(text), len(text)]
+    return kinds, texts, offsets
+
+
+class _DotParser:
+    """Recursive descent over the DOT grammar (graphviz.org/doc/info/lang.html)"""
+
+    def __init__(self, source):
+        self.source = source
+        self.kinds, self.texts, self.offsets = _dot_tokens(source)
+        self.index = 0
+        self.directed = True
+
+    def fail(self, message, index=None):
+        index = self.index if index is None else index
+        found = 'end of input' if self.kinds[index] == 'eof' else f"'{self.texts[index]}'"
+        raise _Invalid(self.source.error(self.offsets[index], f"{message}, found {found}"))
+
+    def error_at(self, index, message):
+        raise _Invalid(self.source.error(self.offsets[index], message))
+
+    def expect(self, kind, message):
+        if self.kinds[self.index] != kind:
+            self.fail(message)
+        self.index += 1
+
+    def parse(self):
+        kinds = self.kinds
+        if kinds[0] == 'eof':
+            self.fail("expected 'graph' or 'digraph'")
+        while kinds[self.index] != 'eof':
+            if kinds[self.index] == '}':
+                self.error_at(self.index, "unexpected '}' with no open '{'")
+            self.graph()
+
+    def graph(self):
+        kinds = self.kinds
+        if kinds[self.index] == 'strict':
+            self.index += 1
+        kind = kinds[self.index]
+        if kind not in ('graph', 'digraph'):
+            self.fail("expected 'graph' or 'digraph'")
+        self.index += 1
+        self.directed = kind == 'digraph'
+        if kinds[self.index] == 'id':
+            self.identifier()
+        self.block()
+
+    def block(self):
+        kinds = self.kinds
+        opening = self.index
+        self.expect('{', "expected '{'")
+        while kinds[self.index] not in ('}', 'eof'):
+            self.statement()
+            while kinds[self.index] == ';':
+                self.index += 1
+        if kinds[self.index] == 'eof':
+            line = self.source.error(self.offsets[opening], '')['line']
+            self.error_at(self.index, f"missing '}}' to close the '{{' on line {line}")
+        self.index += 1
+
+    def statement(self):
+        kinds = self.kinds
+        kind = kinds[self.index]
+        if kind in ('graph', 'node', 'edge'):
+            self.index += 1
+            if kinds[self.index] != '[':
+                self.fail(f"expected '[' after '{kind}'")
+            self.attributes()
+            return
+        if kind in ('subgraph', '{'):
+            self.subgraph()
+            self.edges()
+            return
+        if kind != 'id':
+            self.fail('expected a node, edge, attribute or subgraph statement')
+
+        if kinds[self.index + 1] == '=':
+            self.identifier()
+            self.index += 1
+            self.expect_identifier("expected a value after '='")
+            return
+        self.node_id()
+        self.edges()
+
+    def edges(self):
+        kinds = self.kinds
+        while kinds[self.index] == 'edgeop':
+            operator = self.texts[self.index]
+            if operator == '->' and not self.directed:
+                self.error_at(self.index, "'->' in an undirected graph; use '--' or declare a digraph")
+            if operator == '--' and self.directed:
+                self.error_at(self.index, "'--' in a directed graph; use '->' or declare a graph")
+            self.index += 1
+            kind = kinds[self.index]
+            if kind == 'id':
+                self.node_id()
+            elif kind in ('subgraph', '{'):
+                self.subgraph()
+            else:
+                self.fail(f"expected a node or subgraph after '{operator}'")
+        if kinds[self.index] == '[':
+            self.attributes()
+
+    def subgraph(self):
+        if self.kinds[self.index] == 'subgraph':
+            self.index += 1
+            if self.kinds[self.index] == 'id':
+                self.identifier()
+        self.block()
+
+    def node_id(self):
+        kinds = self.kinds
+        self.identifier()
+        for _ in range(2):
+            if kinds[self.index] != ':':
+                break
+            self.index += 1
+            self.expect_identifier("expected a port name after ':'")
+
+    def attributes(self):
+        kinds = self.kinds
+        while kinds[self.index] == '[':
+            self.index += 1
+            while kinds[self.index] not in (']', 'eof'):
+                self.expect_identifier('expected an attribute name')
+                self.expect('=', "expected '=' after the attribute name")
+                self.expect_identifier("expected a value after '='")
+                if kinds[self.index] in (',', ';'):
+                    self.index += 1
+            self.expect(']', "missing ']' to close the attribute list")
+
+    def expect_identifier(self, message):
+        if self.kinds[self.index] != 'id':
+            self.fail(message)
+        self.identifier()
+
+    def identifier(self):
+        texts = self.texts
+        text = texts[self.index]
+        self.index += 1
+        # "a" + "b" concatenates double-quoted strings
+        while text.startswith('"') and self.kinds[self.index] == '+':
+            self.index += 1
+            text = texts[self.index]
+            if not text.startswith('"'):
+                self.fail("expected a quoted string after '+'")
+            self.index += 1
+
+
+def validate_graphviz(code):
+    source = _Source(code)
+    try:
+        _DotParser(source).parse()
+    except _Invalid as e:
+        return [e.error]
+    except RecursionError:
+        pass  # nested deeper than the parser can follow; leave it to dot
+    return []
+
+
+# --- Mermaid --------------------------------------------------------------
+
+# Types known here; any other type is passed through to mmdc unchecked
+MERMAID_TYPES = {
+    'graph', 'flowchart', 'flowchart-elk', 'sequenceDiagram', 'classDiagram', 'classDiagram-v2',
+    'stateDiagram', 'stateDiagram-v2', 'erDiagram', 'journey', 'gantt', 'pie', 'quadrantChart',
+    'requirementDiagram', 'gitGraph', 'C4Context', 'C4Container', 'C4Component', 'C4Dynamic',
+    'C4Deployment', 'mindmap', 'timeline', 'zenuml', 'sankey', 'xychart', 'block', 'packet',
+    'architecture', 'kanban', 'radar', 'treemap', 'info',
+}
+
+MERMAID_HEADER_RE = re.compile(r'\A(?:\s*(?:---\r?\n.*?\r?\n---|%%[^\n]*)\s*)*', re.DOTALL)
+MERMAID_TYPE_RE = re.compile(r'[A-Za-z][\w-]*')
+
+# Quoted text and |edge labels| can hold anything; brackets outside them must pair up
+FLOWCHART_TOKEN_RE = re.compile(r'(?P<skip>"[^"]*"|\|[^|\n]*\||%%[^\n]*)|(?P<open>[\[({])|(?P<close>[\])}])|(?P<newline>\n)')
+BRACKET_PAIRS = {')': '(', ']': '[', '}': '{'}
+
+MERMAID_BLOCKS = {
+    'flowchart': re.compile(r'subgraph(?:\s|$)'),
+    'sequenceDiagram': re.compile(r'(?:loop|alt|opt|par|par_over|critical|break|rect|box)(?:\s|$)'),
+}
+MERMAID_END_RE = re.compile(r'end\s*;?\s*$')
+
+
+def validate_mermaid(code):
+    source = _Source(code)
+    header = MERMAID_HEADER_RE.match(code).end()
+    match = MERMAID_TYPE_RE.match(code, header)
+    if match is None:
+        offset = min(header, len(code))
+        return [source.error(offset, 'expected a diagram type such as flowchart or sequenceDiagram')]
+
+    diagram_type = match.group()
+    base_type = diagram_type[:-len('-beta')] if diagram_type.endswith('-beta') else diagram_type
+    if base_type not in MERMAID_TYPES:
+        return []  # newer than this list (e.g. venn-beta); mmdc knows better
+
+    kind = 'flowchart' if diagram_type in ('graph', 'flowchart', 'flowchart-elk') else diagram_type
+    try:
+        if kind == 'flowchart':
+            _mermaid_brackets(source, match.end())
+        if kind in MERMAID_BLOCKS:
+            _mermaid_blocks(source, match.end(), MERMAID_BLOCKS[kind])
+    except _Invalid as e:
+        return [e.error]
+    return []
+
+
+def _mermaid_brackets(source, start):
+    stack = []
+    for match in FLOWCHART_TOKEN_RE.finditer(source.text, start):
+        kind = match.lastgroup
+        if kind == 'open':
+            stack.append((match.group(), match.start()))
+        elif kind == 'close':
+            if not stack:
+                continue  # the closing side of an asymmetric A>label] node
+            opener, offset = stack[-1]
+            if opener != BRACKET_PAIRS[match.group()]:
+                raise _Invalid(source.error(
+                    match.start(), f"'{match.group()}' does not match the '{opener}' opened at column "
+                                   f"{source.error(offset, '')['column']}"))
+            stack.pop()
+        elif kind == 'newline':
+            # Node shapes close on their line; only @{ ... } shape data may continue
+            for opener, offset in stack:
+                if opener != '{':
+                    raise _Invalid(source.error(offset, f"'{opener}' is never closed on this line"))
+    if stack:
+        opener, offset = stack[-1]
+        raise _Invalid(source.error(offset, f"'{opener}' is never closed"))
+
+
+def _mermaid_blocks(source, start, opener_re):
+    open_blocks = []
+    offset = start
+    for line in source.text[start:].split('\n'):
+        stripped = line.strip()
+        indent = offset + len(line) - len(line.lstrip())
+        if opener_re.match(stripped):
+            open_blocks.append((stripped.split()[0], indent))
+        elif MERMAID_END_RE.match(stripped):
+            if not open_blocks:
+                raise _Invalid(source.error(indent, "'end' without an open block"))
+            open_blocks.pop()
+        offset += len(line) + 1
+    if open_blocks:
+        keyword, position = open_blocks[-1]
+        raise _Invalid(source.error(position, f"'{keyword}' is never closed with 'end'"))
+
+
+# --- D2 -------------------------------------------------------------------
+
+# Quotes open a string only at the start of a value: Don't and 5" are plain text
+D2_TOKEN_RE = re.compile(r'''
+    (?P<skip>"""(?:.|\n)*?"""|(?<![^\s])\#[^\n]*|(?<!\w)"(?!"")(?:[^"\\\n]|\\.)*"|(?<!\w)'(?:[^'\\\n]|\\.)*')
+  | (?P<block>:[ \t]*(?P<delimiter>\|[|`]*))
+  | (?P<comment>""")
+  | (?<!\w)(?P<quote>["'])
+  | (?P<open>[{\[])
+  | (?P<close>[}\]])
+''', re.VERBOSE)
+
+
+def validate_d2(code):
+    source = _Source(code)
+    stack = []
+    position = 0
+    while True:
+        match = D2_TOKEN_RE.search(code, position)
+        if match is None:
+            break
+        kind = match.lastgroup
+        position = match.end()
+        if kind == 'comment':
+            return [source.error(match.start(), 'unterminated block comment: missing \'"""\'')]
+        if kind == 'quote':
+            return [source.error(match.start(), 'unterminated string')]
+        if kind == 'block':
+            # |md ... | block strings end with the opening pipes mirrored
+            delimiter = match.group('delimiter')
+            closing = code.find(delimiter[::-1], position)
+            if closing == -1:
+                return [source.error(match.start('delimiter'), f"unterminated block string: missing '{delimiter[::-1]}'")]
+            position = closing + len(delimiter)
+        elif kind == 'open':
+            stack.append((match.group(), match.start()))
+        elif kind == 'close':
+            if not stack:
+                return [source.error(match.start(), f"unexpected '{match.group()}'")]
+            opener, _ = stack.pop()
+            if opener != BRACKET_PAIRS[match.group()]:
+                return [source.error(match.start(), f"'{match.group()}' does not match '{opener}'")]
+    if stack:
+        opener, offset = stack[-1]
+        return [source.error(offset, f"'{opener}' is never closed")]
+    return []
+
+
+# --- PlantUML -------------------------------------------------------------
+
+PLANTUML_MARKER_RE = re.compile(r'^[ \t]*@(start|end)(\w+)', re.MULTILINE)
+
+
+def validate_plantuml(code):
+    # Sources without @start are wrapped in @startuml/@enduml by the renderer
+    source = _Source(code)
+    opened = None
+    for match in PLANTUML_MARKER_RE.finditer(code):
+        marker, name = match.group(1), match.group(2).lower()
+        if marker == 'start':
+            if opened is not None:
+                return [source.error(opened[1], f"'@start{opened[0]}' is never closed with '@end{opened[0]}'")]
+            opened = (name, match.start(1) - 1)
+        elif opened is None:
+            return [source.error(match.start(1) - 1, f"'@end{name}' without a matching '@start{name}'")]
+        elif opened[0] != name:
+            return [source.error(match.start(1) - 1, f"'@end{name}' does not close '@start{opened[0]}'")]
+        else:
+            opened = None
+    if opened is not None:
+        return [source.error(opened[1], f"'@start{opened[0]}' is never closed with '@end{opened[0]}'")]
+    return []
+
+
+VALIDATORS = {
+    'graphviz': validate_graphviz,
+    'mermaid': validate_mermaid,
+    'd2': validate_d2,
+    'plantuml': validate_plantuml,
+}
+
+
+class ValidationCache:
+    """Recent validation results by content hash"""
+
+    def __init__(self, max_entries=VALIDATION_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def validate(self, format_type, code):
+        """Syntax errors in `code` as a list of {line, column, message}; empty when it looks valid"""
+        validator = VALIDATORS.get(format_type)
+        if validator is None:
+            return []
+
+        key = hashlib.sha256(f'{format_type}\0{code}'.encode('utf-8')).digest()
+        with self._lock:
+            errors = self._results.get(key)
+            if errors is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return errors
+            self.misses += 1
+
+        errors = validator(code)
+        with self._lock:
+            self._results[key] = errors
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return errors
+
+    def check(self, format_type, code):
+        """Raise DiagramSyntaxError unless `code` passes its format's validator"""
+        errors = self.validate(format_type, code)
+        if errors:
+            raise DiagramSyntaxError(format_type, errors)
+
+
+_cache = ValidationCache()
+
+
+def validate(format_type, code):
+    """Syntax errors in `code` from the shared cache"""
+    return _cache.validate(format_type, code)
+
+
+def check(format_type, code):
+    """Reject `code` with DiagramSyntaxError before it reaches a renderer; a no-op with RENDER_VALIDATE=0"""
+    if RENDER_VALIDATE:
+        _cache.check(format_type, code)